@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Approximate nearest-neighbor indexes for Hippocratic embeddings
+
+Pure-numpy IVF-flat index over L2-normalized vectors (cosine similarity):
+- k-means partitions the vectors into `nlist` inverted lists
+- a query scans only the `nprobe` lists whose centroids are closest
+- incremental inserts and deletes without retraining
+- persisted as a single .npz next to the database
+
+Raise nprobe for recall, lower it for latency. nprobe == nlist is an
+exact (brute-force) search.
+"""
+
+import os
+import logging
+from abc import ABC, abstractmethod
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def index_path(db_path: str, table: str, kind: str = "ivf") -> str:
+    """Sidecar path for a table's index, e.g. local.facility_embeddings.ivf.npz."""
+    db = Path(db_path)
+    return str(db.with_name(f"{db.stem}.{table}.{kind}.npz"))
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Return L2-normalized float32 rows (zero rows stay zero)."""
+    vectors = np.array(vectors, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class ANNIndex(ABC):
+    """Interface for embedding indexes; ids are embedding row ids."""
+    
+    kind = "base"
+    
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.watermark = 0  # highest embedding id indexed
+        self.updated_watermark = ''  # highest updated_at synced
+    
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of indexed vectors."""
+    
+    @abstractmethod
+    def build(self, ids: np.ndarray, vectors: np.ndarray):
+        """(Re)build the index from scratch."""
+    
+    @abstractmethod
+    def add(self, ids: np.ndarray, vectors: np.ndarray):
+        """Insert (or replace) vectors without retraining."""
+    
+    @abstractmethod
+    def remove(self, ids: np.ndarray) -> int:
+        """Delete ids; returns how many were present."""
+    
+    @abstractmethod
+    def search(self, query: np.ndarray, k: int = 10, **params) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (ids, cosine similarities) for one query, best first."""
+    
+    @abstractmethod
+    def ids(self) -> np.ndarray:
+        """All indexed ids."""
+    
+    @abstractmethod
+    def save(self, path: str):
+        """Persist the index to path."""
+    
+    @classmethod
+    @abstractmethod
+    def load(cls, path: str) -> "ANNIndex":
+        """Load an index written by save()."""
+
+
+class IVFFlatIndex(ANNIndex):
+    """Inverted-file index with exact (flat) scoring inside each probed list."""
+    
+    kind = "ivf"
+    
+    def __init__(self, dim: int, nlist: Optional[int] = None, nprobe: int = 8,
+                 train_iterations: int = 10, seed: int = 42):
+        """
+        Args:
+            dim: Embedding dimension
+            nlist: Number of inverted lists (default: ~4*sqrt(N) at build time)
+            nprobe: Lists scanned per query (recall/latency knob)
+            train_iterations: k-means iterations
+            seed: RNG seed for centroid initialization
+        """
+        super().__init__(dim)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_iterations = train_iterations
+        self.seed = seed
+        
+        self.centroids = np.empty((0, dim), dtype=np.float32)
+        self._list_ids: List[np.ndarray] = []
+        self._list_vectors: List[np.ndarray] = []
+        self._id_to_list: Dict[int, int] = {}
+    
+    def __len__(self) -> int:
+        return len(self._id_to_list)
+    
+    def _train(self, vectors: np.ndarray, nlist: int) -> np.ndarray:
+        """Spherical k-means on (a sample of) the vectors."""
+        rng = np.random.default_rng(self.seed)
+        sample = vectors
+        if len(vectors) > nlist * 256:
+            sample = vectors[rng.choice(len(vectors), nlist * 256, replace=False)]
+        
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(self.train_iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            
+            # Re-seed empty lists from random points
+            empty = np.bincount(assign, minlength=nlist) == 0
+            if empty.any():
+                sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = normalize(sums)
+        return centroids
+    
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self.centroids.T, axis=1)
+    
+    def build(self, ids: np.ndarray, vectors: np.ndarray):
+        """Train centroids and index all vectors from scratch."""
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = normalize(vectors)
+        
+        nlist = self.nlist or max(1, int(4 * np.sqrt(len(ids))))
+        nlist = max(1, min(nlist, len(ids)))
+        self.nlist = nlist
+        
+        self.centroids = self._train(vectors, nlist) if len(ids) else np.empty((0, self.dim), dtype=np.float32)
+        self._list_ids = [np.empty(0, dtype=np.int64) for _ in range(nlist)]
+        self._list_vectors = [np.empty((0, self.dim), dtype=np.float32) for _ in range(nlist)]
+        self._id_to_list = {}
+        self.watermark = 0
+        
+        self.add(ids, vectors)
+        logger.info(f"Built IVF index: {len(ids)} vectors in {nlist} lists")
+    
+    def add(self, ids: np.ndarray, vectors: np.ndarray):
+        """Insert (or replace) vectors; each goes to its nearest list."""
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(ids):
+            return
+        if not len(self.centroids):
+            self.build(ids, vectors)
+            return
+        
+        vectors = normalize(vectors)
+        self.remove([i for i in ids.tolist() if i in self._id_to_list])
+        
+        assign = self._assign(vectors)
+        for list_no in np.unique(assign):
+            mask = assign == list_no
+            self._list_ids[list_no] = np.concatenate([self._list_ids[list_no], ids[mask]])
+            self._list_vectors[list_no] = np.vstack([self._list_vectors[list_no], vectors[mask]])
+            for embedding_id in ids[mask].tolist():
+                self._id_to_list[embedding_id] = int(list_no)
+        
+        self.watermark = max(self.watermark, int(ids.max()))
+    
+    def remove(self, ids: np.ndarray) -> int:
+        """Delete vectors by id; unknown ids are ignored."""
+        by_list: Dict[int, List[int]] = {}
+        for embedding_id in np.asarray(ids, dtype=np.int64).tolist():
+            list_no = self._id_to_list.pop(embedding_id, None)
+            if list_no is not None:
+                by_list.setdefault(list_no, []).append(embedding_id)
+        
+        for list_no, removed in by_list.items():
+            keep = ~np.isin(self._list_ids[list_no], removed)
+            self._list_ids[list_no] = self._list_ids[list_no][keep]
+            self._list_vectors[list_no] = self._list_vectors[list_no][keep]
+        
+        return sum(len(v) for v in by_list.values())
+    
+    def search(self, query: np.ndarray, k: int = 10, nprobe: Optional[int] = None,
+               exclude: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k ids and cosine scores for one query vector, best first.
+        
+        Args:
+            query: Query vector (normalized here)
+            k: Number of results
+            nprobe: Lists to scan (defaults to self.nprobe)
+            exclude: Ids to leave out of the results
+        """
+        if not len(self) or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        
+        query = normalize(query)[0]
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        probes = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        
+        cand_ids = np.concatenate([self._list_ids[p] for p in probes])
+        if not len(cand_ids):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = np.concatenate([self._list_vectors[p] for p in probes]) @ query
+        
+        if exclude is not None and len(exclude):
+            scores[np.isin(cand_ids, exclude)] = -np.inf
+        
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        top = top[np.isfinite(scores[top])]
+        return cand_ids[top], scores[top]
+    
+    def ids(self) -> np.ndarray:
+        return np.fromiter(self._id_to_list, dtype=np.int64, count=len(self._id_to_list))
+    
+    def save(self, path: str):
+        """Write the index to a .npz file (atomically)."""
+        sizes = np.array([len(ids) for ids in self._list_ids], dtype=np.int64)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                kind=np.array(self.kind),
+                dim=np.int64(self.dim),
+                nprobe=np.int64(self.nprobe),
+                watermark=np.int64(self.watermark),
+                updated_watermark=np.array(self.updated_watermark),
+                centroids=self.centroids,
+                list_sizes=sizes,
+                ids=np.concatenate(self._list_ids) if self._list_ids else np.empty(0, dtype=np.int64),
+                vectors=np.vstack(self._list_vectors) if self._list_vectors else np.empty((0, self.dim), dtype=np.float32),
+            )
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path: str) -> "IVFFlatIndex":
+        with np.load(path, allow_pickle=False) as data:
+            index = cls(int(data['dim']), nlist=len(data['centroids']), nprobe=int(data['nprobe']))
+            index.watermark = int(data['watermark'])
+            if 'updated_watermark' in data:
+                index.updated_watermark = str(data['updated_watermark'])
+            index.centroids = data['centroids']
+            
+            offsets = np.concatenate([[0], np.cumsum(data['list_sizes'])])
+            ids, vectors = data['ids'], data['vectors']
+            index._list_ids = [ids[a:b] for a, b in zip(offsets[:-1], offsets[1:])]
+            index._list_vectors = [vectors[a:b] for a, b in zip(offsets[:-1], offsets[1:])]
+            index._id_to_list = {
+                embedding_id: list_no
+                for list_no, list_ids in enumerate(index._list_ids)
+                for embedding_id in list_ids.tolist()
+            }
+        return index
+
+
+# Available index implementations, by kind
+INDEX_TYPES = {
+    IVFFlatIndex.kind: IVFFlatIndex,
+}
+
+
+def load_index(path: str) -> Optional[ANNIndex]:
+    """Load an index file of any registered kind, or None if missing/unreadable."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            kind = str(data['kind'])
+        return INDEX_TYPES[kind].load(path)
+    except (OSError, KeyError, ValueError) as e:
+        logger.warning(f"Could not load ANN index {path}: {e}")
+        return None
@@ -0,0 +1,170 @@
+"""
+Sampled, lazy data profiling for Hippocratic tables.
+
+Profiles the cached analysis frames (see pandas_analyzer.FrameCache) one
+column at a time, only for the columns a caller asks for, and keeps the
+results per table fingerprint so repeat requests are free until the data
+changes.
+
+Tables larger than the sample size are profiled in sampled mode:
+- null counts, mean, std, min and max stay exact (cheap vectorized passes)
+- distinct counts come from a HyperLogLog over the full column
+- median/quartiles, string lengths, the most common value and deep memory
+  usage are estimated from a fixed-seed uniform row sample
+
+Usage:
+    profile = get_table_profile(frames, 'facilities')
+    profile.profile(['county', 'capacity'])
+"""
+
+import threading
+import pandas as pd
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from sketches import HyperLogLog
+
+DEFAULT_SAMPLE_SIZE = 10000
+SAMPLE_SEED = 42
+
+# Column stats estimated from the sample (or HLL) in sampled mode
+SAMPLED_FIELDS = ['unique_count', 'median', 'q25', 'q75', 'avg_length', 'max_length', 'most_common']
+
+
+def profile_column(full: pd.Series, sample: pd.Series, sampled: bool) -> Dict[str, Any]:
+    """
+    Profile one column.
+    
+    Args:
+        full: The whole column
+        sample: Sampled rows of the column (the whole column when not sampled)
+        sampled: Whether sample is a strict subset of full
+    """
+    nulls = int(full.isnull().sum())
+    has_values = nulls < len(full)
+    
+    if sampled:
+        hll = HyperLogLog()
+        hll.add(full)
+        unique_count = hll.estimate()
+    else:
+        unique_count = int(full.nunique())
+    
+    col_profile = {
+        'dtype': str(full.dtype),
+        'null_count': nulls,
+        'null_percentage': float(nulls / len(full) * 100) if len(full) else 0.0,
+        'unique_count': unique_count
+    }
+    
+    # Numeric column statistics
+    if pd.api.types.is_numeric_dtype(full):
+        sample_has_values = sample.notna().any()
+        col_profile.update({
+            'mean': float(full.mean()) if has_values else None,
+            'median': float(sample.median()) if sample_has_values else None,
+            'std': float(full.std()) if has_values else None,
+            'min': float(full.min()) if has_values else None,
+            'max': float(full.max()) if has_values else None,
+            'q25': float(sample.quantile(0.25)) if sample_has_values else None,
+            'q75': float(sample.quantile(0.75)) if sample_has_values else None
+        })
+    
+    # String column statistics
+    elif (pd.api.types.is_string_dtype(full) or full.dtype == 'object'
+          or isinstance(full.dtype, pd.CategoricalDtype)):
+        if sample.notna().any():
+            lengths = sample.str.len()
+            mode = sample.mode()
+            col_profile.update({
+                'avg_length': float(lengths.mean()),
+                'max_length': int(lengths.max()),
+                'most_common': str(mode.iloc[0]) if len(mode) > 0 else None
+            })
+    
+    return col_profile
+
+
+class TableProfile:
+    """Profile of one version of a table; columns are profiled on first request."""
+    
+    def __init__(self, table: str, df: pd.DataFrame, fingerprint: Optional[str],
+                 sample_size: Optional[int] = DEFAULT_SAMPLE_SIZE):
+        self.table = table
+        self.df = df
+        self.fingerprint = fingerprint
+        self.sample_size = sample_size
+        
+        self.sampled = bool(sample_size) and len(df) > sample_size
+        self.sample = df.sample(n=sample_size, random_state=SAMPLE_SEED) if self.sampled else df
+        
+        self._columns: Dict[str, Dict[str, Any]] = {}
+        self._memory_usage: Optional[float] = None
+        self._lock = threading.Lock()
+    
+    def column(self, name: str) -> Dict[str, Any]:
+        """Profile of one column (computed once)."""
+        if name not in self.df.columns:
+            raise ValueError(f"Unknown column {name} in {self.table}")
+        with self._lock:
+            if name not in self._columns:
+                self._columns[name] = profile_column(self.df[name], self.sample[name], self.sampled)
+            return self._columns[name]
+    
+    def memory_usage(self) -> float:
+        """Deep memory usage in bytes (scaled up from the sample when sampled)."""
+        with self._lock:
+            if self._memory_usage is None:
+                usage = float(self.sample.memory_usage(deep=True).sum())
+                if self.sampled:
+                    usage *= len(self.df) / len(self.sample)
+                self._memory_usage = usage
+            return self._memory_usage
+    
+    def profile(self, columns: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Table profile limited to `columns` (all columns if None).
+        
+        Returns:
+            The get_data_profile layout plus sampled / sample_rows /
+            sampled_fields describing which stats are estimates
+        """
+        columns = list(self.df.columns) if columns is None else columns
+        
+        return {
+            'table': self.table,
+            'total_rows': len(self.df),
+            'total_columns': len(self.df.columns),
+            'memory_usage': f"{self.memory_usage() / 1024 / 1024:.2f} MB",
+            'sampled': self.sampled,
+            'sample_rows': len(self.sample),
+            'sampled_fields': SAMPLED_FIELDS if self.sampled else [],
+            'data_fingerprint': self.fingerprint,
+            'columns': {col: self.column(col) for col in columns},
+            'timestamp': datetime.now().isoformat()
+        }
+
+
+# Latest profile per (database, table, sample size)
+_PROFILES: Dict[Tuple[str, str, int], TableProfile] = {}
+_PROFILES_LOCK = threading.Lock()
+
+
+def get_table_profile(frames, table: str, sample_size: Optional[int] = DEFAULT_SAMPLE_SIZE) -> TableProfile:
+    """
+    Get the cached profile of a table, starting a new one when its data changed.
+    
+    Args:
+        frames: pandas_analyzer.FrameCache to read the table from
+        table: 'facilities', 'financials' or 'merged'
+        sample_size: Rows to sample (0 or None profiles every row exactly)
+    """
+    df = frames.get(table)
+    fingerprint = frames.fingerprint
+    key = (frames.pool.db_path, table, sample_size or 0)
+    
+    with _PROFILES_LOCK:
+        profile = _PROFILES.get(key)
+        if profile is None or profile.df is not df:
+            profile = _PROFILES[key] = TableProfile(table, df, fingerprint, sample_size)
+        return profile
@@ -5,125 +5,351 @@ Deduplicates records across ingestion jobs and maintains ghost catalog
 
 import hashlib
 import json
+import os
 import sqlite3
+import sys
+import threading
+from collections import Counter
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from db_pool import get_pool
+
+class HashPrefilter:
+    """
+    In-memory membership prefilter for record_hashes.
+    
+    Keeps a sorted uint64 array of 8-byte hash prefixes per record_type
+    (8 bytes per hash). record_hash is unique across types, so membership
+    is tested against every type. A miss means the hash is definitely not
+    in record_hashes as of the returned watermark, so the DB lookup can be
+    skipped; a hit only means "probably seen" and must be verified against
+    the table.
+    
+    Loaded lazily on first use, kept in sync on insert, and caught up from
+    a record_hashes.id watermark before every check so rows written by
+    other connections or processes are never missed. Can be saved to a
+    sidecar .npz so warm startups only read rows added since the last save;
+    the sidecar records the hash of the row at its watermark and is
+    discarded if the database no longer has that row (recreated/restored).
+    """
+    
+    # Pending inserts are merged into the sorted array past this size
+    MERGE_THRESHOLD = 4096
+    
+    def __init__(self, pool, sidecar_path: Optional[str] = None):
+        self.pool = pool
+        self.sidecar_path = sidecar_path
+        
+        self._prefixes: Dict[str, np.ndarray] = {}
+        self._pending: Dict[str, set] = {}
+        self._watermark = 0
+        self._watermark_hash = None  # record_hash of the row with id == _watermark
+        self._loaded = False
+        self._lock = threading.RLock()
+    
+    @staticmethod
+    def prefix(record_hash: str) -> int:
+        """First 8 bytes of a hex sha256 as an unsigned int."""
+        return int(record_hash[:16], 16)
+    
+    def _prefix_array(self, hashes: List[str]) -> np.ndarray:
+        return np.fromiter((int(h[:16], 16) for h in hashes), dtype=np.uint64, count=len(hashes))
+    
+    def _reset(self):
+        self._prefixes, self._pending = {}, {}
+        self._watermark, self._watermark_hash = 0, None
+    
+    def _matches_table(self, conn) -> bool:
+        """Whether the table still has the row the watermark points at."""
+        if self._watermark == 0:
+            return True
+        row = conn.execute("SELECT record_hash FROM record_hashes WHERE id = ?", (self._watermark,)).fetchone()
+        return row is not None and row[0] == self._watermark_hash
+    
+    def _load(self):
+        """Load from the sidecar (if any and still valid), then catch up from the table."""
+        if self.sidecar_path and os.path.exists(self.sidecar_path):
+            try:
+                with np.load(self.sidecar_path, allow_pickle=False) as data:
+                    self._watermark = int(data['watermark'])
+                    self._watermark_hash = str(data['watermark_hash'])
+                    for i, record_type in enumerate(data['types']):
+                        self._prefixes[str(record_type)] = data[f'prefixes_{i}']
+            except (OSError, KeyError, ValueError):
+                self._reset()
+            
+            with self.pool.connection() as conn:
+                if not self._matches_table(conn):
+                    self._reset()
+        
+        self._loaded = True
+        self.refresh()
+    
+    def refresh(self) -> int:
+        """
+        Pull hashes inserted since the watermark.
+        
+        A cheap MAX(id) probe skips the catch-up query when nothing moved.
+        Returns the watermark the filter is now current to.
+        """
+        with self._lock:
+            if not self._loaded:
+                self._load()
+                return self._watermark
+            
+            with self.pool.connection() as conn:
+                latest = conn.execute("SELECT MAX(id) FROM record_hashes").fetchone()[0] or 0
+                if latest < self._watermark:
+                    # Table was recreated under us: rebuild from scratch
+                    self._reset()
+                if latest <= self._watermark:
+                    return self._watermark
+                rows = conn.execute("""
+                    SELECT id, record_type, record_hash FROM record_hashes
+                    WHERE id > ? AND id <= ?
+                    ORDER BY id
+                """, (self._watermark, latest)).fetchall()
+            
+            by_type: Dict[str, List[str]] = {}
+            for _, record_type, record_hash in rows:
+                by_type.setdefault(record_type, []).append(record_hash)
+            for record_type, hashes in by_type.items():
+                self._merge(record_type, self._prefix_array(hashes))
+            
+            self._watermark = latest
+            self._watermark_hash = rows[-1][2] if rows else None
+            return self._watermark
+    
+    def _merge(self, record_type: str, prefixes: np.ndarray):
+        base = self._prefixes.get(record_type)
+        if base is None:
+            self._prefixes[record_type] = np.unique(prefixes)
+        else:
+            self._prefixes[record_type] = np.union1d(base, prefixes)
+    
+    def add(self, record_type: str, hashes: List[str]):
+        """Record hashes just inserted by this process."""
+        with self._lock:
+            if not self._loaded:
+                return  # picked up from the table on first load
+            pending = self._pending.setdefault(record_type, set())
+            pending.update(self.prefix(h) for h in hashes)
+            if len(pending) > self.MERGE_THRESHOLD:
+                self._merge(record_type, np.fromiter(pending, dtype=np.uint64, count=len(pending)))
+                pending.clear()
+    
+    def check_many(self, hashes: List[str]):
+        """
+        Catch up to the table, then test hashes against it.
+        
+        Returns:
+            (mask, watermark): False = definitely not in record_hashes up to
+            record_hashes.id == watermark, True = possibly already seen
+        """
+        prefixes = self._prefix_array(hashes)
+        
+        with self._lock:
+            watermark = self.refresh()
+            mask = np.zeros(len(prefixes), dtype=bool)
+            for base in self._prefixes.values():
+                if len(base):
+                    idx = np.searchsorted(base, prefixes)
+                    mask |= base[np.minimum(idx, len(base) - 1)] == prefixes
+            
+            for pending in self._pending.values():
+                if pending:
+                    mask |= np.fromiter((p in pending for p in prefixes.tolist()), dtype=bool, count=len(prefixes))
+        
+        return mask, watermark
+    
+    def might_contain_many(self, hashes: List[str]) -> np.ndarray:
+        """Boolean mask: False = definitely new, True = possibly already seen."""
+        return self.check_many(hashes)[0]
+    
+    def might_contain(self, record_hash: str) -> bool:
+        return bool(self.might_contain_many([record_hash])[0])
+    
+    def save(self):
+        """
+        Write the filter to the sidecar file (atomically).
+        
+        Catches up first, so rows this process inserted are covered by the
+        saved watermark and aren't re-read on the next startup.
+        """
+        if not self.sidecar_path:
+            return
+        
+        with self._lock:
+            if not self._loaded:
+                return
+            self.refresh()
+            for record_type, pending in self._pending.items():
+                if pending:
+                    self._merge(record_type, np.fromiter(pending, dtype=np.uint64, count=len(pending)))
+                    pending.clear()
+            
+            types = sorted(self._prefixes)
+            arrays = {f'prefixes_{i}': self._prefixes[t] for i, t in enumerate(types)}
+            tmp_path = f"{self.sidecar_path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, types=np.array(types, dtype=str), watermark=np.int64(self._watermark),
+                         watermark_hash=np.array(self._watermark_hash or ''), **arrays)
+            os.replace(tmp_path, self.sidecar_path)
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'loaded': self._loaded,
+                'watermark': self._watermark,
+                'types': {t: len(p) + len(self._pending.get(t, ())) for t, p in self._prefixes.items()},
+                'bytes': sum(p.nbytes for p in self._prefixes.values()),
+            }
+
+
+# One prefilter per database file, shared by all deduplicators in the process
+_PREFILTERS: Dict[str, HashPrefilter] = {}
+_PREFILTERS_LOCK = threading.Lock()
+
+
+def get_prefilter(pool, sidecar_path: Optional[str] = None) -> HashPrefilter:
+    """Get the shared prefilter for a pool's database."""
+    with _PREFILTERS_LOCK:
+        prefilter = _PREFILTERS.get(pool.db_path)
+        if prefilter is None:
+            prefilter = HashPrefilter(pool, sidecar_path)
+            _PREFILTERS[pool.db_path] = prefilter
+        return prefilter
+
+
 class RecordDeduplicator:
     """Deduplicates records and tracks in ghost catalog."""
     
-    def __init__(self, db_path: str = "local.db"):
+    def __init__(self, db_path: str = "local.db", use_prefilter: bool = True,
+                 prefilter_path: Optional[str] = None):
+        """
+        Args:
+            db_path: SQLite database path
+            use_prefilter: Skip DB lookups for hashes the in-memory prefilter knows are new
+            prefilter_path: Sidecar file for the prefilter (default: <db>.hashes.npz)
+        """
         self.db_path = db_path
+        self.pool = get_pool(db_path)
         self.init_tables()
+        
+        self.prefilter = None
+        if use_prefilter:
+            sidecar = prefilter_path or os.path.splitext(self.pool.db_path)[0] + '.hashes.npz'
+            self.prefilter = get_prefilter(self.pool, sidecar)
     
     def init_tables(self):
         """Initialize deduplication and ghost catalog tables."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Record hashes for deduplication
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS record_hashes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                record_type TEXT NOT NULL,
-                record_hash TEXT NOT NULL UNIQUE,
-                record_id INTEGER,
-                table_name TEXT,
-                first_seen DATETIME DEFAULT CURRENT_TIMESTAMP,
-                last_seen DATETIME DEFAULT CURRENT_TIMESTAMP,
-                seen_count INTEGER DEFAULT 1
-            )
-        """)
-        
-        # Job history with SOC numbering
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS job_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                job_number TEXT NOT NULL UNIQUE,
-                scraper_name TEXT NOT NULL,
-                start_time DATETIME NOT NULL,
-                end_time DATETIME,
-                status TEXT DEFAULT 'running',
-                records_fetched INTEGER DEFAULT 0,
-                records_new INTEGER DEFAULT 0,
-                records_duplicate INTEGER DEFAULT 0,
-                bytes_downloaded INTEGER DEFAULT 0,
-                error_message TEXT,
-                metadata TEXT
-            )
-        """)
-        
-        # Ghost catalog - tracks all entities ever seen
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS ghost_catalog (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                entity_type TEXT NOT NULL,
-                entity_id TEXT NOT NULL,
-                entity_name TEXT,
-                content_hash TEXT NOT NULL,
-                status TEXT DEFAULT 'active',
-                first_job TEXT,
-                last_job TEXT,
-                appearances INTEGER DEFAULT 1,
-                data_snapshot TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(entity_type, entity_id)
-            )
-        """)
-        
-        # Job logs
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS job_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                job_number TEXT NOT NULL,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                level TEXT NOT NULL,
-                message TEXT NOT NULL,
-                metadata TEXT,
-                FOREIGN KEY (job_number) REFERENCES job_history(job_number)
-            )
-        """)
-        
-        conn.commit()
-        conn.close()
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Record hashes for deduplication
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS record_hashes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    record_type TEXT NOT NULL,
+                    record_hash TEXT NOT NULL UNIQUE,
+                    record_id INTEGER,
+                    table_name TEXT,
+                    first_seen DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    last_seen DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    seen_count INTEGER DEFAULT 1
+                )
+            """)
+            
+            # Job history with SOC numbering
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS job_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_number TEXT NOT NULL UNIQUE,
+                    scraper_name TEXT NOT NULL,
+                    start_time DATETIME NOT NULL,
+                    end_time DATETIME,
+                    status TEXT DEFAULT 'running',
+                    records_fetched INTEGER DEFAULT 0,
+                    records_new INTEGER DEFAULT 0,
+                    records_duplicate INTEGER DEFAULT 0,
+                    bytes_downloaded INTEGER DEFAULT 0,
+                    error_message TEXT,
+                    metadata TEXT
+                )
+            """)
+            
+            # Ghost catalog - tracks all entities ever seen
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS ghost_catalog (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    entity_type TEXT NOT NULL,
+                    entity_id TEXT NOT NULL,
+                    entity_name TEXT,
+                    content_hash TEXT NOT NULL,
+                    status TEXT DEFAULT 'active',
+                    first_job TEXT,
+                    last_job TEXT,
+                    appearances INTEGER DEFAULT 1,
+                    data_snapshot TEXT,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE(entity_type, entity_id)
+                )
+            """)
+            
+            # Job logs
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS job_logs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_number TEXT NOT NULL,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    level TEXT NOT NULL,
+                    message TEXT NOT NULL,
+                    metadata TEXT,
+                    FOREIGN KEY (job_number) REFERENCES job_history(job_number)
+                )
+            """)
+            
+            conn.commit()
     
     def generate_job_number(self) -> str:
         """Generate SOC-#### job number."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Get last job number
-        cursor.execute("SELECT MAX(CAST(SUBSTR(job_number, 5) AS INTEGER)) FROM job_history WHERE job_number LIKE 'SOC-%'")
-        result = cursor.fetchone()
-        
-        if result and result[0]:
-            next_num = result[0] + 1
-        else:
-            next_num = 1
-        
-        conn.close()
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Get last job number
+            cursor.execute("SELECT MAX(CAST(SUBSTR(job_number, 5) AS INTEGER)) FROM job_history WHERE job_number LIKE 'SOC-%'")
+            result = cursor.fetchone()
+            
+            if result and result[0]:
+                next_num = result[0] + 1
+            else:
+                next_num = 1
+            
         return f"SOC-{next_num:04d}"
     
     def start_job(self, scraper_name: str, metadata: Optional[Dict] = None) -> str:
         """Start a new job and return job number."""
         job_number = self.generate_job_number()
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO job_history (job_number, scraper_name, start_time, metadata)
-            VALUES (?, ?, ?, ?)
-        """, (
-            job_number,
-            scraper_name,
-            datetime.now().isoformat(),
-            json.dumps(metadata) if metadata else None
-        ))
-        
-        conn.commit()
-        conn.close()
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT INTO job_history (job_number, scraper_name, start_time, metadata)
+                VALUES (?, ?, ?, ?)
+            """, (
+                job_number,
+                scraper_name,
+                datetime.now().isoformat(),
+                json.dumps(metadata) if metadata else None
+            ))
+            
+            conn.commit()
         
         self.log_job(job_number, 'info', f'Started job {job_number} for scraper: {scraper_name}')
         
@@ -131,21 +357,20 @@ class RecordDeduplicator:
     
     def log_job(self, job_number: str, level: str, message: str, metadata: Optional[Dict] = None):
         """Add log entry for a job."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO job_logs (job_number, level, message, metadata)
-            VALUES (?, ?, ?, ?)
-        """, (
-            job_number,
-            level,
-            message,
-            json.dumps(metadata) if metadata else None
-        ))
-        
-        conn.commit()
-        conn.close()
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                INSERT INTO job_logs (job_number, level, message, metadata)
+                VALUES (?, ?, ?, ?)
+            """, (
+                job_number,
+                level,
+                message,
+                json.dumps(metadata) if metadata else None
+            ))
+            
+            conn.commit()
     
     def compute_hash(self, record: Dict[str, Any], key_fields: List[str]) -> str:
         """Compute hash for record based on key fields."""
@@ -158,28 +383,30 @@ class RecordDeduplicator:
         """Check if record is a duplicate."""
         record_hash = self.compute_hash(record, key_fields)
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT id FROM record_hashes 
-            WHERE record_type = ? AND record_hash = ?
-        """, (record_type, record_hash))
-        
-        result = cursor.fetchone()
+        # Definitely new: no need to touch the table
+        if self.prefilter and not self.prefilter.might_contain(record_hash):
+            return False
         
-        if result:
-            # Update last seen and count
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            
             cursor.execute("""
-                UPDATE record_hashes 
-                SET last_seen = ?, seen_count = seen_count + 1
+                SELECT id FROM record_hashes 
                 WHERE record_type = ? AND record_hash = ?
-            """, (datetime.now().isoformat(), record_type, record_hash))
-            conn.commit()
-            conn.close()
-            return True
-        
-        conn.close()
+            """, (record_type, record_hash))
+            
+            result = cursor.fetchone()
+            
+            if result:
+                # Update last seen and count
+                cursor.execute("""
+                    UPDATE record_hashes 
+                    SET last_seen = ?, seen_count = seen_count + 1
+                    WHERE record_type = ? AND record_hash = ?
+                """, (datetime.now().isoformat(), record_type, record_hash))
+                conn.commit()
+                return True
+            
         return False
     
     def register_record(self, record: Dict[str, Any], record_type: str, key_fields: List[str], 
@@ -187,153 +414,283 @@ class RecordDeduplicator:
         """Register a new record in deduplication system and ghost catalog."""
         record_hash = self.compute_hash(record, key_fields)
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Add to record hashes
-        cursor.execute("""
-            INSERT INTO record_hashes (record_type, record_hash, record_id, table_name)
-            VALUES (?, ?, ?, ?)
-        """, (record_type, record_hash, record_id, table_name))
-        
-        # Add to ghost catalog
-        entity_id = str(record.get(key_fields[0])) if key_fields else str(record_id)
-        entity_name = record.get('name') or record.get('facilityName') or record.get('title')
-        
-        cursor.execute("""
-            INSERT INTO ghost_catalog (entity_type, entity_id, entity_name, content_hash, first_job, last_job, data_snapshot)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            ON CONFLICT(entity_type, entity_id) DO UPDATE SET
-                content_hash = excluded.content_hash,
-                last_job = excluded.last_job,
-                appearances = appearances + 1,
-                data_snapshot = excluded.data_snapshot,
-                updated_at = CURRENT_TIMESTAMP
-        """, (
-            record_type,
-            entity_id,
-            entity_name,
-            record_hash,
-            job_number,
-            job_number,
-            json.dumps(record)
-        ))
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Add to record hashes
+            cursor.execute("""
+                INSERT INTO record_hashes (record_type, record_hash, record_id, table_name)
+                VALUES (?, ?, ?, ?)
+            """, (record_type, record_hash, record_id, table_name))
+            
+            # Add to ghost catalog
+            entity_id = str(record.get(key_fields[0])) if key_fields else str(record_id)
+            entity_name = record.get('name') or record.get('facilityName') or record.get('title')
+            
+            cursor.execute("""
+                INSERT INTO ghost_catalog (entity_type, entity_id, entity_name, content_hash, first_job, last_job, data_snapshot)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(entity_type, entity_id) DO UPDATE SET
+                    content_hash = excluded.content_hash,
+                    last_job = excluded.last_job,
+                    appearances = appearances + 1,
+                    data_snapshot = excluded.data_snapshot,
+                    updated_at = CURRENT_TIMESTAMP
+            """, (
+                record_type,
+                entity_id,
+                entity_name,
+                record_hash,
+                job_number,
+                job_number,
+                json.dumps(record)
+            ))
+            
+            conn.commit()
         
-        conn.commit()
-        conn.close()
+        if self.prefilter:
+            self.prefilter.add(record_type, [record_hash])
+    
+    def dedupe_batch(self, records: List[Dict[str, Any]], record_type: str, key_fields: List[str],
+                     job_number: str, table_name: Optional[str] = None) -> Dict[str, List[Dict]]:
+        """
+        Deduplicate and register a batch of records in one transaction.
+        
+        Hashes every record up front, finds already-known hashes with a single
+        join against a temp table, bumps seen_count/last_seen for known hashes
+        and bulk-inserts new hashes and ghost catalog entries. Records repeated
+        within the batch count as duplicates of their first occurrence.
+        record_hash is unique across record types, so a hash already stored
+        under another type is a duplicate too.
+        
+        With the prefilter enabled only hashes it reports as possibly seen
+        are looked up; the rest are known to be new, unless record_hashes
+        grew past the prefilter's watermark before this transaction read it,
+        in which case every hash is looked up.
+        
+        Returns:
+            {'new': [...], 'duplicate': [...]} in input order
+        """
+        if not records:
+            return {'new': [], 'duplicate': []}
+        
+        hashes = [self.compute_hash(record, key_fields) for record in records]
+        hits = Counter(hashes)
+        now = datetime.now().isoformat()
+        
+        candidates = list(hits)
+        watermark = None
+        if self.prefilter:
+            maybe_seen, watermark = self.prefilter.check_many(candidates)
+            candidates = [h for h, seen in zip(hits, maybe_seen) if seen]
+        
+        with self.pool.connection() as conn, conn:
+            cursor = conn.cursor()
+            
+            # Stage the batch's candidate hashes and look them all up at once
+            cursor.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS dedupe_batch (
+                    record_hash TEXT PRIMARY KEY,
+                    hits INTEGER NOT NULL
+                )
+            """)
+            cursor.execute("DELETE FROM dedupe_batch")
+            
+            # Misses only hold up to the prefilter's watermark; if another
+            # writer got in since, look everything up instead
+            if watermark is not None:
+                latest = cursor.execute("SELECT MAX(id) FROM record_hashes").fetchone()[0] or 0
+                if latest > watermark:
+                    candidates = list(hits)
+            
+            cursor.executemany("INSERT INTO dedupe_batch (record_hash, hits) VALUES (?, ?)",
+                               [(h, hits[h]) for h in candidates])
+            
+            existing = set()
+            if candidates:
+                cursor.execute("""
+                    SELECT rh.record_hash
+                    FROM record_hashes rh
+                    JOIN dedupe_batch b ON rh.record_hash = b.record_hash
+                """)
+                existing = {row[0] for row in cursor.fetchall()}
+            
+            # Partition, keeping the first occurrence of each unseen hash as new
+            new_records, duplicates = [], []
+            new_hashes = {}
+            for record, record_hash in zip(records, hashes):
+                if record_hash in existing or record_hash in new_hashes:
+                    duplicates.append(record)
+                else:
+                    new_hashes[record_hash] = record
+                    new_records.append(record)
+            
+            # Known hashes: one set-based update for the whole batch
+            cursor.execute("""
+                UPDATE record_hashes
+                SET last_seen = ?,
+                    seen_count = seen_count + (
+                        SELECT hits FROM dedupe_batch b WHERE b.record_hash = record_hashes.record_hash
+                    )
+                WHERE record_hash IN (SELECT record_hash FROM dedupe_batch)
+            """, (now,))
+            
+            # New hashes, counting repeats within this batch
+            cursor.executemany("""
+                INSERT INTO record_hashes (record_type, record_hash, record_id, table_name, seen_count)
+                VALUES (?, ?, ?, ?, ?)
+            """, [
+                (record_type, record_hash, None, table_name, hits[record_hash])
+                for record_hash in new_hashes
+            ])
+            
+            cursor.executemany("""
+                INSERT INTO ghost_catalog (entity_type, entity_id, entity_name, content_hash, first_job, last_job, data_snapshot)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(entity_type, entity_id) DO UPDATE SET
+                    content_hash = excluded.content_hash,
+                    last_job = excluded.last_job,
+                    appearances = appearances + 1,
+                    data_snapshot = excluded.data_snapshot,
+                    updated_at = CURRENT_TIMESTAMP
+            """, [
+                (
+                    record_type,
+                    str(record.get(key_fields[0])) if key_fields else record_hash,
+                    record.get('name') or record.get('facilityName') or record.get('title'),
+                    record_hash,
+                    job_number,
+                    job_number,
+                    json.dumps(record)
+                )
+                for record_hash, record in new_hashes.items()
+            ])
+            
+            cursor.execute("""
+                INSERT INTO job_logs (job_number, level, message, metadata)
+                VALUES (?, ?, ?, ?)
+            """, (
+                job_number,
+                'info',
+                f'Deduplicated {len(records)} {record_type} records: {len(new_records)} new, {len(duplicates)} duplicate',
+                json.dumps({'record_type': record_type, 'new': len(new_records), 'duplicate': len(duplicates)})
+            ))
+            
+            cursor.execute("DELETE FROM dedupe_batch")
+        
+        if self.prefilter:
+            self.prefilter.add(record_type, list(new_hashes))
+        
+        return {'new': new_records, 'duplicate': duplicates}
     
     def complete_job(self, job_number: str, status: str = 'completed', 
                     records_fetched: int = 0, records_new: int = 0, 
                     records_duplicate: int = 0, bytes_downloaded: int = 0,
                     error_message: Optional[str] = None):
         """Mark job as complete with stats."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            UPDATE job_history 
-            SET end_time = ?, status = ?, records_fetched = ?, 
-                records_new = ?, records_duplicate = ?, bytes_downloaded = ?,
-                error_message = ?
-            WHERE job_number = ?
-        """, (
-            datetime.now().isoformat(),
-            status,
-            records_fetched,
-            records_new,
-            records_duplicate,
-            bytes_downloaded,
-            error_message,
-            job_number
-        ))
-        
-        conn.commit()
-        conn.close()
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                UPDATE job_history 
+                SET end_time = ?, status = ?, records_fetched = ?, 
+                    records_new = ?, records_duplicate = ?, bytes_downloaded = ?,
+                    error_message = ?
+                WHERE job_number = ?
+            """, (
+                datetime.now().isoformat(),
+                status,
+                records_fetched,
+                records_new,
+                records_duplicate,
+                bytes_downloaded,
+                error_message,
+                job_number
+            ))
+            
+            conn.commit()
         
         self.log_job(job_number, 'info', 
                     f'Job completed: {records_new} new, {records_duplicate} duplicate records')
+        
+        # Persist the prefilter so the next startup only reads newer hashes
+        if self.prefilter:
+            self.prefilter.save()
     
     def get_job_history(self, limit: int = 100) -> List[Dict]:
         """Get recent job history."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT * FROM job_history 
-            ORDER BY start_time DESC 
-            LIMIT ?
-        """, (limit,))
-        
-        jobs = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        with self.pool.connection(sqlite3.Row) as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT * FROM job_history 
+                ORDER BY start_time DESC 
+                LIMIT ?
+            """, (limit,))
+            
+            jobs = [dict(row) for row in cursor.fetchall()]
         
         return jobs
     
     def get_job_logs(self, job_number: str) -> List[Dict]:
         """Get logs for a specific job."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT * FROM job_logs 
-            WHERE job_number = ? 
-            ORDER BY timestamp ASC
-        """, (job_number,))
-        
-        logs = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        with self.pool.connection(sqlite3.Row) as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT * FROM job_logs 
+                WHERE job_number = ? 
+                ORDER BY timestamp ASC
+            """, (job_number,))
+            
+            logs = [dict(row) for row in cursor.fetchall()]
         
         return logs
     
     def get_ghost_catalog(self, entity_type: Optional[str] = None, limit: int = 100) -> List[Dict]:
         """Get entries from ghost catalog."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        if entity_type:
-            cursor.execute("""
-                SELECT * FROM ghost_catalog 
-                WHERE entity_type = ?
-                ORDER BY updated_at DESC 
-                LIMIT ?
-            """, (entity_type, limit))
-        else:
-            cursor.execute("""
-                SELECT * FROM ghost_catalog 
-                ORDER BY updated_at DESC 
-                LIMIT ?
-            """, (limit,))
-        
-        entries = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        with self.pool.connection(sqlite3.Row) as conn:
+            cursor = conn.cursor()
+            
+            if entity_type:
+                cursor.execute("""
+                    SELECT * FROM ghost_catalog 
+                    WHERE entity_type = ?
+                    ORDER BY updated_at DESC 
+                    LIMIT ?
+                """, (entity_type, limit))
+            else:
+                cursor.execute("""
+                    SELECT * FROM ghost_catalog 
+                    ORDER BY updated_at DESC 
+                    LIMIT ?
+                """, (limit,))
+            
+            entries = [dict(row) for row in cursor.fetchall()]
         
         return entries
     
     def get_stats(self) -> Dict:
         """Get deduplication and ghost catalog stats."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Total jobs
-        cursor.execute("SELECT COUNT(*) FROM job_history")
-        total_jobs = cursor.fetchone()[0]
-        
-        # Total records in ghost catalog
-        cursor.execute("SELECT COUNT(*) FROM ghost_catalog")
-        total_entities = cursor.fetchone()[0]
-        
-        # Total duplicates caught
-        cursor.execute("SELECT SUM(records_duplicate) FROM job_history")
-        total_duplicates = cursor.fetchone()[0] or 0
-        
-        # Active vs ghosted entities
-        cursor.execute("SELECT status, COUNT(*) FROM ghost_catalog GROUP BY status")
-        status_counts = {row[0]: row[1] for row in cursor.fetchall()}
-        
-        conn.close()
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Total jobs
+            cursor.execute("SELECT COUNT(*) FROM job_history")
+            total_jobs = cursor.fetchone()[0]
+            
+            # Total records in ghost catalog
+            cursor.execute("SELECT COUNT(*) FROM ghost_catalog")
+            total_entities = cursor.fetchone()[0]
+            
+            # Total duplicates caught
+            cursor.execute("SELECT SUM(records_duplicate) FROM job_history")
+            total_duplicates = cursor.fetchone()[0] or 0
+            
+            # Active vs ghosted entities
+            cursor.execute("SELECT status, COUNT(*) FROM ghost_catalog GROUP BY status")
+            status_counts = {row[0]: row[1] for row in cursor.fetchall()}
+            
         
         return {
             'total_jobs': total_jobs,
@@ -10,6 +10,9 @@ from datetime import datetime
 import argparse
 import json
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from db_pool import get_pool
+
 def log_ingestion(
     source_name: str,
     status: str,
@@ -35,62 +38,59 @@ def log_ingestion(
     db_path = os.path.join(os.path.dirname(__file__), '..', 'local.db')
     
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Get data source ID
-        cursor.execute("SELECT id FROM data_sources WHERE title LIKE ?", (f'%{source_name}%',))
-        result = cursor.fetchone()
-        
-        if not result:
-            print(f"⚠️  Data source '{source_name}' not found in database")
-            # Still log with NULL source_id
-            source_id = None
-        else:
-            source_id = result[0]
-        
-        # Insert log
-        cursor.execute("""
-            INSERT INTO ingestion_logs (
-                data_source_id,
-                started_at,
+        with get_pool(db_path).connection() as conn:
+            cursor = conn.cursor()
+            
+            # Get data source ID
+            cursor.execute("SELECT id FROM data_sources WHERE title LIKE ?", (f'%{source_name}%',))
+            result = cursor.fetchone()
+            
+            if not result:
+                print(f"⚠️  Data source '{source_name}' not found in database")
+                # Still log with NULL source_id
+                source_id = None
+            else:
+                source_id = result[0]
+            
+            # Insert log
+            cursor.execute("""
+                INSERT INTO ingestion_logs (
+                    data_source_id,
+                    started_at,
+                    status,
+                    records_inserted,
+                    records_updated,
+                    records_skipped,
+                    error_message,
+                    execution_time_ms
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                source_id,
+                datetime.utcnow().isoformat(),
                 status,
                 records_inserted,
                 records_updated,
                 records_skipped,
                 error_message,
                 execution_time_ms
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            source_id,
-            datetime.utcnow().isoformat(),
-            status,
-            records_inserted,
-            records_updated,
-            records_skipped,
-            error_message,
-            execution_time_ms
-        ))
-        
-        conn.commit()
-        log_id = cursor.lastrowid
-        
-        print(f"✅ Logged ingestion #{log_id} for '{source_name}' - Status: {status}")
-        
-        if status == 'success':
-            print(f"   📊 Inserted: {records_inserted}, Updated: {records_updated}, Skipped: {records_skipped}")
-        
-        if error_message:
-            print(f"   ❌ Error: {error_message}")
-        
-        return log_id
+            ))
+            
+            conn.commit()
+            log_id = cursor.lastrowid
+            
+            print(f"✅ Logged ingestion #{log_id} for '{source_name}' - Status: {status}")
+            
+            if status == 'success':
+                print(f"   📊 Inserted: {records_inserted}, Updated: {records_updated}, Skipped: {records_skipped}")
+            
+            if error_message:
+                print(f"   ❌ Error: {error_message}")
+            
+            return log_id
         
     except sqlite3.Error as e:
         print(f"❌ Database error: {e}")
         return None
-    finally:
-        if conn:
-            conn.close()
 
 
 def main():
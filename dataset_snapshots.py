@@ -0,0 +1,254 @@
+"""
+Versioned columnar snapshots of the Hippocratic analysis dataset.
+
+After each ingestion the facilities, financials and merged frames (see
+pandas_analyzer.FrameCache) are written next to the database as one
+snapshot version per data fingerprint:
+    
+    local.snapshots/
+        latest.json                 manifest of the newest version
+        <fingerprint>/
+            manifest.json
+            facilities.arrow        uncompressed Arrow IPC files
+            financials.arrow        (or .parquet with fmt='parquet')
+            merged.arrow
+
+Arrow IPC snapshots are memory-mapped on load, so numeric and string
+columns reach pandas without a row-by-row SQLite conversion or a copy.
+Readers ask for the version matching their current data fingerprint and
+fall back to SQLite when there is none (or pyarrow is not installed).
+
+Usage:
+    write_snapshot('local.db', fingerprint, frames)
+    frames = load_snapshot('local.db', fingerprint)   # None if not exported
+"""
+
+import os
+import json
+import shutil
+import threading
+import pandas as pd
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+SNAPSHOT_TABLES = ('facilities', 'financials', 'merged')
+SNAPSHOT_FORMATS = {'arrow': '.arrow', 'parquet': '.parquet'}
+DEFAULT_FORMAT = 'arrow'
+
+# Snapshot versions kept per database (the newest ones)
+SNAPSHOT_RETENTION = 3
+
+_WRITE_LOCK = threading.Lock()
+
+
+def snapshot_root(db_path: str) -> Path:
+    """Snapshot directory for a database, e.g. local.snapshots next to local.db."""
+    db = Path(db_path)
+    return db.with_name(f"{db.stem}.snapshots")
+
+
+def _read_manifest(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path: Path, data: Dict[str, Any]):
+    """Write JSON atomically (readers never see a partial file)."""
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _write_table(df: pd.DataFrame, path: Path, fmt: str):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if fmt == 'parquet':
+        pq.write_table(table, path)
+    else:
+        # Uncompressed so the file can be memory-mapped without decoding
+        with pa.OSFile(str(path), 'wb') as sink, ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def write_snapshot(db_path: str, fingerprint: str, frames: Dict[str, pd.DataFrame],
+                   fmt: str = DEFAULT_FORMAT) -> Dict[str, Any]:
+    """
+    Write frames as the snapshot version for a data fingerprint.
+    
+    Args:
+        db_path: Database the frames were read from
+        fingerprint: db_pool data fingerprint of that database
+        frames: Table name -> DataFrame (normally SNAPSHOT_TABLES)
+        fmt: 'arrow' (memory-mappable IPC) or 'parquet'
+    
+    Returns:
+        The version manifest, with 'exported' False when that version
+        already existed in this format
+    """
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("pyarrow is required for dataset snapshots (pip install pyarrow)")
+    if fmt not in SNAPSHOT_FORMATS:
+        raise ValueError(f"Unknown snapshot format: {fmt}")
+    
+    root = snapshot_root(db_path)
+    version_dir = root / fingerprint
+    
+    with _WRITE_LOCK:
+        manifest = _read_manifest(version_dir / 'manifest.json')
+        if manifest and manifest.get('format') == fmt:
+            return {**manifest, 'exported': False}
+        
+        # Build the version in a scratch directory, then move it into place
+        root.mkdir(parents=True, exist_ok=True)
+        tmp_dir = root / f".{fingerprint}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir()
+        
+        started = datetime.now()
+        tables = {}
+        for name, df in frames.items():
+            filename = f"{name}{SNAPSHOT_FORMATS[fmt]}"
+            _write_table(df, tmp_dir / filename, fmt)
+            tables[name] = {
+                'file': filename,
+                'rows': len(df),
+                'columns': list(df.columns),
+                'bytes': (tmp_dir / filename).stat().st_size
+            }
+        
+        manifest = {
+            'data_fingerprint': fingerprint,
+            'format': fmt,
+            'tables': tables,
+            'created_at': datetime.now().isoformat(),
+            'duration_ms': round((datetime.now() - started).total_seconds() * 1000, 1)
+        }
+        _write_json(tmp_dir / 'manifest.json', manifest)
+        
+        shutil.rmtree(version_dir, ignore_errors=True)
+        try:
+            os.replace(tmp_dir, version_dir)
+        except OSError:
+            # Another process exported this version first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            manifest = _read_manifest(version_dir / 'manifest.json') or manifest
+        
+        _write_json(root / 'latest.json', manifest)
+        prune_snapshots(db_path, keep=fingerprint)
+    
+    return {**manifest, 'exported': True}
+
+
+def list_snapshots(db_path: str) -> List[Dict[str, Any]]:
+    """Manifests of the stored snapshot versions, newest first."""
+    root = snapshot_root(db_path)
+    if not root.is_dir():
+        return []
+    
+    manifests = []
+    for version_dir in root.iterdir():
+        if not version_dir.is_dir() or version_dir.name.startswith('.'):
+            continue  # latest.json and in-progress exports
+        manifest = _read_manifest(version_dir / 'manifest.json')
+        if manifest:
+            manifests.append(manifest)
+    return sorted(manifests, key=lambda m: m['created_at'], reverse=True)
+
+
+def prune_snapshots(db_path: str, retention: int = SNAPSHOT_RETENTION,
+                    keep: Optional[str] = None) -> int:
+    """
+    Delete all but the newest `retention` versions (and never `keep`).
+    
+    Versions still memory-mapped elsewhere may fail to delete on Windows;
+    they are retried on the next prune.
+    """
+    root = snapshot_root(db_path)
+    removed = 0
+    for manifest in list_snapshots(db_path)[retention:]:
+        if manifest['data_fingerprint'] != keep:
+            shutil.rmtree(root / manifest['data_fingerprint'], ignore_errors=True)
+            removed += 1
+    return removed
+
+
+def latest_snapshot(db_path: str) -> Optional[Dict[str, Any]]:
+    """Manifest of the most recently exported version, or None."""
+    return _read_manifest(snapshot_root(db_path) / 'latest.json')
+
+
+def load_table(db_path: str, fingerprint: str, table: str,
+               columns: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+    """
+    Load one table of the snapshot for a fingerprint.
+    
+    Arrow IPC files are memory-mapped and converted per column, so the
+    frame's numeric and string columns share the mapped buffers; treat the
+    result as read-only.
+    
+    Args:
+        db_path: Database the snapshot belongs to
+        fingerprint: Current data fingerprint of that database
+        table: 'facilities', 'financials' or 'merged'
+        columns: Only load these columns (default: all)
+    
+    Returns:
+        The frame, or None if no snapshot matches the fingerprint
+    """
+    if not PYARROW_AVAILABLE:
+        return None
+    
+    version_dir = snapshot_root(db_path) / fingerprint
+    manifest = _read_manifest(version_dir / 'manifest.json')
+    if not manifest or table not in manifest['tables']:
+        return None
+    path = version_dir / manifest['tables'][table]['file']
+    
+    try:
+        if manifest['format'] == 'parquet':
+            arrow_table = pq.read_table(path, columns=columns, memory_map=True)
+        else:
+            arrow_table = ipc.open_file(pa.memory_map(str(path), 'r')).read_all()
+            if columns is not None:
+                arrow_table = arrow_table.select(columns)
+        return arrow_table.to_pandas(split_blocks=True)
+    except (OSError, KeyError, pa.ArrowException) as e:
+        print(f"⚠️  Ignoring unreadable snapshot {path}: {e}")
+        return None
+
+
+def load_snapshot(db_path: str, fingerprint: str) -> Optional[Dict[str, pd.DataFrame]]:
+    """All SNAPSHOT_TABLES for a fingerprint, or None if any is missing."""
+    frames = {}
+    for table in SNAPSHOT_TABLES:
+        df = load_table(db_path, fingerprint, table)
+        if df is None:
+            return None
+        frames[table] = df
+    return frames
+
+
+if __name__ == "__main__":
+    import sys
+    
+    from pandas_analyzer import get_frame_cache
+    
+    db_path = sys.argv[1] if len(sys.argv) > 1 else "local.db"
+    fmt = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_FORMAT
+    
+    manifest = get_frame_cache(db_path).export_snapshot(fmt)
+    print(f"✅ Snapshot {manifest['data_fingerprint']} ({manifest['format']}) in {snapshot_root(db_path)}")
+    for name, info in manifest['tables'].items():
+        print(f"   {name}: {info['rows']} rows, {info['bytes'] / 1024 / 1024:.2f} MB")
@@ -0,0 +1,227 @@
+"""
+Shared SQLite access layer for Hippocratic.
+
+Keeps a small pool of connections per database file so analyzers, the
+deduplicator and the admin server stop paying connect/close (and pragma
+setup) on every call. Connections are opened with WAL journaling, tuned
+pragmas and a large prepared-statement cache, and are reused across calls
+and threads.
+
+Usage:
+    pool = get_pool("local.db")
+    with pool.connection() as conn:
+        conn.execute("SELECT COUNT(*) FROM facilities").fetchone()
+
+    with pool.connection() as conn, conn:   # one transaction
+        conn.executemany("INSERT ...", rows)
+
+Pools can be tuned per db_configs.json entry with an optional "pool" key:
+    "main": {"type": "sqlite", "path": "local.db",
+             "pool": {"size": 8, "pragmas": {"cache_size": -128000}}}
+"""
+
+import hashlib
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+# Applied once per connection, in this order
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',     # safe with WAL, avoids an fsync per commit
+    'cache_size': -64000,        # negative = KiB, i.e. 64 MB page cache
+    'mmap_size': 268435456,      # 256 MB memory-mapped reads
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,
+}
+
+DEFAULT_POOL_SIZE = 8
+STATEMENT_CACHE_SIZE = 256
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of SQLite connections to one database file.
+    
+    Connections are created lazily up to `size`; callers beyond that block
+    until one is returned. A connection is only ever used by one thread at
+    a time, so they are opened with check_same_thread=False and handed
+    between threads freely.
+    """
+    
+    def __init__(self, db_path: str, size: int = DEFAULT_POOL_SIZE,
+                 pragmas: Optional[Dict[str, Any]] = None, timeout: float = 30.0):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self.pragmas = {**DEFAULT_PRAGMAS, **(pragmas or {})}
+        
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._all = []
+        self._lock = threading.Lock()
+        self._closed = False
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open a new connection and apply the pool's pragmas."""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        for name, value in self.pragmas.items():
+            try:
+                conn.execute(f"PRAGMA {name} = {value}")
+            except sqlite3.DatabaseError:
+                # e.g. WAL on a read-only file; keep the connection usable
+                pass
+        
+        with self._lock:
+            self._all.append(conn)
+        return conn
+    
+    def acquire(self, row_factory=None) -> sqlite3.Connection:
+        """Take a connection from the pool (blocking up to `timeout`)."""
+        if self._closed:
+            raise RuntimeError(f"Connection pool for {self.db_path} is closed")
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No free connection for {self.db_path} after {self.timeout}s")
+        
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                conn = self._connect()
+            except Exception:
+                self._slots.release()
+                raise
+        
+        conn.row_factory = row_factory
+        return conn
+    
+    def release(self, conn: sqlite3.Connection):
+        """Return a connection to the pool, rolling back any open transaction."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = None
+            if self._closed:
+                conn.close()
+            else:
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+    
+    @contextmanager
+    def connection(self, row_factory=None):
+        """
+        Borrow a connection for the duration of a with-block.
+        
+        Uncommitted work is rolled back on release; use `with conn:` inside
+        the block (or call conn.commit()) to commit.
+        """
+        conn = self.acquire(row_factory)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+    
+    def close(self):
+        """Close all idle connections; busy ones are closed when released."""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+    
+    def stats(self) -> Dict[str, Any]:
+        """Pool size and usage counters."""
+        return {
+            'db_path': self.db_path,
+            'size': self.size,
+            'open': len(self._all),
+            'idle': self._idle.qsize(),
+        }
+
+
+# Process-wide pools keyed by resolved database path
+_POOLS: Dict[str, ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def _pool_key(db_path: str) -> str:
+    if db_path == ':memory:' or db_path.startswith('file:'):
+        return db_path
+    return str(Path(db_path).resolve())
+
+
+def get_pool(db_path: str = "local.db", size: Optional[int] = None,
+             pragmas: Optional[Dict[str, Any]] = None) -> ConnectionPool:
+    """
+    Get the shared pool for a database file, creating it on first use.
+    
+    `size` and `pragmas` only take effect when the pool is created.
+    """
+    key = _pool_key(str(db_path))
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None or pool._closed:
+            pool = ConnectionPool(key, size=size or DEFAULT_POOL_SIZE, pragmas=pragmas)
+            _POOLS[key] = pool
+        return pool
+
+
+def pool_for_config(db_config: Dict[str, Any], base_dir: Optional[str] = None) -> Optional[ConnectionPool]:
+    """
+    Get the pool for a db_configs.json entry, or None for non-SQLite entries.
+    
+    Relative paths are resolved against base_dir when given.
+    """
+    if db_config.get('type', 'sqlite') != 'sqlite':
+        return None
+    
+    path = db_config.get('path') or 'local.db'
+    if base_dir and not Path(path).is_absolute():
+        path = str(Path(base_dir) / path)
+    
+    options = db_config.get('pool', {})
+    return get_pool(path, size=options.get('size'), pragmas=options.get('pragmas'))
+
+
+def close_all_pools():
+    """Close every shared pool (e.g. at process shutdown)."""
+    with _POOLS_LOCK:
+        for pool in _POOLS.values():
+            pool.close()
+        _POOLS.clear()
+
+
+def compute_data_fingerprint(conn: sqlite3.Connection,
+                             tables: Tuple[str, ...] = ('facilities', 'financials')) -> str:
+    """
+    Fingerprint the source tables so cached results can be invalidated.
+    Combines row count, max rowid and max updated_at (or created_at) per table.
+    """
+    cursor = conn.cursor()
+    parts = []
+    
+    for table in tables:
+        columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+        if not columns:
+            parts.append(f"{table}:missing")
+            continue
+        
+        ts_col = 'updated_at' if 'updated_at' in columns else 'created_at' if 'created_at' in columns else None
+        ts_expr = f"MAX({ts_col})" if ts_col else "NULL"
+        
+        count, max_rowid, max_ts = cursor.execute(
+            f"SELECT COUNT(*), MAX(rowid), {ts_expr} FROM {table}"
+        ).fetchone()
+        parts.append(f"{table}:{count}:{max_rowid}:{max_ts}")
+    
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()[:16]
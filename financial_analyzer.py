@@ -7,317 +7,483 @@ import sys
 sys.stdout.reconfigure(encoding='utf-8')
 
 import sqlite3
-import statistics
+import base64
+import threading
+import time
+import numpy as np
 from typing import Dict, List, Any, Tuple, Optional
 from datetime import datetime
 import json
 
+from db_pool import get_pool, compute_data_fingerprint
+from dataset_snapshots import load_table
+
+# Alert types maintained by save_fraud_alerts: analysis key, description, metrics
+ALERT_TYPES = {
+    'high_revenue_per_patient': (
+        'high_revenue_low_patients',
+        lambda a: f"Revenue per visit: ${a['revenue_per_visit']:.2f} (Z-score: {a['z_score']:.2f})",
+        lambda a: {'revenue': a['revenue'], 'total_visits': a['total_visits'], 'z_score': a['z_score']},
+    ),
+    'extreme_profit_margin': (
+        'extreme_profit_margins',
+        lambda a: f"Profit margin: {a['margin_pct']:.1f}% (Revenue: ${a['revenue']:,.0f})",
+        lambda a: {'revenue': a['revenue'], 'net_income': a['net_income'], 'margin': a['profit_margin']},
+    ),
+}
+
+# Significant digits compared when deciding whether an alert's metrics
+# changed; the SQL and snapshot paths can differ in the last bit
+METRIC_PRECISION = 9
+
+
+def _rounded_metrics(metrics: Dict) -> Dict:
+    """Alert metrics with numbers rounded to METRIC_PRECISION significant digits."""
+    return {
+        key: f"{value:.{METRIC_PRECISION}g}" if isinstance(value, (int, float)) and not isinstance(value, bool) else value
+        for key, value in metrics.items()
+    }
+
+# Alert severities, most severe first; the listing sorts on this rank because
+# the severity strings themselves don't sort by severity
+SEVERITY_RANK = {'critical': 4, 'high': 3, 'medium': 2, 'low': 1}
+SEVERITY_RANK_SQL = "(CASE severity {} ELSE 0 END)".format(
+    " ".join(f"WHEN '{name}' THEN {rank}" for name, rank in SEVERITY_RANK.items())
+)
+
+# Analysis snapshots kept in analysis_snapshots (older ones are pruned)
+SNAPSHOT_RETENTION = 5
+
+# Databases whose analysis tables were already created by this process
+_INITIALIZED_DBS = set()
+_INIT_LOCK = threading.Lock()
+
+
+def encode_cursor(values: Tuple) -> str:
+    """Opaque keyset-pagination cursor for an alert's sort key."""
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple:
+    """Inverse of encode_cursor; raises ValueError on a malformed cursor."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(values, list) or len(values) != 3:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return tuple(values)
+
+
 class FinancialAnalyzer:
     """Analyze healthcare financial data for fraud detection."""
     
     def __init__(self, db_path: str = "local.db"):
         self.db_path = db_path
-        self.init_analysis_tables()
+        self.pool = get_pool(db_path)
+        
+        # DDL runs once per database per process, not per construction
+        with _INIT_LOCK:
+            if self.pool.db_path not in _INITIALIZED_DBS:
+                self.init_analysis_tables()
+                _INITIALIZED_DBS.add(self.pool.db_path)
     
     def init_analysis_tables(self):
         """Initialize tables for financial analysis results."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Fraud alerts table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS fraud_alerts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                alert_type TEXT NOT NULL,
-                severity TEXT NOT NULL,
-                facility_id INTEGER,
-                facility_name TEXT,
-                description TEXT,
-                metrics TEXT,
-                detected_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                status TEXT DEFAULT 'new',
-                investigated_by TEXT,
-                notes TEXT
-            )
-        """)
-        
-        # Financial metrics table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS financial_metrics (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                facility_id INTEGER,
-                metric_type TEXT NOT NULL,
-                metric_value REAL,
-                percentile REAL,
-                z_score REAL,
-                is_outlier BOOLEAN,
-                calculated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Cluster analysis table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS facility_clusters (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                facility_id INTEGER,
-                cluster_id INTEGER,
-                cluster_type TEXT,
-                shared_attributes TEXT,
-                risk_score REAL,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        conn.commit()
-        conn.close()
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Fraud alerts table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS fraud_alerts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    alert_type TEXT NOT NULL,
+                    severity TEXT NOT NULL,
+                    facility_id TEXT,
+                    facility_name TEXT,
+                    description TEXT,
+                    metrics TEXT,
+                    detected_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    status TEXT DEFAULT 'new',
+                    investigated_by TEXT,
+                    notes TEXT,
+                    updated_at DATETIME,
+                    closed_at DATETIME
+                )
+            """)
+            
+            # Columns added after the table was first created
+            columns = {row[1] for row in cursor.execute("PRAGMA table_info(fraud_alerts)")}
+            for column in ('updated_at', 'closed_at'):
+                if column not in columns:
+                    cursor.execute(f"ALTER TABLE fraud_alerts ADD COLUMN {column} DATETIME")
+            
+            has_facilities = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'facilities'"
+            ).fetchone()
+            if self._facility_id_to_text(cursor, 'fraud_alerts') and has_facilities:
+                # Restore ids whose leading zeros INTEGER affinity stripped
+                cursor.execute("""
+                    UPDATE fraud_alerts
+                    SET facility_id = (
+                        SELECT f.id FROM facilities f
+                        WHERE f.name = fraud_alerts.facility_name
+                        AND f.id <> fraud_alerts.facility_id
+                        AND CAST(f.id AS INTEGER) = CAST(fraud_alerts.facility_id AS INTEGER)
+                    )
+                    WHERE (
+                        SELECT COUNT(*) FROM facilities f
+                        WHERE f.name = fraud_alerts.facility_name
+                        AND f.id <> fraud_alerts.facility_id
+                        AND CAST(f.id AS INTEGER) = CAST(fraud_alerts.facility_id AS INTEGER)
+                    ) = 1
+                """)
+            
+            # Alert identity for save_fraud_alerts, and the get_fraud_alerts scan;
+            # id is the keyset tiebreaker (replaces idx_fraud_alerts_status)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_fraud_alerts_key
+                ON fraud_alerts(alert_type, facility_id)
+            """)
+            cursor.execute("DROP INDEX IF EXISTS idx_fraud_alerts_status")
+            cursor.execute("DROP INDEX IF EXISTS idx_fraud_alerts_listing")
+            cursor.execute(f"""
+                CREATE INDEX IF NOT EXISTS idx_fraud_alerts_rank
+                ON fraud_alerts(status, {SEVERITY_RANK_SQL}, detected_at, id)
+            """)
+            
+            # Financial metrics table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS financial_metrics (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    facility_id TEXT,
+                    metric_type TEXT NOT NULL,
+                    metric_value REAL,
+                    percentile REAL,
+                    z_score REAL,
+                    is_outlier BOOLEAN,
+                    calculated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            # Cluster analysis table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS facility_clusters (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    facility_id TEXT,
+                    cluster_id INTEGER,
+                    cluster_type TEXT,
+                    shared_attributes TEXT,
+                    risk_score REAL,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            for table in ('financial_metrics', 'facility_clusters'):
+                self._facility_id_to_text(cursor, table)
+            
+            # Materialized run_full_analysis results (see compute_snapshot)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS analysis_snapshots (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    data_fingerprint TEXT NOT NULL,
+                    results TEXT NOT NULL,
+                    duration_ms REAL,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            conn.commit()
+    
+    @staticmethod
+    def _facility_id_to_text(cursor, table: str) -> bool:
+        """
+        Rebuild a table created with facility_id INTEGER so it stores TEXT ids.
+        
+        facilities.id is TEXT; with INTEGER affinity "0123" was stored as 123.
+        Indexes are dropped with the old table and recreated by the caller.
+        
+        Returns:
+            True if the table was migrated
+        """
+        columns = [(row[1], row[2].upper()) for row in cursor.execute(f"PRAGMA table_info({table})")]
+        if ('facility_id', 'INTEGER') not in columns:
+            return False
+        
+        create_sql = cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone()[0]
+        names = ', '.join(name for name, _ in columns)
+        selected = ', '.join('CAST(facility_id AS TEXT)' if name == 'facility_id' else name for name, _ in columns)
+        
+        cursor.execute(create_sql.replace(table, f"{table}_migrated", 1)
+                                 .replace('facility_id INTEGER', 'facility_id TEXT', 1))
+        cursor.execute(f"INSERT INTO {table}_migrated ({names}) SELECT {selected} FROM {table}")
+        cursor.execute(f"DROP TABLE {table}")
+        cursor.execute(f"ALTER TABLE {table}_migrated RENAME TO {table}")
+        return True
     
-    def get_dataset_stats(self) -> Dict[str, Any]:
+    def get_dataset_stats(self, frame: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, Any]:
         """Get statistics about the dataset."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        stats = {}
-        
-        # Total facilities
-        cursor.execute("SELECT COUNT(*) FROM facilities")
-        stats['total_facilities'] = cursor.fetchone()[0]
-        
-        # Total financials
-        cursor.execute("SELECT COUNT(*) FROM financials")
-        stats['total_financials'] = cursor.fetchone()[0]
-        
-        # Facilities with financials
-        cursor.execute("""
-            SELECT COUNT(DISTINCT f.id) 
-            FROM facilities f 
-            JOIN financials fin ON f.license_number = fin.license_number
-        """)
-        stats['facilities_with_financials'] = cursor.fetchone()[0]
-        
-        # Total revenue
-        cursor.execute("""
-            SELECT SUM(total_revenue)
-            FROM financials 
-            WHERE total_revenue IS NOT NULL
-        """)
-        result = cursor.fetchone()[0]
-        stats['total_revenue'] = result if result else 0
-        
-        # Revenue statistics
-        cursor.execute("""
-            SELECT 
-                AVG(total_revenue),
-                MIN(total_revenue),
-                MAX(total_revenue)
-            FROM financials 
-            WHERE total_revenue IS NOT NULL 
-            AND total_revenue > 0
-        """)
-        avg, min_rev, max_rev = cursor.fetchone()
-        stats['avg_revenue'] = avg if avg else 0
-        stats['min_revenue'] = min_rev if min_rev else 0
-        stats['max_revenue'] = max_rev if max_rev else 0
-        
-        conn.close()
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            
+            stats = {}
+            
+            # Total facilities
+            cursor.execute("SELECT COUNT(*) FROM facilities")
+            stats['total_facilities'] = cursor.fetchone()[0]
+            
+            # Total financials
+            cursor.execute("SELECT COUNT(*) FROM financials")
+            stats['total_financials'] = cursor.fetchone()[0]
+            
+            # Facilities with financials
+            if frame is not None:
+                stats['facilities_with_financials'] = len(set(frame['id'].tolist()))
+            else:
+                cursor.execute("""
+                    SELECT COUNT(DISTINCT f.id) 
+                    FROM facilities f 
+                    JOIN financials fin ON f.license_number = fin.license_number
+                """)
+                stats['facilities_with_financials'] = cursor.fetchone()[0]
+            
+            # Total revenue
+            cursor.execute("""
+                SELECT SUM(total_revenue)
+                FROM financials 
+                WHERE total_revenue IS NOT NULL
+            """)
+            result = cursor.fetchone()[0]
+            stats['total_revenue'] = result if result else 0
+            
+            # Revenue statistics
+            cursor.execute("""
+                SELECT 
+                    AVG(total_revenue),
+                    MIN(total_revenue),
+                    MAX(total_revenue)
+                FROM financials 
+                WHERE total_revenue IS NOT NULL 
+                AND total_revenue > 0
+            """)
+            avg, min_rev, max_rev = cursor.fetchone()
+            stats['avg_revenue'] = avg if avg else 0
+            stats['min_revenue'] = min_rev if min_rev else 0
+            stats['max_revenue'] = max_rev if max_rev else 0
+            
         return stats
     
-    def detect_high_revenue_low_patients(self, threshold: float = 2.0) -> List[Dict]:
+    def load_financial_frame(self) -> Dict[str, np.ndarray]:
+        """
+        Load facilities joined with financials as columns, in one query.
+        
+        Numeric columns are float64 arrays (NULL becomes NaN); text columns
+        are object arrays. Detectors take this frame so run_full_analysis
+        reads the join once. Uses the memory-mapped dataset snapshot when
+        one matches the current data.
+        """
+        frame = self._snapshot_frame()
+        if frame is not None:
+            return frame
+        
+        with self.pool.connection() as conn:
+            rows = conn.execute("""
+                SELECT 
+                    f.id,
+                    f.name,
+                    f.license_number,
+                    f.address,
+                    f.city,
+                    fin.total_revenue,
+                    fin.total_visits,
+                    fin.net_income
+                FROM facilities f
+                JOIN financials fin ON f.license_number = fin.license_number
+                ORDER BY f.rowid, fin.id
+            """).fetchall()
+        
+        columns = list(zip(*rows)) if rows else [()] * 8
+        text = ('id', 'name', 'license_number', 'address', 'city')
+        numeric = ('revenue', 'total_visits', 'net_income')
+        
+        frame = {name: np.array(values, dtype=object) for name, values in zip(text, columns[:5])}
+        frame.update({name: np.array(values, dtype=np.float64) for name, values in zip(numeric, columns[5:])})
+        return frame
+    
+    def _snapshot_frame(self) -> Optional[Dict[str, np.ndarray]]:
+        """load_financial_frame from the dataset snapshot, or None if there is none."""
+        fingerprint = self.data_fingerprint()
+        facilities = load_table(self.pool.db_path, fingerprint, 'facilities',
+                                ['id', 'name', 'license_number', 'address', 'city'])
+        financials = load_table(self.pool.db_path, fingerprint, 'financials',
+                                ['id', 'license_number', 'total_revenue', 'total_visits', 'net_income'])
+        if facilities is None or financials is None:
+            return None
+        
+        # Inner join; NULL licenses never match, as in SQL. Snapshot rows are
+        # in rowid order, so sort on (facility position, financial id) to get
+        # the SQL path's row order and bit-identical detector results
+        facilities = facilities.assign(facility_pos=np.arange(len(facilities)))
+        joined = facilities[facilities['license_number'].notna()].merge(
+            financials[financials['license_number'].notna()].rename(columns={'id': 'financial_id'}),
+            on='license_number'
+        ).sort_values(['facility_pos', 'financial_id'], kind='stable')
+        
+        frame = {}
+        for name in ('id', 'name', 'license_number', 'address', 'city'):
+            values = joined[name].astype(object)
+            frame[name] = values.where(values.notna(), None).to_numpy()
+        for name, column in (('revenue', 'total_revenue'), ('total_visits', 'total_visits'),
+                             ('net_income', 'net_income')):
+            frame[name] = joined[column].to_numpy(dtype=np.float64)
+        return frame
+    
+    def detect_high_revenue_low_patients(self, threshold: float = 2.0,
+                                         frame: Optional[Dict[str, np.ndarray]] = None) -> List[Dict]:
         """Find facilities with unusually high revenue per patient."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        # Get facilities with financial data
-        cursor.execute("""
-            SELECT 
-                f.id,
-                f.name,
-                f.license_number,
-                f.address,
-                f.city,
-                fin.total_revenue as revenue,
-                fin.total_visits as total_visits,
-                fin.total_revenue / NULLIF(fin.total_visits, 0) as revenue_per_visit
-            FROM facilities f
-            JOIN financials fin ON f.license_number = fin.license_number
-            WHERE fin.total_revenue IS NOT NULL
-            AND fin.total_visits IS NOT NULL
-            AND fin.total_revenue > 0
-            AND fin.total_visits > 0
-        """)
-        
-        records = cursor.fetchall()
-        
-        if not records:
-            conn.close()
-            return []
-        
-        # Calculate revenue per visit statistics
-        rev_per_visits = [r['revenue_per_visit'] for r in records if r['revenue_per_visit']]
+        frame = frame if frame is not None else self.load_financial_frame()
         
-        if not rev_per_visits:
-            conn.close()
+        # NaN comparisons are False, so NULL revenue/visits drop out here
+        with np.errstate(invalid='ignore'):
+            rows = np.flatnonzero((frame['revenue'] > 0) & (frame['total_visits'] > 0))
+        if not len(rows):
             return []
         
-        mean = statistics.mean(rev_per_visits)
-        stdev = statistics.stdev(rev_per_visits) if len(rev_per_visits) > 1 else 0
+        revenue_per_visit = frame['revenue'][rows] / frame['total_visits'][rows]
+        mean = revenue_per_visit.mean()
+        stdev = revenue_per_visit.std(ddof=1) if len(rows) > 1 else 0
+        z_scores = (revenue_per_visit - mean) / stdev if stdev > 0 else np.zeros(len(rows))
+        
+        # Flagged rows, largest |z| first
+        flagged = np.flatnonzero(np.abs(z_scores) > threshold)
+        flagged = flagged[np.argsort(-np.abs(z_scores[flagged]), kind='stable')]
         
         alerts = []
-        for record in records:
-            if record['revenue_per_visit']:
-                z_score = (record['revenue_per_visit'] - mean) / stdev if stdev > 0 else 0
-                
-                if abs(z_score) > threshold:
-                    alert = {
-                        'facility_id': record['id'],
-                        'facility_name': record['name'],
-                        'license': record['license_number'],
-                        'address': f"{record['address']}, {record['city']}",
-                        'revenue': record['revenue'],
-                        'total_visits': record['total_visits'],
-                        'revenue_per_visit': record['revenue_per_visit'],
-                        'z_score': z_score,
-                        'severity': 'high' if abs(z_score) > 3 else 'medium'
-                    }
-                    alerts.append(alert)
-        
-        # Sort by z_score descending
-        alerts.sort(key=lambda x: abs(x['z_score']), reverse=True)
-        
-        conn.close()
+        for i in flagged.tolist():
+            row = rows[i]
+            z_score = float(z_scores[i])
+            alerts.append({
+                'facility_id': frame['id'][row],
+                'facility_name': frame['name'][row],
+                'license': frame['license_number'][row],
+                'address': f"{frame['address'][row]}, {frame['city'][row]}",
+                'revenue': float(frame['revenue'][row]),
+                'total_visits': int(frame['total_visits'][row]),
+                'revenue_per_visit': float(revenue_per_visit[i]),
+                'z_score': z_score,
+                'severity': 'high' if abs(z_score) > 3 else 'medium'
+            })
+        
         return alerts
     
     def detect_duplicate_addresses(self) -> List[Dict]:
         """Find multiple facilities at the same address."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT 
-                address,
-                city,
-                COUNT(*) as facility_count,
-            GROUP_CONCAT(name, ' | ') as facilities,
-            GROUP_CONCAT(license_number, ', ') as licenses
-            FROM facilities
-            WHERE address IS NOT NULL AND address != ''
-            GROUP BY LOWER(address), LOWER(city)
-            HAVING COUNT(*) > 1
-            ORDER BY facility_count DESC
-        """)
-        
-        results = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        with self.pool.connection(sqlite3.Row) as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT 
+                    address,
+                    city,
+                    COUNT(*) as facility_count,
+                GROUP_CONCAT(name, ' | ') as facilities,
+                GROUP_CONCAT(license_number, ', ') as licenses
+                FROM facilities
+                WHERE address IS NOT NULL AND address != ''
+                GROUP BY LOWER(address), LOWER(city)
+                HAVING COUNT(*) > 1
+                ORDER BY facility_count DESC
+            """)
+            
+            results = [dict(row) for row in cursor.fetchall()]
         
         return results
     
     def detect_missing_financials(self) -> List[Dict]:
         """Find facilities without financial data."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT 
-                f.id,
-                f.name,
-                f.license_number,
-                f.address,
-                f.city,
-                f.capacity
-            FROM facilities f
-            LEFT JOIN financials fin ON f.license_number = fin.license_number
-            WHERE fin.id IS NULL
-            AND f.capacity > 10
-            ORDER BY f.capacity DESC
-        """)
-        
-        results = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        with self.pool.connection(sqlite3.Row) as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT 
+                    f.id,
+                    f.name,
+                    f.license_number,
+                    f.address,
+                    f.city,
+                    f.capacity
+                FROM facilities f
+                LEFT JOIN financials fin ON f.license_number = fin.license_number
+                WHERE fin.id IS NULL
+                AND f.capacity > 10
+                ORDER BY f.capacity DESC
+            """)
+            
+            results = [dict(row) for row in cursor.fetchall()]
         
         return results
     
-    def detect_extreme_profit_margins(self, threshold: float = 0.5) -> List[Dict]:
+    def detect_extreme_profit_margins(self, threshold: float = 0.5,
+                                      frame: Optional[Dict[str, np.ndarray]] = None) -> List[Dict]:
         """Find facilities with unusually high or low profit margins."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT 
-                f.id,
-                f.name,
-                f.license_number,
-                fin.total_revenue as revenue,
-                fin.net_income as net_income,
-                fin.net_income / NULLIF(fin.total_revenue, 0) as profit_margin
-            FROM facilities f
-            JOIN financials fin ON f.license_number = fin.license_number
-            WHERE fin.total_revenue IS NOT NULL
-            AND fin.net_income IS NOT NULL
-            AND fin.total_revenue > 0
-        """)
-        
-        records = cursor.fetchall()
+        frame = frame if frame is not None else self.load_financial_frame()
+        
+        with np.errstate(invalid='ignore'):
+            rows = np.flatnonzero((frame['revenue'] > 0) & ~np.isnan(frame['net_income']))
+        margins = frame['net_income'][rows] / frame['revenue'][rows]
+        
+        # Flag if margin > 50% or < -20%, largest |margin| first
+        flagged = np.flatnonzero((margins > threshold) | (margins < -0.2))
+        flagged = flagged[np.argsort(-np.abs(margins[flagged]), kind='stable')]
         
         alerts = []
-        for record in records:
-            if record['profit_margin'] is not None:
-                # Flag if margin > 50% or < -20%
-                if record['profit_margin'] > threshold or record['profit_margin'] < -0.2:
-                    alerts.append({
-                        'facility_id': record['id'],
-                        'facility_name': record['name'],
-                        'license': record['license_number'],
-                        'revenue': record['revenue'],
-                        'net_income': record['net_income'],
-                        'profit_margin': record['profit_margin'],
-                        'margin_pct': record['profit_margin'] * 100,
-                        'severity': 'high' if abs(record['profit_margin']) > 0.7 else 'medium'
-                    })
-        
-        alerts.sort(key=lambda x: abs(x['profit_margin']), reverse=True)
-        
-        conn.close()
+        for i in flagged.tolist():
+            row = rows[i]
+            margin = float(margins[i])
+            alerts.append({
+                'facility_id': frame['id'][row],
+                'facility_name': frame['name'][row],
+                'license': frame['license_number'][row],
+                'revenue': float(frame['revenue'][row]),
+                'net_income': float(frame['net_income'][row]),
+                'profit_margin': margin,
+                'margin_pct': margin * 100,
+                'severity': 'high' if abs(margin) > 0.7 else 'medium'
+            })
+        
         return alerts
     
     def detect_rapid_growth(self, growth_threshold: float = 2.0) -> List[Dict]:
         """Find facilities with rapid revenue growth (if multi-year data available)."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
         # This would need multi-year financial data
         # For now, return empty list
         # TODO: Implement when multi-year data is available
         
-        conn.close()
         return []
     
     def analyze_shared_administrators(self) -> List[Dict]:
         """Find administrators managing multiple facilities."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT 
-                admin_name,
-                COUNT(*) as facility_count,
-                GROUP_CONCAT(name, ' | ') as facilities,
-                SUM(capacity) as total_capacity
-            FROM facilities
-            WHERE admin_name IS NOT NULL 
-            AND admin_name != ''
-            AND admin_name != 'N/A'
-            GROUP BY LOWER(admin_name)
-            HAVING COUNT(*) > 1
-            ORDER BY facility_count DESC
-        """)
-        
-        results = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        with self.pool.connection(sqlite3.Row) as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT 
+                    admin_name,
+                    COUNT(*) as facility_count,
+                    GROUP_CONCAT(name, ' | ') as facilities,
+                    SUM(capacity) as total_capacity
+                FROM facilities
+                WHERE admin_name IS NOT NULL 
+                AND admin_name != ''
+                AND admin_name != 'N/A'
+                GROUP BY LOWER(admin_name)
+                HAVING COUNT(*) > 1
+                ORDER BY facility_count DESC
+            """)
+            
+            results = [dict(row) for row in cursor.fetchall()]
         
         return results
     
@@ -325,14 +491,17 @@ class FinancialAnalyzer:
         """Run all fraud detection analyses."""
         print("🔍 Starting comprehensive financial analysis...")
         
+        # One facilities ⋈ financials load shared by every detector
+        frame = self.load_financial_frame()
+        
         results = {
-            'dataset_stats': self.get_dataset_stats(),
+            'dataset_stats': self.get_dataset_stats(frame),
             'timestamp': datetime.now().isoformat(),
             'analyses': {}
         }
         
         print("  ├─ Analyzing revenue-to-patient ratios...")
-        high_rev_alerts = self.detect_high_revenue_low_patients()
+        high_rev_alerts = self.detect_high_revenue_low_patients(frame=frame)
         results['analyses']['high_revenue_low_patients'] = {
             'count': len(high_rev_alerts),
             'alerts': high_rev_alerts[:20]  # Top 20
@@ -353,7 +522,7 @@ class FinancialAnalyzer:
         }
         
         print("  ├─ Analyzing profit margins...")
-        extreme_margins = self.detect_extreme_profit_margins()
+        extreme_margins = self.detect_extreme_profit_margins(frame=frame)
         results['analyses']['extreme_profit_margins'] = {
             'count': len(extreme_margins),
             'alerts': extreme_margins[:20]
@@ -366,8 +535,11 @@ class FinancialAnalyzer:
             'clusters': shared_admins[:20]
         }
         
-        # Save fraud alerts to database
-        self.save_fraud_alerts(results)
+        # Sync fraud alerts with everything detected (not just the top 20 reported)
+        results['alert_sync'] = self.save_fraud_alerts(results, detected={
+            'high_revenue_per_patient': high_rev_alerts,
+            'extreme_profit_margin': extreme_margins,
+        })
         
         print("\n✅ Analysis complete!")
         print(f"   Total facilities analyzed: {results['dataset_stats']['total_facilities']:,}")
@@ -376,65 +548,268 @@ class FinancialAnalyzer:
         print(f"   Missing financial data: {results['analyses']['missing_financials']['count']}")
         print(f"   Extreme profit margins: {results['analyses']['extreme_profit_margins']['count']}")
         print(f"   Shared administrators: {results['analyses']['shared_administrators']['count']}")
+        sync = results['alert_sync']
+        print(f"   Alerts: {sync['inserted']} new, {sync['updated']} updated, "
+              f"{sync['reopened']} reopened, {sync['closed']} auto-closed")
         
         return results
     
-    def save_fraud_alerts(self, analysis_results: Dict):
-        """Save fraud alerts to database."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Clear old alerts
-        cursor.execute("DELETE FROM fraud_alerts WHERE status = 'new'")
-        
-        # Save high revenue alerts
-        for alert in analysis_results['analyses']['high_revenue_low_patients']['alerts']:
-            cursor.execute("""
+    def save_fraud_alerts(self, analysis_results: Dict,
+                          detected: Optional[Dict[str, List[Dict]]] = None) -> Dict[str, int]:
+        """
+        Sync fraud_alerts with an analysis run, keyed on (alert_type, facility_id).
+        
+        New findings are inserted, existing alerts whose severity or metrics
+        changed (metrics compared to METRIC_PRECISION digits) are updated in place (keeping their id, status and notes),
+        auto-closed alerts that reappear are reopened, and untriaged ('new')
+        alerts no longer detected are auto-closed. Runs as one transaction.
+        
+        Args:
+            analysis_results: Output of run_full_analysis
+            detected: Full alert lists by alert type (defaults to the lists in analysis_results)
+            
+        Returns:
+            Counts of inserted, updated, reopened, closed and unchanged alerts
+        """
+        current = {}
+        for alert_type, (analysis_key, describe, measure) in ALERT_TYPES.items():
+            if detected is not None and alert_type in detected:
+                alerts = detected[alert_type]
+            else:
+                alerts = analysis_results['analyses'][analysis_key]['alerts']
+            for alert in alerts:  # sorted most extreme first; keep that one per facility
+                key = (alert_type, str(alert['facility_id']))
+                if key in current:
+                    continue
+                current[key] = (
+                    alert['severity'], alert['facility_id'], alert['facility_name'],
+                    describe(alert), json.dumps(measure(alert))
+                )
+        
+        counts = {'inserted': 0, 'updated': 0, 'reopened': 0, 'closed': 0, 'unchanged': 0}
+        
+        with self.pool.connection() as conn, conn:
+            placeholders = ','.join('?' * len(ALERT_TYPES))
+            existing = {}
+            for row in conn.execute(f"""
+                SELECT id, alert_type, facility_id, severity, description, metrics, status
+                FROM fraud_alerts
+                WHERE alert_type IN ({placeholders})
+                ORDER BY id
+            """, tuple(ALERT_TYPES)):
+                existing[(row[1], str(row[2]))] = row  # latest alert per key wins
+            
+            inserts, updates, reopens, closes = [], [], [], []
+            for key, (severity, facility_id, facility_name, description, metrics) in current.items():
+                row = existing.get(key)
+                if row is None:
+                    inserts.append((key[0], severity, facility_id, facility_name, description, metrics))
+                elif row[6] == 'auto_closed':
+                    reopens.append((severity, facility_name, description, metrics, row[0]))
+                elif ((row[3], row[4]) != (severity, description)
+                      or _rounded_metrics(json.loads(row[5] or '{}')) != _rounded_metrics(json.loads(metrics))):
+                    updates.append((severity, facility_name, description, metrics, row[0]))
+                else:
+                    counts['unchanged'] += 1
+            
+            for key, row in existing.items():
+                if key not in current and row[6] == 'new':
+                    closes.append((row[0],))
+            
+            conn.executemany("""
                 INSERT INTO fraud_alerts (alert_type, severity, facility_id, facility_name, description, metrics)
                 VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                'high_revenue_per_patient',
-                alert['severity'],
-                alert['facility_id'],
-                alert['facility_name'],
-                f"Revenue per visit: ${alert['revenue_per_visit']:.2f} (Z-score: {alert['z_score']:.2f})",
-                json.dumps({'revenue': alert['revenue'], 'total_visits': alert['total_visits'], 'z_score': alert['z_score']})
-            ))
-        
-        # Save extreme margin alerts
-        for alert in analysis_results['analyses']['extreme_profit_margins']['alerts']:
-            cursor.execute("""
-                INSERT INTO fraud_alerts (alert_type, severity, facility_id, facility_name, description, metrics)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                'extreme_profit_margin',
-                alert['severity'],
-                alert['facility_id'],
-                alert['facility_name'],
-                f"Profit margin: {alert['margin_pct']:.1f}% (Revenue: ${alert['revenue']:,.0f})",
-                json.dumps({'revenue': alert['revenue'], 'net_income': alert['net_income'], 'margin': alert['profit_margin']})
-            ))
-        
-        conn.commit()
-        conn.close()
+            """, inserts)
+            conn.executemany("""
+                UPDATE fraud_alerts
+                SET severity = ?, facility_name = ?, description = ?, metrics = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, updates)
+            conn.executemany("""
+                UPDATE fraud_alerts
+                SET severity = ?, facility_name = ?, description = ?, metrics = ?, status = 'new',
+                    updated_at = CURRENT_TIMESTAMP, closed_at = NULL
+                WHERE id = ?
+            """, reopens)
+            conn.executemany("""
+                UPDATE fraud_alerts
+                SET status = 'auto_closed', closed_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, closes)
+        
+        counts.update(inserted=len(inserts), updated=len(updates), reopened=len(reopens), closed=len(closes))
+        return counts
     
-    def get_fraud_alerts(self, limit: int = 100) -> List[Dict]:
-        """Get fraud alerts from database."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT * FROM fraud_alerts 
-            WHERE status = 'new'
-            ORDER BY severity DESC, detected_at DESC
-            LIMIT ?
-        """, (limit,))
-        
-        alerts = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        
-        return alerts
+    def _alert_filters(self, status: Optional[str] = 'new', severity: Optional[str] = None,
+                       alert_type: Optional[str] = None, county: Optional[str] = None,
+                       since: Optional[str] = None, until: Optional[str] = None) -> Tuple[str, list]:
+        """WHERE clause and parameters for the alert filters (None = no filter)."""
+        clauses, params = [], []
+        for column, value in (('status', status), ('severity', severity), ('alert_type', alert_type)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if county is not None:
+            clauses.append("facility_id IN (SELECT id FROM facilities WHERE county = ? COLLATE NOCASE)")
+            params.append(county)
+        if since is not None:
+            clauses.append("detected_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("detected_at < ?")
+            params.append(until)
+        return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+    
+    def get_fraud_alerts_page(self, limit: int = 100, after: Optional[str] = None,
+                              **filters) -> Dict[str, Any]:
+        """
+        Get one page of fraud alerts, filtered and keyset-paginated in SQL.
+        
+        Alerts are ordered by severity rank (SEVERITY_RANK), then detected_at,
+        then id (all descending), which idx_fraud_alerts_rank serves without a
+        sort. 'total' counts every alert matching the filters, not the page.
+        
+        Args:
+            limit: Page size
+            after: next_cursor from the previous page
+            **filters: status (default 'new'), severity, alert_type, county,
+                since / until (detected_at range, 'YYYY-MM-DD[ HH:MM:SS]')
+            
+        Returns:
+            Dict with 'total', 'alerts' and 'next_cursor' (None on the last page)
+        """
+        where, params = self._alert_filters(**filters)
+        page_where, page_params = where, list(params)
+        if after is not None:
+            rank, detected_at, alert_id = decode_cursor(after)
+            if not isinstance(rank, int) or not isinstance(alert_id, int):
+                raise ValueError(f"Invalid cursor: {after}")
+            page_where += ((" AND " if where else "WHERE ")
+                           + f"({SEVERITY_RANK_SQL}, detected_at, id) < (?, ?, ?)")
+            page_params += [rank, detected_at, alert_id]
+        
+        with self.pool.connection(sqlite3.Row) as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM fraud_alerts {where}", params).fetchone()[0]
+            rows = conn.execute(f"""
+                SELECT * FROM fraud_alerts
+                {page_where}
+                ORDER BY {SEVERITY_RANK_SQL} DESC, detected_at DESC, id DESC
+                LIMIT ?
+            """, page_params + [limit + 1]).fetchall()
+        
+        alerts = [dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = alerts[-1]
+            next_cursor = encode_cursor((SEVERITY_RANK.get(last['severity'], 0),
+                                         last['detected_at'], last['id']))
+        
+        return {'total': total, 'alerts': alerts, 'next_cursor': next_cursor}
+    
+    def get_fraud_alerts(self, limit: int = 100, **filters) -> List[Dict]:
+        """Get fraud alerts from database (first page of get_fraud_alerts_page)."""
+        return self.get_fraud_alerts_page(limit, **filters)['alerts']
+    
+    def get_alert_counts(self, **filters) -> Dict[str, Any]:
+        """Count alerts by severity and by type with one grouped query."""
+        where, params = self._alert_filters(**filters)
+        with self.pool.connection() as conn:
+            rows = conn.execute(f"""
+                SELECT severity, alert_type, COUNT(*)
+                FROM fraud_alerts
+                {where}
+                GROUP BY severity, alert_type
+            """, params).fetchall()
+        
+        counts = {'total': 0, **{severity: 0 for severity in SEVERITY_RANK}, 'by_type': {}}
+        for severity, alert_type, count in rows:
+            counts['total'] += count
+            counts[severity] = counts.get(severity, 0) + count
+            counts['by_type'][alert_type] = counts['by_type'].get(alert_type, 0) + count
+        return counts
+    
+    def get_alerts_version(self, include_data: bool = False) -> Dict[str, Any]:
+        """
+        Cheap change marker for fraud_alerts, for HTTP ETag / Last-Modified.
+        
+        Args:
+            include_data: Also fingerprint facilities and financials (for
+                responses that include dataset statistics)
+            
+        Returns:
+            Dict with 'version' (opaque string) and 'last_modified' (UTC
+            'YYYY-MM-DD HH:MM:SS' or None)
+        """
+        with self.pool.connection() as conn:
+            count, max_id, open_count, last_modified = conn.execute("""
+                SELECT COUNT(*), MAX(id), SUM(status = 'new'),
+                       MAX(MAX(COALESCE(detected_at, ''), COALESCE(updated_at, ''), COALESCE(closed_at, '')))
+                FROM fraud_alerts
+            """).fetchone()
+            version = f"{count}:{max_id}:{open_count}:{last_modified}"
+            if include_data:
+                version += ":" + compute_data_fingerprint(conn)
+        
+        return {'version': version, 'last_modified': last_modified or None}
+    
+    def data_fingerprint(self) -> str:
+        """Fingerprint of facilities and financials (changes when either table does)."""
+        with self.pool.connection() as conn:
+            return compute_data_fingerprint(conn)
+    
+    def compute_snapshot(self) -> Dict[str, Any]:
+        """
+        Run the full analysis and store it as the latest snapshot.
+        
+        The fingerprint is taken before the run, so data that changes
+        mid-run leaves the snapshot marked stale rather than falsely current.
+        
+        Returns:
+            Snapshot metadata (id, data_fingerprint, duration_ms)
+        """
+        fingerprint = self.data_fingerprint()
+        start = time.time()
+        results = self.run_full_analysis()
+        duration_ms = (time.time() - start) * 1000
+        
+        with self.pool.connection() as conn, conn:
+            cursor = conn.execute("""
+                INSERT INTO analysis_snapshots (data_fingerprint, results, duration_ms)
+                VALUES (?, ?, ?)
+            """, (fingerprint, json.dumps(results), duration_ms))
+            snapshot_id = cursor.lastrowid
+            conn.execute("DELETE FROM analysis_snapshots WHERE id <= ?", (snapshot_id - SNAPSHOT_RETENTION,))
+        
+        return {'id': snapshot_id, 'data_fingerprint': fingerprint, 'duration_ms': duration_ms}
+    
+    def get_latest_snapshot(self) -> Optional[Dict[str, Any]]:
+        """
+        Latest stored analysis, or None if none has been computed.
+        
+        Returns:
+            Dict with id, data_fingerprint, created_at, age_seconds,
+            duration_ms and the parsed results
+        """
+        with self.pool.connection() as conn:
+            row = conn.execute("""
+                SELECT id, data_fingerprint, created_at,
+                       (julianday('now') - julianday(created_at)) * 86400.0,
+                       duration_ms, results
+                FROM analysis_snapshots
+                ORDER BY id DESC
+                LIMIT 1
+            """).fetchone()
+        
+        if row is None:
+            return None
+        return {
+            'id': row[0],
+            'data_fingerprint': row[1],
+            'created_at': row[2],
+            'age_seconds': round(row[3], 1),
+            'duration_ms': row[4],
+            'results': json.loads(row[5]),
+        }
     
     def export_analysis_report(self, results: Dict, filename: str = "fraud_analysis_report.json"):
         """Export analysis results to JSON file."""
@@ -19,9 +19,13 @@ import sys
 import os
 import logging
 import asyncio
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from datetime import datetime
-from typing import Dict, Any, List, Optional
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Any, List, Optional, Callable
 import time
 
 # Fix Unicode encoding for Windows console
@@ -30,8 +34,8 @@ if sys.platform == 'win32':
 
 # FastAPI for admin panel
 try:
-    from fastapi import FastAPI, HTTPException, BackgroundTasks
-    from fastapi.responses import HTMLResponse, JSONResponse
+    from fastapi import FastAPI, HTTPException, Request
+    from fastapi.responses import HTMLResponse, JSONResponse, Response
     from fastapi.staticfiles import StaticFiles
     import uvicorn
     FASTAPI_AVAILABLE = True
@@ -59,6 +63,8 @@ except ImportError:
     OTEL_AVAILABLE = False
 
 # Local imports
+from db_pool import get_pool, pool_for_config, close_all_pools
+
 sys.path.insert(0, str(Path(__file__).parent / "data_sources"))
 from privacy_proxy_adapter import PrivacyProxySession, OTEL_AVAILABLE as ADAPTER_OTEL
 from source_validator import SourceValidator
@@ -78,7 +84,7 @@ console = Console() if RICH_AVAILABLE else None
 class HippocraticAdmin:
     """Main admin server for Hippocratic fraud detection system."""
     
-    def __init__(self, host: str = "127.0.0.1", port: int = 8000):
+    def __init__(self, host: str = "127.0.0.1", port: int = 8000, scraper_workers: int = 4):
         self.host = host
         self.port = port
         self.app = FastAPI(title="Hippocratic Admin", version="1.0.0") if FASTAPI_AVAILABLE else None
@@ -103,6 +109,25 @@ class HippocraticAdmin:
         # Active sessions
         self.active_sessions: Dict[str, PrivacyProxySession] = {}
         
+        # Scraper jobs run on their own threads so blocking HTTP calls and
+        # rate-limit sleeps never stall the event loop
+        self.scraper_executor = ThreadPoolExecutor(max_workers=scraper_workers, thread_name_prefix="scraper")
+        self.scraper_jobs: Dict[str, Dict[str, Any]] = {}
+        
+        # Guards logs, stats and job state shared with scraper threads
+        self._lock = threading.RLock()
+        
+        # Semantic search over the main database, created on first use or by
+        # the startup warm-up (loading the embedding model takes seconds)
+        self.vector_store = None
+        self._vector_lock = threading.Lock()
+        
+        # Fraud analysis is precomputed into snapshots on a single worker;
+        # /api/fraud/analysis serves the latest snapshot
+        self.analyzer = None
+        self.analysis_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="analysis")
+        self.analysis_job: Dict[str, Any] = {'status': 'idle'}
+        
         # Source validator
         self.validator = SourceValidator()
         
@@ -120,6 +145,9 @@ class HippocraticAdmin:
         # Scraper-to-DB mappings
         self.scraper_db_mapping = self.load_scraper_mappings()
         
+        # Fitted ML models, shared across /api/ml/* requests (created on first use)
+        self.model_registry = None
+        
         if self.app:
             self.setup_routes()
     
@@ -182,6 +210,13 @@ class HippocraticAdmin:
         """Get database key for a specific scraper."""
         return self.scraper_db_mapping.get(scraper_name, self.default_db)
     
+    def get_model_registry(self):
+        """Get the registry of fitted ML models, persisted under models/."""
+        if self.model_registry is None:
+            from ml_fraud_detector import ModelRegistry
+            self.model_registry = ModelRegistry(str(Path(__file__).parent / "models"))
+        return self.model_registry
+    
     def add_log(self, message: str, level: str = "info", metadata: dict = None):
         """Add a log entry."""
         log_entry = {
@@ -191,11 +226,12 @@ class HippocraticAdmin:
             'metadata': metadata or {}
         }
         
-        self.logs.append(log_entry)
-        
-        # Trim logs if too many
-        if len(self.logs) > self.max_logs:
-            self.logs = self.logs[-self.max_logs:]
+        with self._lock:
+            self.logs.append(log_entry)
+            
+            # Trim logs if too many
+            if len(self.logs) > self.max_logs:
+                self.logs = self.logs[-self.max_logs:]
         
         # Also log to console
         if console and RICH_AVAILABLE:
@@ -223,10 +259,50 @@ class HippocraticAdmin:
             return JSONResponse(self.get_otel_metrics())
         
         @self.app.post("/api/scraper/start/{scraper_name}")
-        async def start_scraper(scraper_name: str, background_tasks: BackgroundTasks):
-            """Start a data scraper."""
-            background_tasks.add_task(self.run_scraper, scraper_name)
-            return {"status": "started", "scraper": scraper_name}
+        async def start_scraper(scraper_name: str):
+            """Queue a data scraper on the scraper executor."""
+            job = self.submit_scraper(scraper_name)
+            if not job['accepted']:
+                return {"status": "already_running", "scraper": scraper_name, "job": job}
+            return {"status": "started", "scraper": scraper_name, "job": job}
+        
+        @self.app.get("/api/scraper/status")
+        async def get_scraper_status():
+            """Get per-scraper job status."""
+            with self._lock:
+                jobs = {name: dict(job) for name, job in self.scraper_jobs.items()}
+            return JSONResponse({
+                'status': self.get_scraper_status(),
+                'jobs': jobs
+            })
+        
+        @self.app.on_event("startup")
+        async def warm_vector_search():
+            """Load the embedding model and search matrix in the background."""
+            threading.Thread(target=self.warm_vector_search, name="vector-warmup", daemon=True).start()
+        
+        @self.app.on_event("startup")
+        async def warm_fraud_analysis():
+            """Queue a fraud analysis if there is no snapshot for the current data."""
+            def check():
+                try:
+                    analyzer = self.get_analyzer()
+                    snapshot = analyzer.get_latest_snapshot()
+                    if snapshot is None:
+                        self.enqueue_analysis("no snapshot")
+                    elif snapshot['data_fingerprint'] != analyzer.data_fingerprint():
+                        self.enqueue_analysis("stale snapshot")
+                except Exception as e:
+                    self.add_log(f"❌ Fraud analysis check failed: {e}", "error")
+            
+            threading.Thread(target=check, name="analysis-check", daemon=True).start()
+        
+        @self.app.on_event("shutdown")
+        def stop_scraper_executor():
+            """Stop accepting scraper and analysis jobs, drop queued ones and close DB pools."""
+            self.scraper_executor.shutdown(wait=False, cancel_futures=True)
+            self.analysis_executor.shutdown(wait=False, cancel_futures=True)
+            close_all_pools()
         
         @self.app.get("/api/db/stats")
         async def get_db_stats():
@@ -239,6 +315,12 @@ class HippocraticAdmin:
             results = await self.vector_search(query, limit)
             return JSONResponse(results)
         
+        @self.app.get("/api/search")
+        async def hybrid_search(query: str, limit: int = 10):
+            """Keyword + semantic search; exact license/phone/id matches skip the model."""
+            results = await self.hybrid_search(query, limit)
+            return JSONResponse(results)
+        
         @self.app.get("/api/databases")
         async def get_databases():
             """Get all configured databases."""
@@ -318,52 +400,76 @@ class HippocraticAdmin:
             })
         
         @self.app.get("/api/fraud/analysis")
-        async def get_fraud_analysis():
-            """Get comprehensive fraud analysis results."""
+        async def get_fraud_analysis(refresh: bool = False):
+            """
+            Get the latest precomputed fraud analysis.
+            
+            The `snapshot` block gives its age and data fingerprint; `stale` is
+            true when the data changed since. `refresh=true` queues a
+            recomputation and returns the current snapshot without waiting.
+            """
             try:
-                from financial_analyzer import FinancialAnalyzer
-                analyzer = FinancialAnalyzer()
-                results = analyzer.run_full_analysis()
+                analyzer = self.get_analyzer()
+                if refresh:
+                    self.enqueue_analysis("requested")
+                
+                snapshot, fingerprint = await asyncio.to_thread(
+                    lambda: (analyzer.get_latest_snapshot(), analyzer.data_fingerprint())
+                )
+                with self._lock:
+                    job = dict(self.analysis_job)
+                
+                if snapshot is None:
+                    if job['status'] not in ('queued', 'running'):
+                        job = self.enqueue_analysis("no snapshot")
+                    return JSONResponse({'status': 'pending', 'job': job}, status_code=202)
+                
+                results = snapshot.pop('results')
+                results['snapshot'] = {
+                    **snapshot,
+                    'current_fingerprint': fingerprint,
+                    'stale': snapshot['data_fingerprint'] != fingerprint,
+                    'job': job,
+                }
                 return JSONResponse(results)
             except Exception as e:
                 raise HTTPException(500, f"Analysis failed: {str(e)}")
         
         @self.app.get("/api/fraud/alerts")
-        async def get_fraud_alerts(limit: int = 100, severity: str = None):
-            """Get fraud alerts from database."""
+        async def get_fraud_alerts(request: Request, limit: int = 100, severity: str = None,
+                                   alert_type: str = None, county: str = None, since: str = None,
+                                   until: str = None, status: str = 'new', after: str = None):
+            """
+            Get fraud alerts from database, filtered and paginated in SQL.
+            
+            Pass the returned next_cursor as `after` for the next page.
+            """
             try:
-                from financial_analyzer import FinancialAnalyzer
-                analyzer = FinancialAnalyzer()
-                alerts = analyzer.get_fraud_alerts(limit)
-                
-                if severity:
-                    alerts = [a for a in alerts if a['severity'] == severity]
+                analyzer = self.get_analyzer()
+                filters = dict(severity=severity, alert_type=alert_type, county=county,
+                               since=since, until=until, status=status or None)
                 
-                return JSONResponse({
-                    'total': len(alerts),
-                    'alerts': alerts
-                })
+                return self._conditional_json(
+                    request, analyzer.get_alerts_version(),
+                    lambda: analyzer.get_fraud_alerts_page(min(max(limit, 1), 1000), after=after, **filters))
+            except ValueError as e:
+                raise HTTPException(400, str(e))
             except Exception as e:
                 raise HTTPException(500, f"Failed to get alerts: {str(e)}")
         
         @self.app.get("/api/fraud/stats")
-        async def get_fraud_stats():
+        async def get_fraud_stats(request: Request):
             """Get fraud detection statistics."""
             try:
-                from financial_analyzer import FinancialAnalyzer
-                analyzer = FinancialAnalyzer()
-                stats = analyzer.get_dataset_stats()
-                alerts = analyzer.get_fraud_alerts(1000)
+                analyzer = self.get_analyzer()
                 
-                return JSONResponse({
-                    'dataset': stats,
-                    'alert_counts': {
-                        'total': len(alerts),
-                        'high': len([a for a in alerts if a['severity'] == 'high']),
-                        'medium': len([a for a in alerts if a['severity'] == 'medium']),
-                        'low': len([a for a in alerts if a['severity'] == 'low'])
+                def payload():
+                    return {
+                        'dataset': analyzer.get_dataset_stats(),
+                        'alert_counts': analyzer.get_alert_counts(status='new')
                     }
-                })
+                
+                return self._conditional_json(request, analyzer.get_alerts_version(include_data=True), payload)
             except Exception as e:
                 raise HTTPException(500, f"Failed to get fraud stats: {str(e)}")
         
@@ -378,52 +484,89 @@ class HippocraticAdmin:
                 raise HTTPException(500, f"Failed to get summary: {str(e)}")
         
         @self.app.get("/api/pandas/profile/{table}")
-        async def get_data_profile(table: str):
-            """Get data profile for a specific table."""
+        async def get_data_profile(table: str, columns: str = None, sample_size: int = None,
+                                   exact: bool = False):
+            """
+            Get data profile for a specific table.
+            
+            `columns` is a comma-separated subset to profile; large tables
+            are profiled from a row sample unless exact=true.
+            """
             try:
                 from pandas_analyzer import PandasAnalyzer
+                from data_profiler import DEFAULT_SAMPLE_SIZE
                 analyzer = PandasAnalyzer()
-                return JSONResponse(analyzer.get_data_profile(table))
+                return JSONResponse(analyzer.get_data_profile(
+                    table,
+                    columns=[c.strip() for c in columns.split(',') if c.strip()] if columns else None,
+                    sample_size=sample_size or DEFAULT_SAMPLE_SIZE,
+                    exact=exact
+                ))
+            except ValueError as e:
+                raise HTTPException(400, str(e))
             except Exception as e:
                 raise HTTPException(500, f"Failed to get profile: {str(e)}")
         
         @self.app.get("/api/pandas/county")
-        async def get_county_analysis():
-            """Get county-level analysis."""
+        async def get_county_analysis(category: str = None, year: int = None):
+            """Get county-level analysis, optionally drilled down to a category and/or year."""
             try:
                 from pandas_analyzer import PandasAnalyzer
                 analyzer = PandasAnalyzer()
-                return JSONResponse(analyzer.get_county_analysis())
+                return JSONResponse(analyzer.get_county_analysis(category=category, year=year))
             except Exception as e:
                 raise HTTPException(500, f"Failed to get county analysis: {str(e)}")
         
         @self.app.get("/api/pandas/category")
-        async def get_category_analysis():
-            """Get category-level analysis."""
+        async def get_category_analysis(county: str = None, year: int = None):
+            """Get category-level analysis, optionally drilled down to a county and/or year."""
             try:
                 from pandas_analyzer import PandasAnalyzer
                 analyzer = PandasAnalyzer()
-                return JSONResponse(analyzer.get_category_analysis())
+                return JSONResponse(analyzer.get_category_analysis(county=county, year=year))
             except Exception as e:
                 raise HTTPException(500, f"Failed to get category analysis: {str(e)}")
         
+        @self.app.get("/api/pandas/time-series")
+        async def get_time_series_analysis(county: str = None, category: str = None):
+            """Get yearly financial totals, optionally drilled down to a county and/or category."""
+            try:
+                from pandas_analyzer import PandasAnalyzer
+                analyzer = PandasAnalyzer()
+                return JSONResponse(analyzer.get_time_series_analysis(county=county, category=category))
+            except Exception as e:
+                raise HTTPException(500, f"Failed to get time series: {str(e)}")
+        
         @self.app.get("/api/pandas/revenue-distribution")
-        async def get_revenue_distribution():
-            """Get revenue distribution histogram."""
+        async def get_revenue_distribution(bins: int = 10, county: str = None, category: str = None,
+                                           exact: bool = False):
+            """Get revenue distribution histogram (from quantile sketches unless exact=true)."""
             try:
                 from pandas_analyzer import PandasAnalyzer
                 analyzer = PandasAnalyzer()
-                return JSONResponse(analyzer.get_revenue_distribution())
+                return JSONResponse(analyzer.get_revenue_distribution(bins, county=county, category=category, exact=exact))
             except Exception as e:
                 raise HTTPException(500, f"Failed to get revenue distribution: {str(e)}")
         
+        @self.app.get("/api/pandas/capacity")
+        async def get_capacity_analysis(county: str = None, category: str = None, exact: bool = False):
+            """Get capacity percentiles (from quantile sketches unless exact=true)."""
+            try:
+                from pandas_analyzer import PandasAnalyzer
+                analyzer = PandasAnalyzer()
+                return JSONResponse(analyzer.get_capacity_analysis(county=county, category=category, exact=exact))
+            except Exception as e:
+                raise HTTPException(500, f"Failed to get capacity analysis: {str(e)}")
+        
         @self.app.get("/api/pandas/outliers/{column}")
-        async def get_outliers(column: str, threshold: float = 3.0):
-            """Get outlier analysis for a column."""
+        async def get_outliers(column: str, threshold: float = 3.0, county: str = None,
+                               category: str = None, exact: bool = False):
+            """Get outlier analysis for a column (IQR bounds from quantile sketches unless exact=true)."""
             try:
                 from pandas_analyzer import PandasAnalyzer
                 analyzer = PandasAnalyzer()
-                return JSONResponse(analyzer.get_outlier_analysis(column, threshold))
+                return JSONResponse(analyzer.get_outlier_analysis(column, threshold, county=county,
+                                                                  category=category, exact=exact))
             except Exception as e:
                 raise HTTPException(500, f"Failed to get outliers: {str(e)}")
         
@@ -448,8 +591,15 @@ class HippocraticAdmin:
                 raise HTTPException(500, f"Failed to get correlation: {str(e)}")
         
         @self.app.get("/api/ml/run-all")
-        async def run_ml_fraud_detection(contamination: float = 0.1, db_key: str = 'main'):
-            """Run all ML fraud detection models."""
+        async def run_ml_fraud_detection(contamination: float = 0.1, db_key: str = 'main',
+                                         parallel: bool = False, workers: Optional[int] = None,
+                                         label_contamination: float = 0.1):
+            """
+            Run all ML fraud detection models (optionally in a process pool).
+            
+            Fitting runs in a worker thread so the event loop stays responsive;
+            label_contamination sets the boosters' pseudo-label rate.
+            """
             try:
                 # Get database path from configuration
                 db_config = self.db_configs.get(db_key, self.db_configs.get('main'))
@@ -462,20 +612,43 @@ class HippocraticAdmin:
                     db_path = db_config.get('path', 'local.db')
                 
                 from ml_fraud_detector import MLFraudDetector
-                detector = MLFraudDetector(db_path=db_path)
-                results = detector.run_all_models(contamination)
+                
+                def run():
+                    detector = MLFraudDetector(db_path=db_path, registry=self.get_model_registry())
+                    return detector.run_all_models(contamination, parallel=parallel, n_workers=workers,
+                                                   label_contamination=label_contamination)
+                
+                results = await asyncio.to_thread(run)
                 results['database'] = db_key
                 results['database_path'] = db_path
                 return JSONResponse(results)
+            except ValueError as e:
+                raise HTTPException(400, str(e))
             except Exception as e:
                 raise HTTPException(500, f"ML detection failed: {str(e)}")
         
+        @self.app.get("/api/ml/score-incremental")
+        async def score_ml_incremental(contamination: float = 0.1, db_key: str = 'main',
+                                       drift_threshold: float = 0.5):
+            """Score new/changed records with the fitted models, refitting only on drift."""
+            try:
+                db_config = self.db_configs.get(db_key, self.db_configs.get('main'))
+                db_path = db_config.get('path', 'local.db')
+                
+                from ml_fraud_detector import MLFraudDetector
+                detector = MLFraudDetector(db_path=db_path, registry=self.get_model_registry())
+                results = detector.score_incremental(contamination, drift_threshold=drift_threshold)
+                results['database'] = db_key
+                return JSONResponse(results)
+            except Exception as e:
+                raise HTTPException(500, f"Incremental scoring failed: {str(e)}")
+        
         @self.app.get("/api/ml/isolation-forest")
         async def run_isolation_forest(contamination: float = 0.1):
             """Run Isolation Forest anomaly detection."""
             try:
                 from ml_fraud_detector import MLFraudDetector
-                detector = MLFraudDetector()
+                detector = MLFraudDetector(registry=self.get_model_registry())
                 result = detector.run_isolation_forest(contamination)
                 return JSONResponse(result)
             except Exception as e:
@@ -486,7 +659,7 @@ class HippocraticAdmin:
             """Run Local Outlier Factor detection."""
             try:
                 from ml_fraud_detector import MLFraudDetector
-                detector = MLFraudDetector()
+                detector = MLFraudDetector(registry=self.get_model_registry())
                 result = detector.run_lof(contamination)
                 return JSONResponse(result)
             except Exception as e:
@@ -497,7 +670,7 @@ class HippocraticAdmin:
             """Run ensemble voting fraud detection."""
             try:
                 from ml_fraud_detector import MLFraudDetector
-                detector = MLFraudDetector()
+                detector = MLFraudDetector(registry=self.get_model_registry())
                 # Run individual models first
                 detector.run_isolation_forest(0.1)
                 detector.run_lof(0.1)
@@ -512,7 +685,7 @@ class HippocraticAdmin:
             """Run XGBoost supervised fraud classification."""
             try:
                 from ml_fraud_detector import MLFraudDetector
-                detector = MLFraudDetector()
+                detector = MLFraudDetector(registry=self.get_model_registry())
                 result = detector.train_xgboost()
                 return JSONResponse(result)
             except Exception as e:
@@ -523,7 +696,7 @@ class HippocraticAdmin:
             """Run LightGBM supervised fraud classification."""
             try:
                 from ml_fraud_detector import MLFraudDetector
-                detector = MLFraudDetector()
+                detector = MLFraudDetector(registry=self.get_model_registry())
                 result = detector.train_lightgbm()
                 return JSONResponse(result)
             except Exception as e:
@@ -538,7 +711,7 @@ class HippocraticAdmin:
                 db_path = db_config.get('path', 'local.db')
                 
                 from ml_fraud_detector import MLFraudDetector
-                detector = MLFraudDetector(db_path=db_path)
+                detector = MLFraudDetector(db_path=db_path, registry=self.get_model_registry())
                 # Run ensemble
                 detector.run_isolation_forest(0.1)
                 detector.run_lof(0.1)
@@ -1600,22 +1773,23 @@ class HippocraticAdmin:
             
             if not turso_url:
                 # Use local SQLite
-                import sqlite3
                 db_path = Path(__file__).parent / "local.db"
                 if db_path.exists():
-                    conn = sqlite3.connect(str(db_path))
-                    cursor = conn.cursor()
+                    pool_options = self.db_configs.get('main', {}).get('pool', {})
+                    pool = get_pool(str(db_path), size=pool_options.get('size'), pragmas=pool_options.get('pragmas'))
                     
-                    facilities = cursor.execute("SELECT COUNT(*) FROM facilities").fetchone()[0]
-                    financials = cursor.execute("SELECT COUNT(*) FROM financials").fetchone()[0]
-                    try:
-                        budgets = cursor.execute("SELECT COUNT(*) FROM government_budgets").fetchone()[0]
-                        sources = cursor.execute("SELECT COUNT(*) FROM data_sources").fetchone()[0]
-                        embeddings = cursor.execute("SELECT COUNT(*) FROM facility_embeddings").fetchone()[0]
-                    except:
-                        budgets = sources = embeddings = 0
+                    with pool.connection() as conn:
+                        cursor = conn.cursor()
+                        
+                        facilities = cursor.execute("SELECT COUNT(*) FROM facilities").fetchone()[0]
+                        financials = cursor.execute("SELECT COUNT(*) FROM financials").fetchone()[0]
+                        try:
+                            budgets = cursor.execute("SELECT COUNT(*) FROM government_budgets").fetchone()[0]
+                            sources = cursor.execute("SELECT COUNT(*) FROM data_sources").fetchone()[0]
+                            embeddings = cursor.execute("SELECT COUNT(*) FROM facility_embeddings").fetchone()[0]
+                        except:
+                            budgets = sources = embeddings = 0
                     
-                    conn.close()
                     logger.debug("Using local SQLite database")
                 else:
                     facilities = financials = budgets = sources = embeddings = 0
@@ -1649,13 +1823,136 @@ class HippocraticAdmin:
         return sessions
     
     def get_scraper_status(self) -> Dict[str, str]:
-        """Get status of all scrapers."""
-        return {
-            'openfiscal': 'idle',
-            'sco': 'idle',
-            'data_ca_gov': 'idle',
-            'chhs': 'idle',
-        }
+        """Get status of all scrapers: idle, queued, running, completed or failed."""
+        with self._lock:
+            status = {name: 'idle' for name in self.scraper_db_mapping}
+            for name, job in self.scraper_jobs.items():
+                status[name] = job['status']
+        return status
+    
+    def _update_job(self, scraper_name: str, **fields):
+        """Update the job record for a scraper."""
+        with self._lock:
+            self.scraper_jobs.setdefault(scraper_name, {'scraper': scraper_name}).update(fields)
+    
+    def submit_scraper(self, scraper_name: str) -> Dict[str, Any]:
+        """
+        Queue a scraper run on the scraper executor.
+        
+        Runs beyond the executor's worker count wait in its queue. A scraper
+        that is already queued or running is not queued again.
+        """
+        with self._lock:
+            job = self.scraper_jobs.get(scraper_name)
+            if job and job['status'] in ('queued', 'running'):
+                return {**job, 'accepted': False}
+            
+            job = {
+                'scraper': scraper_name,
+                'status': 'queued',
+                'queued_at': datetime.now().isoformat(),
+                'started_at': None,
+                'finished_at': None,
+                'error': None,
+            }
+            self.scraper_jobs[scraper_name] = job
+        
+        self.scraper_executor.submit(self._run_scraper_job, scraper_name)
+        return {**job, 'accepted': True}
+    
+    def refresh_rollups(self):
+        """Fold newly ingested rows into the rollup cubes."""
+        try:
+            from rollup_cubes import get_rollup_cubes
+            result = get_rollup_cubes(self.main_db_path()).refresh()
+            self.add_log(f"Rollup cubes {result['mode']}", "info", result)
+        except Exception as e:
+            self.add_log(f"❌ Rollup refresh failed: {e}", "error")
+    
+    def refresh_snapshots(self):
+        """Export the dataset snapshot (Arrow IPC) that the analyzers memory-map."""
+        try:
+            from dataset_snapshots import PYARROW_AVAILABLE
+            if not PYARROW_AVAILABLE:
+                return
+            from pandas_analyzer import get_frame_cache
+            manifest = get_frame_cache(self.main_db_path()).export_snapshot()
+            if manifest['exported']:
+                self.add_log(f"Dataset snapshot {manifest['data_fingerprint']} exported", "info",
+                             {'duration_ms': manifest['duration_ms']})
+        except Exception as e:
+            self.add_log(f"❌ Dataset snapshot export failed: {e}", "error")
+    
+    def get_analyzer(self):
+        """Get the shared FinancialAnalyzer, creating it on first use."""
+        with self._lock:
+            if self.analyzer is None:
+                from financial_analyzer import FinancialAnalyzer
+                self.analyzer = FinancialAnalyzer(self.main_db_path())
+            return self.analyzer
+    
+    def enqueue_analysis(self, reason: str) -> Dict[str, Any]:
+        """
+        Queue a fraud analysis snapshot on the analysis executor.
+        
+        Requests made while a run is already queued are coalesced into it;
+        one arriving while a run is in progress queues a single follow-up,
+        since that run may have started before the latest data landed.
+        """
+        with self._lock:
+            job = self.analysis_job
+            if job['status'] == 'queued' or job.get('pending'):
+                return {**job, 'accepted': False}
+            if job['status'] == 'running':
+                job['pending'] = reason
+                return {**job, 'accepted': True}
+            
+            self.analysis_job = job = {
+                'status': 'queued',
+                'reason': reason,
+                'queued_at': datetime.now().isoformat(),
+                'started_at': None,
+                'finished_at': None,
+                'snapshot_id': job.get('snapshot_id'),
+                'error': None,
+            }
+        
+        self.analysis_executor.submit(self._run_analysis_job)
+        return {**job, 'accepted': True}
+    
+    def _run_analysis_job(self):
+        """Executor entry point: compute and store a fraud analysis snapshot."""
+        with self._lock:
+            self.analysis_job.update(status='running', started_at=datetime.now().isoformat())
+            reason = self.analysis_job['reason']
+        
+        self.add_log(f"Running fraud analysis ({reason})", "info")
+        try:
+            snapshot = self.get_analyzer().compute_snapshot()
+            with self._lock:
+                self.analysis_job.update(status='completed', snapshot_id=snapshot['id'],
+                                         finished_at=datetime.now().isoformat())
+            self.add_log(f"✅ Fraud analysis snapshot {snapshot['id']} ready in "
+                         f"{snapshot['duration_ms'] / 1000:.1f}s", "success")
+        except Exception as e:
+            with self._lock:
+                self.analysis_job.update(status='failed', error=str(e),
+                                         finished_at=datetime.now().isoformat())
+            self.add_log(f"❌ Fraud analysis failed: {e}", "error")
+        
+        with self._lock:
+            follow_up = self.analysis_job.pop('pending', None)
+        if follow_up:
+            self.enqueue_analysis(follow_up)
+    
+    def _run_scraper_job(self, scraper_name: str):
+        """Executor entry point: run a scraper on this thread's own event loop."""
+        self._update_job(scraper_name, status='running', started_at=datetime.now().isoformat())
+        try:
+            asyncio.run(self.run_scraper(scraper_name))
+        except Exception as e:
+            self._update_job(scraper_name, status='failed', error=str(e),
+                             finished_at=datetime.now().isoformat())
     
     def get_otel_metrics(self) -> Dict[str, Any]:
         """Get OpenTelemetry metrics."""
@@ -1664,7 +1961,8 @@ class HippocraticAdmin:
         total_bytes = 0
         total_time = 0
         
-        for session in self.active_sessions.values():
+        sessions = list(self.active_sessions.values())
+        for session in sessions:
             stats = session.get_stats()
             total_requests += stats['total_requests']
             total_bytes += stats['total_bytes_downloaded']
@@ -1674,8 +1972,8 @@ class HippocraticAdmin:
             'total_requests': total_requests,
             'total_bytes': total_bytes,
             'avg_response_time': total_time / max(total_requests, 1),
-            'rate_limit_delays': sum(s.get_stats()['rate_limit_delays'] for s in self.active_sessions.values()),
-            'errors': sum(s.get_stats()['errors'] for s in self.active_sessions.values()),
+            'rate_limit_delays': sum(s.get_stats()['rate_limit_delays'] for s in sessions),
+            'errors': sum(s.get_stats()['errors'] for s in sessions),
         }
     
     def get_db_stats(self) -> Dict[str, int]:
@@ -1686,15 +1984,95 @@ class HippocraticAdmin:
             'budgets': self.stats.get('budgets_count', 0),
         }
     
+    def _conditional_json(self, request: "Request", version: Dict[str, Any],
+                          payload: Callable[[], Any]) -> "Response":
+        """
+        JSON response with ETag / Last-Modified validators.
+        
+        The ETag covers the data version and the query string, so a poller
+        sending If-None-Match (or If-Modified-Since) gets an empty 304
+        without the payload being built.
+        """
+        etag = '"' + hashlib.sha1(f"{version['version']}|{request.url.query}".encode()).hexdigest()[:20] + '"'
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        
+        last_modified = None
+        if version.get('last_modified'):
+            last_modified = datetime.strptime(version['last_modified'][:19], '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+            headers['Last-Modified'] = format_datetime(last_modified, usegmt=True)
+        
+        if_none_match = request.headers.get('if-none-match')
+        if if_none_match is not None:
+            if etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+                return Response(status_code=304, headers=headers)
+        elif last_modified is not None and request.headers.get('if-modified-since'):
+            try:
+                if last_modified <= parsedate_to_datetime(request.headers['if-modified-since']):
+                    return Response(status_code=304, headers=headers)
+            except (TypeError, ValueError):
+                pass
+        
+        return JSONResponse(payload(), headers=headers)
+    
+    def main_db_path(self) -> str:
+        """Path of the main database, resolved against the server directory."""
+        return str(Path(__file__).parent / self.db_configs.get('main', {}).get('path', 'local.db'))
+    
+    def get_vector_store(self):
+        """Get the VectorSearch for the main database, creating it on first use."""
+        with self._vector_lock:
+            if self.vector_store is None:
+                from vector_search import VectorSearch
+                
+                db_config = self.db_configs.get('main', {})
+                self.vector_store = VectorSearch(
+                    db_path=self.main_db_path(),
+                    storage_format=db_config.get('embedding_format', 'float32')
+                )
+            return self.vector_store
+    
+    def warm_vector_search(self):
+        """Load the model and search matrix and prime the query path (startup hook)."""
+        start = time.time()
+        try:
+            store = self.get_vector_store()
+            if store.model is None:
+                self.add_log("⚠️  Vector search unavailable: sentence-transformers not installed", "warning")
+                return
+            store.encode_text("warmup")
+            if store.ann_index is None:
+                store.load_matrix()
+            self.add_log(f"✅ Vector search ready in {time.time() - start:.1f}s", "success")
+        except Exception as e:
+            self.add_log(f"❌ Vector search warm-up failed: {e}", "error")
+    
     async def vector_search(self, query: str, limit: int = 10) -> List[Dict]:
-        """Perform semantic vector search."""
-        # TODO: Implement vector search with Turso
-        return []
+        """Perform semantic vector search (off the event loop; waits for warm-up if needed)."""
+        def search():
+            store = self.get_vector_store()
+            if store.model is None:
+                return []
+            return store.search_facilities(query, limit=limit)
+        
+        try:
+            return await asyncio.to_thread(search)
+        except Exception as e:
+            logger.error(f"Vector search failed: {e}")
+            return []
+    
+    async def hybrid_search(self, query: str, limit: int = 10) -> List[Dict]:
+        """Perform hybrid keyword + vector search (vector part skipped if the model is unavailable)."""
+        try:
+            return await asyncio.to_thread(lambda: self.get_vector_store().hybrid_search(query, limit=limit))
+        except Exception as e:
+            logger.error(f"Hybrid search failed: {e}")
+            return []
     
     async def run_scraper(self, scraper_name: str):
-        """Run a data scraper in background."""
-        self.stats['active_scrapers'] += 1
-        self.stats['total_scrapers_run'] += 1
+        """Run a data scraper (normally on a scraper executor thread via submit_scraper)."""
+        with self._lock:
+            self.stats['active_scrapers'] += 1
+            self.stats['total_scrapers_run'] += 1
         
         # Get database for this scraper
         db_key = self.get_db_for_scraper(scraper_name)
@@ -1725,15 +2103,25 @@ class HippocraticAdmin:
             
             self.add_log(f"Scraper completed: {scraper_name}", "success")
             self.add_log(f"Data written to: {db_config['name']}", "success")
+            self._update_job(scraper_name, status='completed', finished_at=datetime.now().isoformat())
+            
+            # Refresh the rollup cubes, dataset snapshot and fraud analysis against the new data
+            if db_key == 'main':
+                self.refresh_rollups()
+                self.refresh_snapshots()
+                self.enqueue_analysis(f"scraper {scraper_name}")
             
         except Exception as e:
             self.add_log(f"Scraper error: {str(e)}", "error")
             logger.error(f"Scraper error: {e}")
+            self._update_job(scraper_name, status='failed', error=str(e),
+                             finished_at=datetime.now().isoformat())
         finally:
-            self.stats['active_scrapers'] -= 1
-            if scraper_name in self.active_sessions:
-                self.active_sessions[scraper_name].close()
-                del self.active_sessions[scraper_name]
+            with self._lock:
+                self.stats['active_scrapers'] -= 1
+            session = self.active_sessions.pop(scraper_name, None)
+            if session:
+                session.close()
     
     async def _scrape_data_ca_gov(self, session, db_config):
         """Scrape data from data.ca.gov - REAL IMPLEMENTATION."""
@@ -1778,16 +2166,9 @@ class HippocraticAdmin:
                         self._track_request(latency)
                         
                         if response.status_code == 200:
-                            # Download and measure actual bytes
-                            content = response.content
-                            bytes_size = len(content)
-                            self.stats['bytes_downloaded'] += bytes_size
-                            
-                            self.add_log(f"Downloaded {bytes_size / 1024:.1f} KB ({resource.get('format')})", "success")
-                            
-                            # Parse and save to database
-                            records_count = await self._parse_and_save(content, resource.get('format'), db_config)
-                            self.stats['total_data_ingested'] += records_count
+                            # Stream, parse and save to database chunk by chunk
+                            records_count = await self._stream_and_save(response, resource.get('format'), db_config)
+                            self._incr_stat('total_data_ingested', records_count)
                             self.add_log(f"Saved {records_count} records to {db_config['name']}", "success")
                         else:
                             self.add_log(f"HTTP {response.status_code}: Failed to download", "error")
@@ -1819,17 +2200,13 @@ class HippocraticAdmin:
                 
                 try:
                     start_time = time.time()
-                    response = requests.get(dataset['download_url'], timeout=30)
+                    response = requests.get(dataset['download_url'], stream=True, timeout=30)
                     latency = int((time.time() - start_time) * 1000)
                     self._track_request(latency)
                     
                     if response.status_code == 200:
-                        bytes_size = len(response.content)
-                        self.stats['bytes_downloaded'] += bytes_size
-                        self.add_log(f"Downloaded {bytes_size / 1024:.1f} KB", "success")
-                        
-                        records_count = await self._parse_and_save(response.content, 'CSV', db_config)
-                        self.stats['total_data_ingested'] += records_count
+                        records_count = await self._stream_and_save(response, 'CSV', db_config)
+                        self._incr_stat('total_data_ingested', records_count)
                         self.add_log(f"Saved {records_count} records", "success")
                 except Exception as e:
                     self.add_log(f"Error: {str(e)}", "error")
@@ -1857,17 +2234,13 @@ class HippocraticAdmin:
                 
                 try:
                     start_time = time.time()
-                    response = requests.get(dataset['data_url'], timeout=30)
+                    response = requests.get(dataset['data_url'], stream=True, timeout=30)
                     latency = int((time.time() - start_time) * 1000)
                     self._track_request(latency)
                     
                     if response.status_code == 200:
-                        bytes_size = len(response.content)
-                        self.stats['bytes_downloaded'] += bytes_size
-                        self.add_log(f"Downloaded {bytes_size / 1024:.1f} KB", "success")
-                        
-                        records_count = await self._parse_and_save(response.content, 'CSV', db_config)
-                        self.stats['total_data_ingested'] += records_count
+                        records_count = await self._stream_and_save(response, 'CSV', db_config)
+                        self._incr_stat('total_data_ingested', records_count)
                         self.add_log(f"Saved {records_count} records", "success")
                 except Exception as e:
                     self.add_log(f"Error: {str(e)}", "error")
@@ -1898,71 +2271,218 @@ class HippocraticAdmin:
                 self._track_request(latency)
                 
                 bytes_size = len(response.content)
-                self.stats['bytes_downloaded'] += bytes_size
+                self._incr_stat('bytes_downloaded', bytes_size)
                 self.add_log(f"Downloaded {bytes_size / 1024:.1f} KB", "success")
                 
                 # For HTML pages, estimate record count from links
                 records_count = response.text.count('.csv')
-                self.stats['total_data_ingested'] += records_count
+                self._incr_stat('total_data_ingested', records_count)
                 self.add_log(f"Found {records_count} datasets", "success")
         except Exception as e:
             self.add_log(f"Error: {str(e)}", "error")
     
+    def _incr_stat(self, key: str, amount: int = 1):
+        """Increment a counter shared with scraper threads."""
+        with self._lock:
+            self.stats[key] += amount
+    
     def _track_request(self, latency_ms: int):
         """Track real HTTP request metrics."""
-        self.stats['total_requests'] += 1
-        self.stats['total_latency'] += latency_ms
-        self.stats['avg_latency'] = self.stats['total_latency'] / self.stats['total_requests']
-        
-        # Calculate requests per second
-        current_time = time.time()
-        if self.stats['last_request_time']:
-            time_diff = current_time - self.stats['last_request_time']
-            if time_diff > 0:
-                self.stats['requests_per_sec'] = 1 / time_diff
-        
-        self.stats['last_request_time'] = current_time
+        with self._lock:
+            self.stats['total_requests'] += 1
+            self.stats['total_latency'] += latency_ms
+            self.stats['avg_latency'] = self.stats['total_latency'] / self.stats['total_requests']
+            
+            # Calculate requests per second
+            current_time = time.time()
+            if self.stats['last_request_time']:
+                time_diff = current_time - self.stats['last_request_time']
+                if time_diff > 0:
+                    self.stats['requests_per_sec'] = 1 / time_diff
+            
+            self.stats['last_request_time'] = current_time
+    
+    async def _stream_and_save(self, response, format_type: str, db_config: dict,
+                               chunk_size: int = 64 * 1024) -> int:
+        """Stream an HTTP response body into the database without buffering it."""
+        downloaded = 0
+        
+        def counted_chunks():
+            nonlocal downloaded
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if chunk:
+                    downloaded += len(chunk)
+                    self._incr_stat('bytes_downloaded', len(chunk))
+                    yield chunk
+        
+        try:
+            records_count = await self._ingest_chunks(counted_chunks(), format_type, db_config,
+                                                      source_url=response.url)
+        finally:
+            response.close()
+        
+        self.add_log(f"Downloaded {downloaded / 1024:.1f} KB ({format_type})", "success")
+        return records_count
     
     async def _parse_and_save(self, content: bytes, format_type: str, db_config: dict) -> int:
-        """Parse downloaded content and save to database - REAL IMPLEMENTATION."""
+        """Parse an in-memory payload and save it to the database."""
+        return await self._ingest_chunks(iter([content]), format_type, db_config)
+    
+    def _iter_csv_records(self, chunks):
+        """Yield CSV rows as dicts from an iterator of byte chunks."""
+        import codecs
         import csv
-        import io
         
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+        
+        def lines():
+            pending = ''
+            for chunk in chunks:
+                pending += decoder.decode(chunk)
+                complete, _, pending = pending.rpartition('\n')
+                # Hold back the trailing partial line until the next chunk
+                if complete:
+                    for line in complete.split('\n'):
+                        yield line + '\n'
+            pending += decoder.decode(b'', final=True)
+            if pending:
+                yield pending
+        
+        yield from csv.DictReader(lines())
+    
+    def _iter_json_records(self, chunks):
+        """
+        Yield records from a JSON payload given as byte chunks.
+        
+        Top-level arrays are decoded element by element as bytes arrive;
+        objects are decoded whole and their 'results' list (if any) is yielded.
+        """
+        import codecs
+        import json
+        
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+        json_decoder = json.JSONDecoder()
+        buffer = ''
+        in_array = None
+        
+        for chunk in chunks:
+            buffer += decoder.decode(chunk)
+            
+            if in_array is None:
+                stripped = buffer.lstrip()
+                if not stripped:
+                    continue
+                in_array = stripped[0] == '['
+                if in_array:
+                    buffer = stripped[1:]
+            
+            if not in_array:
+                continue
+            
+            # Decode as many complete array elements as the buffer holds
+            while True:
+                buffer = buffer.lstrip().lstrip(',').lstrip()
+                if not buffer or buffer[0] == ']':
+                    break
+                try:
+                    record, end = json_decoder.raw_decode(buffer)
+                except ValueError:
+                    break  # element incomplete, wait for more bytes
+                yield record
+                buffer = buffer[end:]
+        
+        buffer += decoder.decode(b'', final=True)
+        
+        if in_array:
+            buffer = buffer.strip().lstrip(',').strip()
+            if buffer and buffer != ']':
+                raise ValueError("Truncated JSON array")
+            return
+        
+        data = json.loads(buffer) if buffer.strip() else None
+        if isinstance(data, list):
+            yield from data
+        elif isinstance(data, dict) and 'results' in data:
+            yield from data['results']
+        elif data is not None:
+            yield data
+    
+    def _open_ingest_db(self, db_config: dict):
+        """
+        Get the pool for the scraper's target database and ensure the raw records table exists.
+        
+        Relative paths resolve against the server directory, like get_vector_store.
+        Records land in scraped_records as JSON: scraper_db_mappings.json only
+        maps scrapers to databases, not tables, and the previous _parse_and_save
+        counted rows without saving them, so there is no per-source table to
+        keep writing to. Loaders can promote rows from there into typed tables.
+        """
+        if db_config.get('type') != 'sqlite':
+            return None
+        
+        pool = pool_for_config(db_config, base_dir=str(Path(__file__).parent))
+        with pool.connection() as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS scraped_records (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    source_url TEXT,
+                    format TEXT,
+                    record TEXT NOT NULL,
+                    ingested_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+        return pool
+    
+    async def _ingest_chunks(self, chunks, format_type: str, db_config: dict,
+                             source_url: Optional[str] = None, batch_size: int = 1000) -> int:
+        """
+        Parse byte chunks incrementally and save records in batched transactions.
+        
+        Only one batch of parsed records is held in memory at a time.
+        """
+        import json
+        
+        format_type = (format_type or '').upper()
         records_count = 0
         
         try:
-            if format_type.upper() == 'CSV':
-                # Parse real CSV data
-                text = content.decode('utf-8', errors='ignore')
-                reader = csv.DictReader(io.StringIO(text))
-                
-                rows = list(reader)
-                records_count = len(rows)
-                
-                # TODO: Actually save to database based on db_config
-                # For now, just count records
-                self.add_log(f"Parsed {records_count} rows from CSV", "info")
-                
-            elif format_type.upper() == 'JSON':
-                import json
-                data = json.loads(content.decode('utf-8'))
-                
-                if isinstance(data, list):
-                    records_count = len(data)
-                elif isinstance(data, dict) and 'results' in data:
-                    records_count = len(data['results'])
-                else:
-                    records_count = 1
-                
-                self.add_log(f"Parsed {records_count} records from JSON", "info")
-            
+            if format_type == 'CSV':
+                records = self._iter_csv_records(chunks)
+            elif format_type == 'JSON':
+                records = self._iter_json_records(chunks)
             else:
                 # Unknown format, estimate by size
-                records_count = len(content) // 1024  # Rough estimate
+                total_bytes = sum(len(chunk) for chunk in chunks)
+                return total_bytes // 1024  # Rough estimate
+            
+            pool = self._open_ingest_db(db_config)
+            if pool is None:
+                self.add_log(f"{db_config.get('type')} databases are not writable from the admin server; counting only", "warning")
+            
+            def flush(batch):
+                if pool is not None and batch:
+                    with pool.connection() as conn, conn:
+                        conn.executemany(
+                            "INSERT INTO scraped_records (source_url, format, record) VALUES (?, ?, ?)",
+                            [(source_url, format_type, json.dumps(record)) for record in batch]
+                        )
+            
+            batch = []
+            for record in records:
+                batch.append(record)
+                records_count += 1
                 
+                if len(batch) >= batch_size:
+                    flush(batch)
+                    batch = []
+                    if records_count % (batch_size * 10) == 0:
+                        self.add_log(f"Ingested {records_count:,} records...", "info")
+            
+            flush(batch)
+            self.add_log(f"Parsed {records_count} rows from {format_type}", "info")
+            
         except Exception as e:
-            self.add_log(f"Parse error: {str(e)}", "error")
-            records_count = 0
+            self.add_log(f"Parse error after {records_count} records: {str(e)}", "error")
         
         return records_count
     
@@ -2006,10 +2526,11 @@ def main():
     parser = argparse.ArgumentParser(description="Hippocratic Admin Server")
     parser.add_argument("--host", default="127.0.0.1", help="Server host")
     parser.add_argument("--port", default=8000, type=int, help="Server port")
+    parser.add_argument("--scraper-workers", default=4, type=int, help="Concurrent scraper jobs")
     
     args = parser.parse_args()
     
-    admin = HippocraticAdmin(host=args.host, port=args.port)
+    admin = HippocraticAdmin(host=args.host, port=args.port, scraper_workers=args.scraper_workers)
     admin.start()
 
 
@@ -6,15 +6,26 @@ Uses PyOD, XGBoost, LightGBM for advanced anomaly detection and classification
 import sys
 sys.stdout.reconfigure(encoding='utf-8')
 
+import hashlib
 import sqlite3
+import tempfile
+import threading
+import time
 import pandas as pd
 import numpy as np
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 import json
 import warnings
 warnings.filterwarnings('ignore')
 
+import joblib
+
+from db_pool import compute_data_fingerprint
+from dataset_snapshots import load_table
+
 # PyOD - 30+ anomaly detection algorithms
 from pyod.models.iforest import IForest
 from pyod.models.lof import LOF
@@ -40,11 +51,319 @@ from imblearn.under_sampling import RandomUnderSampler
 from imblearn.combine import SMOTETomek
 
 
+# Feature columns, in matrix order
+BASE_FEATURES = [
+    'capacity', 'total_revenue', 'total_expenses', 'net_income',
+    'total_visits', 'total_patients', 'revenue_per_visit'
+]
+DERIVED_FEATURES = [
+    'profit_margin', 'revenue_per_patient', 'visits_per_patient',
+    'expense_ratio', 'revenue_per_capacity', 'log_revenue', 'log_visits'
+]
+
+# Bump when the feature query or derivation changes, to invalidate cached matrices
+FEATURE_CACHE_VERSION = 4
+
+# Prefix of registry fingerprints: fitted models are only reused on the same
+# feature version and columns (and so the same row order and matrix layout)
+FEATURE_SIGNATURE = "v{}-{}".format(
+    FEATURE_CACHE_VERSION,
+    hashlib.sha1(','.join(BASE_FEATURES + DERIVED_FEATURES).encode()).hexdigest()[:8]
+)
+
+# Process-wide feature matrix cache: (db_path, fingerprint, include_derived) -> (df, X)
+_FEATURE_CACHE: Dict[Tuple[str, str, bool], Tuple[pd.DataFrame, np.ndarray]] = {}
+_FEATURE_CACHE_LOCK = threading.Lock()
+
+
+def clear_feature_cache():
+    """Drop all in-memory feature matrices."""
+    with _FEATURE_CACHE_LOCK:
+        _FEATURE_CACHE.clear()
+
+
+class ModelRegistry:
+    """
+    Registry of fitted models, keyed by database and model name.
+    
+    Each entry records the fingerprint (feature signature + data) and
+    contamination it was trained with, so callers can reuse a fitted model
+    until either changes. Entries are
+    kept in memory and, when registry_dir is set, serialized with joblib.
+    """
+    
+    def __init__(self, registry_dir: Optional[str] = None):
+        self.registry_dir = Path(registry_dir) if registry_dir else None
+        self._entries: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+    
+    def _entry_path(self, db_path: str, model_name: str) -> Path:
+        return self.registry_dir / f"{Path(db_path).stem}.{model_name}.joblib"
+    
+    def latest(self, db_path: str, model_name: str) -> Optional[Dict[str, Any]]:
+        """Return the most recent entry for a model, whatever data it was fitted on."""
+        key = (str(Path(db_path).resolve()), model_name)
+        
+        with self._lock:
+            entry = self._entries.get(key)
+        
+        if entry is None and self.registry_dir:
+            path = self._entry_path(db_path, model_name)
+            if path.exists():
+                try:
+                    entry = joblib.load(path)
+                except Exception as e:
+                    print(f"⚠️  Ignoring unreadable model file {path.name}: {e}")
+                    entry = None
+                if entry is not None:
+                    with self._lock:
+                        self._entries[key] = entry
+        
+        return entry
+    
+    def get(self, db_path: str, model_name: str, fingerprint: str,
+            contamination: Optional[float] = None,
+            rows: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Return the fitted entry if it matches the fingerprint and contamination.
+        
+        With rows set, detectors whose training-set outputs (labels_) don't
+        have one entry per current feature row are not reused.
+        """
+        entry = self.latest(db_path, model_name)
+        
+        if entry is None or entry['fingerprint'] != fingerprint:
+            return None
+        if contamination is not None and entry['contamination'] != contamination:
+            return None
+        labels = getattr(entry['model'], 'labels_', None)
+        if rows is not None and labels is not None and len(labels) != rows:
+            return None
+        
+        return entry
+    
+    def put(self, db_path: str, model_name: str, fingerprint: str, model: Any,
+            scaler: Any = None, contamination: Optional[float] = None,
+            result: Optional[Dict[str, Any]] = None,
+            profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Store a fitted model (and its scaler) for a data fingerprint."""
+        entry = {
+            'model': model,
+            'scaler': scaler,
+            'fingerprint': fingerprint,
+            'contamination': contamination,
+            'result': result,
+            'profile': profile,
+            'trained_at': datetime.now().isoformat()
+        }
+        
+        with self._lock:
+            self._entries[(str(Path(db_path).resolve()), model_name)] = entry
+        
+        if self.registry_dir:
+            self.registry_dir.mkdir(parents=True, exist_ok=True)
+            joblib.dump(entry, self._entry_path(db_path, model_name))
+        
+        return entry
+    
+    def clear(self):
+        """Drop all in-memory entries (persisted files are left in place)."""
+        with self._lock:
+            self._entries.clear()
+
+
+# Model fitting lives at module level so process-pool workers can import it
+DETECTOR_LABELS = {
+    'iforest': 'Isolation Forest',
+    'lof': 'Local Outlier Factor (LOF)',
+    'ecod': 'ECOD',
+}
+BOOSTER_LABELS = {
+    'xgboost': 'XGBoost',
+    'lightgbm': 'LightGBM',
+}
+
+
+def fit_detector(model_name: str, X: np.ndarray, contamination: float) -> Tuple[Any, Any]:
+    """Fit an unsupervised detector. Returns (model, scaler or None)."""
+    if model_name == 'iforest':
+        scaler = RobustScaler()
+        clf = IForest(contamination=contamination, random_state=42, n_estimators=200)
+        clf.fit(scaler.fit_transform(X))
+    elif model_name == 'lof':
+        scaler = StandardScaler()
+        clf = LOF(contamination=contamination, n_neighbors=20)
+        clf.fit(scaler.fit_transform(X))
+    elif model_name == 'ecod':
+        # ECOD doesn't require scaling
+        scaler = None
+        clf = ECOD(contamination=contamination)
+        clf.fit(X)
+    else:
+        raise ValueError(f"Unknown detector: {model_name}")
+    
+    return clf, scaler
+
+
+def compute_pseudo_labels(X: np.ndarray, contamination: float = 0.1) -> np.ndarray:
+    """Label rows as fraud when 2+ of IForest, LOF and ECOD agree."""
+    # Use multiple unsupervised methods
+    scaler = RobustScaler()
+    X_scaled = scaler.fit_transform(X)
+    
+    # Isolation Forest
+    iforest = IForest(contamination=contamination, random_state=42)
+    iforest.fit(X_scaled)
+    pred_if = iforest.predict(X_scaled)
+    
+    # LOF
+    lof = LOF(contamination=contamination)
+    lof.fit(X_scaled)
+    pred_lof = lof.predict(X_scaled)
+    
+    # ECOD
+    ecod = ECOD(contamination=contamination)
+    ecod.fit(X)
+    pred_ecod = ecod.predict(X)
+    
+    # Pseudo-labels: fraud if 2+ models agree
+    return ((pred_if + pred_lof + pred_ecod) >= 2).astype(int)
+
+
+def train_booster(kind: str, X: np.ndarray, y: np.ndarray, use_smote: bool = True) -> Tuple[Any, Dict[str, Any]]:
+    """Train XGBoost or LightGBM on pseudo-labels. Returns (model, metrics)."""
+    # Split data
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.3, random_state=42, stratify=y
+    )
+    
+    # Handle imbalance with SMOTE
+    if use_smote and y_train.sum() > 5:
+        smote = SMOTE(random_state=42)
+        X_train, y_train = smote.fit_resample(X_train, y_train)
+        print(f"  ✓ Applied SMOTE: {y_train.sum()} fraud, {len(y_train) - y_train.sum()} normal")
+    
+    if kind == 'xgboost':
+        clf = xgb.XGBClassifier(
+            n_estimators=200,
+            max_depth=6,
+            learning_rate=0.1,
+            subsample=0.8,
+            colsample_bytree=0.8,
+            scale_pos_weight=len(y_train) / y_train.sum() if y_train.sum() > 0 else 1,
+            random_state=42,
+            eval_metric='logloss'
+        )
+    elif kind == 'lightgbm':
+        clf = lgb.LGBMClassifier(
+            n_estimators=200,
+            max_depth=6,
+            learning_rate=0.1,
+            subsample=0.8,
+            colsample_bytree=0.8,
+            class_weight='balanced',
+            random_state=42,
+            verbose=-1
+        )
+    else:
+        raise ValueError(f"Unknown booster: {kind}")
+    
+    clf.fit(X_train, y_train)
+    
+    # Predictions
+    y_pred = clf.predict(X_test)
+    
+    # Metrics
+    from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+    
+    # Feature importance
+    feature_names = BASE_FEATURES + DERIVED_FEATURES
+    
+    importances = clf.feature_importances_
+    feature_importance = sorted(
+        zip(feature_names, importances),
+        key=lambda x: x[1],
+        reverse=True
+    )[:10]
+    
+    result = {
+        'model': BOOSTER_LABELS[kind],
+        'train_samples': len(X_train),
+        'test_samples': len(X_test),
+        'accuracy': float(accuracy_score(y_test, y_pred)),
+        'precision': float(precision_score(y_test, y_pred, zero_division=0)),
+        'recall': float(recall_score(y_test, y_pred, zero_division=0)),
+        'f1_score': float(f1_score(y_test, y_pred, zero_division=0)),
+        'feature_importance': [
+            {'feature': f, 'importance': float(imp)}
+            for f, imp in feature_importance
+        ]
+    }
+    
+    return clf, result
+
+
+def feature_profile(X: np.ndarray) -> Dict[str, Any]:
+    """Per-column statistics of a training matrix, used for imputation and drift checks."""
+    X = np.asarray(X, dtype=np.float64)
+    return {
+        'rows': len(X),
+        'medians': np.median(X, axis=0),
+        'means': X.mean(axis=0),
+        'stds': X.std(axis=0),
+    }
+
+
+def feature_drift(profile: Dict[str, Any], X: np.ndarray) -> float:
+    """
+    Mean absolute shift of column means, in training standard deviations.
+    Columns that were constant during training are ignored.
+    """
+    if len(X) == 0:
+        return 0.0
+    
+    stds = profile['stds']
+    varying = stds > 0
+    if not varying.any():
+        return 0.0
+    
+    shift = np.abs(np.asarray(X, dtype=np.float64).mean(axis=0) - profile['means'])
+    return float((shift[varying] / stds[varying]).mean())
+
+
+def _detector_worker(model_name: str, matrix_path: str, contamination: float) -> Tuple[Any, Any, float]:
+    """Process-pool entry point: fit a detector on the memmapped matrix."""
+    start = time.perf_counter()
+    X = np.load(matrix_path, mmap_mode='r')
+    clf, scaler = fit_detector(model_name, X, contamination)
+    return clf, scaler, round(time.perf_counter() - start, 3)
+
+
+def _pseudo_label_worker(matrix_path: str, contamination: float) -> Tuple[np.ndarray, float]:
+    """Process-pool entry point: compute pseudo-labels on the memmapped matrix."""
+    start = time.perf_counter()
+    X = np.load(matrix_path, mmap_mode='r')
+    return compute_pseudo_labels(X, contamination), round(time.perf_counter() - start, 3)
+
+
+def _booster_worker(kind: str, matrix_path: str, y: np.ndarray, use_smote: bool) -> Tuple[Any, Dict[str, Any], float]:
+    """Process-pool entry point: train a booster on the memmapped matrix."""
+    start = time.perf_counter()
+    X = np.load(matrix_path, mmap_mode='r')
+    clf, result = train_booster(kind, X, y, use_smote)
+    return clf, result, round(time.perf_counter() - start, 3)
+
+
 class MLFraudDetector:
     """Advanced ML-based fraud detection using PyOD and gradient boosting."""
     
-    def __init__(self, db_path: str = "local.db"):
+    def __init__(self, db_path: str = "local.db", cache_dir: Optional[str] = None,
+                 registry: Optional[ModelRegistry] = None):
         self.db_path = db_path
+        # Optional directory for float32 .npy feature matrix sidecars
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        # Optional registry of fitted models shared across detector instances
+        self.registry = registry
         print(f"📂 Connecting to database: {db_path}")
         try:
             self.conn = sqlite3.connect(db_path)
@@ -61,18 +380,167 @@ class MLFraudDetector:
         self.models = {}
         self.scalers = {}
         self.results = {}
+        # Pseudo-labels for the current data: {(fingerprint, contamination): labels}
+        self._pseudo_labels = {}
     
     def __del__(self):
         if hasattr(self, 'conn'):
             self.conn.close()
     
-    def prepare_features(self, include_derived: bool = True) -> Tuple[pd.DataFrame, np.ndarray]:
-        """Prepare feature matrix for ML models."""
+    def get_data_fingerprint(self) -> str:
+        """Fingerprint of the facilities and financials tables."""
+        return compute_data_fingerprint(self.conn)
+    
+    def prepare_features(self, include_derived: bool = True, use_cache: bool = True) -> Tuple[pd.DataFrame, np.ndarray]:
+        """
+        Prepare feature matrix for ML models.
+        
+        The matrix is cached per data fingerprint and reused until the
+        facilities or financials tables change. Callers get a private copy
+        of the DataFrame; the returned matrix is shared and read-only.
+        """
+        if not use_cache:
+            return self._build_features(include_derived)
+        
+        fingerprint = f"v{FEATURE_CACHE_VERSION}-{self.get_data_fingerprint()}"
+        key = (str(Path(self.db_path).resolve()), fingerprint, include_derived)
+        
+        with _FEATURE_CACHE_LOCK:
+            cached = _FEATURE_CACHE.get(key)
+        
+        if cached is None:
+            cached = self._load_feature_sidecar(fingerprint, include_derived)
+        
+        if cached is None:
+            df, X = self._build_features(include_derived)
+            X = np.ascontiguousarray(X, dtype=np.float32)
+            X.setflags(write=False)
+            cached = (df, X)
+            self._save_feature_sidecar(fingerprint, include_derived, df, X)
+        
+        with _FEATURE_CACHE_LOCK:
+            # Drop stale versions for this database
+            for stale in [k for k in _FEATURE_CACHE if k[0] == key[0] and k[1] != fingerprint]:
+                del _FEATURE_CACHE[stale]
+            _FEATURE_CACHE[key] = cached
+        
+        df, X = cached
+        return df.copy(), X
+    
+    def get_model_fingerprint(self) -> str:
+        """Registry fingerprint: feature signature plus data fingerprint."""
+        return f"{FEATURE_SIGNATURE}-{self.get_data_fingerprint()}"
+    
+    def _get_fitted(self, model_name: str, contamination: Optional[float] = None,
+                    rows: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Look up a model fitted on the current features, if a registry is attached."""
+        if not self.registry:
+            return None
+        
+        entry = self.registry.get(self.db_path, model_name, self.get_model_fingerprint(),
+                                  contamination, rows)
+        if entry:
+            print(f"  ✓ Reusing fitted {model_name} model from {entry['trained_at']}")
+        return entry
+    
+    def _register_fitted(self, model_name: str, model: Any, scaler: Any = None,
+                         contamination: Optional[float] = None, result: Optional[Dict[str, Any]] = None,
+                         X: Optional[np.ndarray] = None):
+        """Record a freshly fitted model (and its training matrix profile) in the registry."""
+        if self.registry:
+            self.registry.put(self.db_path, model_name, self.get_model_fingerprint(), model,
+                              scaler=scaler, contamination=contamination, result=result,
+                              profile=feature_profile(X) if X is not None else None)
+    
+    def _feature_sidecar_paths(self, fingerprint: str, include_derived: bool) -> Tuple[Path, Path]:
+        """Paths of the matrix and frame sidecars for a fingerprint."""
+        stem = f"{Path(self.db_path).stem}.features.{fingerprint}.{'derived' if include_derived else 'base'}"
+        return self.cache_dir / f"{stem}.npy", self.cache_dir / f"{stem}.pkl"
+    
+    def _load_feature_sidecar(self, fingerprint: str, include_derived: bool) -> Optional[Tuple[pd.DataFrame, np.ndarray]]:
+        """Load a cached feature matrix from disk, if present."""
+        if not self.cache_dir:
+            return None
+        
+        matrix_path, frame_path = self._feature_sidecar_paths(fingerprint, include_derived)
+        if not (matrix_path.exists() and frame_path.exists()):
+            return None
+        
+        try:
+            X = np.load(matrix_path, mmap_mode='r')
+            df = pd.read_pickle(frame_path)
+        except Exception as e:
+            print(f"⚠️  Ignoring unreadable feature cache {matrix_path.name}: {e}")
+            return None
+        
+        return df, X
+    
+    def _save_feature_sidecar(self, fingerprint: str, include_derived: bool, df: pd.DataFrame, X: np.ndarray):
+        """Persist a feature matrix as a float32 .npy sidecar."""
+        if not self.cache_dir:
+            return
+        
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        matrix_path, frame_path = self._feature_sidecar_paths(fingerprint, include_derived)
+        
+        # Remove sidecars from older data versions
+        prefix = f"{Path(self.db_path).stem}.features."
+        for old in self.cache_dir.glob(f"{prefix}*"):
+            if fingerprint not in old.name:
+                old.unlink(missing_ok=True)
+        
+        np.save(matrix_path, X)
+        df.to_pickle(frame_path)
+    
+    def _load_snapshot_rows(self) -> Optional[pd.DataFrame]:
+        """
+        The feature query's rows from the memory-mapped dataset snapshot, or
+        None if no snapshot matches the current data.
+        """
+        fingerprint = self.get_data_fingerprint()
+        facilities = load_table(self.db_path, fingerprint, 'facilities',
+                                ['id', 'name', 'license_number', 'category_name', 'county',
+                                 'capacity', 'lat', 'lng'])
+        financials = load_table(self.db_path, fingerprint, 'financials',
+                                ['id', 'license_number', 'year', 'total_revenue', 'total_expenses',
+                                 'net_income', 'total_visits', 'total_patients', 'revenue_per_visit'])
+        if facilities is None or financials is None:
+            return None
+        
+        # Snapshot rows are in rowid order; sort the join on (facility position,
+        # financial id) so models see the same row order as the SQL path
+        facilities = facilities.assign(facility_pos=np.arange(len(facilities)))
+        facilities = facilities[facilities['license_number'].notna()].rename(columns={'id': 'facility_id'})
+        financials = financials[financials['total_revenue'] > 0].rename(columns={'id': 'financial_id'})
+        df = facilities.merge(financials, on='license_number')
+        df = df.sort_values(['facility_pos', 'financial_id'], kind='stable').drop(columns='facility_pos')
+        df = df.reset_index(drop=True)
+        
+        # Same column order and dtypes as the SQL query: float64 coordinates
+        # and int64 for the snapshot's downcast integers (log1p of an int16
+        # column would otherwise come out float32)
+        df[['lat', 'lng']] = df[['lat', 'lng']].astype(np.float64)
+        for col in df.columns:
+            if pd.api.types.is_integer_dtype(df[col]):
+                df[col] = df[col].astype(np.int64)
+        return df[['facility_id', 'financial_id'] + [c for c in df.columns if c not in ('facility_id', 'financial_id')]]
+    
+    def _build_features(self, include_derived: bool = True,
+                        fill_values: Optional[np.ndarray] = None) -> Tuple[pd.DataFrame, np.ndarray]:
+        """
+        Run the feature query and derive the feature matrix.
+        
+        fill_values replaces the per-column medians used for imputation (e.g.
+        the training medians). df['row_hash'] is a content hash of each row's
+        raw base features, taken before imputation, so incremental scoring can
+        tell which rows were inserted or updated since they were last scored.
+        """
         
         # Load merged data
         query = """
             SELECT 
                 f.id as facility_id,
+                fin.id as financial_id,
                 f.name,
                 f.license_number,
                 f.category_name,
@@ -92,12 +560,19 @@ class MLFraudDetector:
             WHERE fin.total_revenue IS NOT NULL
             AND fin.total_revenue > 0
         """
+        query += " ORDER BY f.rowid, fin.id"
         
-        df = pd.read_sql_query(query, self.conn)
+        df = self._load_snapshot_rows()
+        if df is None:
+            df = pd.read_sql_query(query, self.conn)
         
         if len(df) == 0:
             raise ValueError("No data available for ML analysis")
         
+        # Hash as float64 so the SQL and snapshot dtypes hash alike
+        hashes = pd.util.hash_pandas_object(df[BASE_FEATURES].astype(np.float64), index=False)
+        df['row_hash'] = [format(h, '016x') for h in hashes.to_numpy(dtype=np.uint64).tolist()]
+        
         # Derived features
         if include_derived:
             # Profit margin
@@ -120,23 +595,19 @@ class MLFraudDetector:
             df['log_visits'] = np.log1p(df['total_visits'])
         
         # Select numeric features
-        feature_cols = [
-            'capacity', 'total_revenue', 'total_expenses', 'net_income',
-            'total_visits', 'total_patients', 'revenue_per_visit'
-        ]
+        feature_cols = list(BASE_FEATURES)
         
         if include_derived:
-            feature_cols += [
-                'profit_margin', 'revenue_per_patient', 'visits_per_patient',
-                'expense_ratio', 'revenue_per_capacity', 'log_revenue', 'log_visits'
-            ]
+            feature_cols += DERIVED_FEATURES
         
         # Handle missing values
         df[feature_cols] = df[feature_cols].replace([np.inf, -np.inf], np.nan)
         
         # Fill NaN with median (iterative to handle all-NaN columns)
-        for col in feature_cols:
-            if df[col].isna().all():
+        for i, col in enumerate(feature_cols):
+            if fill_values is not None:
+                df[col] = df[col].fillna(float(fill_values[i]))
+            elif df[col].isna().all():
                 df[col] = 0
             else:
                 df[col] = df[col].fillna(df[col].median())
@@ -144,7 +615,7 @@ class MLFraudDetector:
         # Final check for any remaining NaN
         df[feature_cols] = df[feature_cols].fillna(0)
         
-        X = df[feature_cols].values
+        X = df[feature_cols].to_numpy(dtype=np.float64)
         
         # Verify no NaN or inf
         assert not np.any(np.isnan(X)), "NaN values still present"
@@ -152,25 +623,11 @@ class MLFraudDetector:
         
         return df, X
     
-    def run_isolation_forest(self, contamination: float = 0.1) -> Dict[str, Any]:
-        """
-        Isolation Forest - Excellent for fraud detection in financial data.
-        Fast, scalable, and effective for high-dimensional data.
-        """
-        print("\n🌲 Running Isolation Forest...")
-        
-        df, X = self.prepare_features()
-        
-        # Scale features
-        scaler = RobustScaler()
-        X_scaled = scaler.fit_transform(X)
-        
-        # Train Isolation Forest
-        clf = IForest(contamination=contamination, random_state=42, n_estimators=200)
-        clf.fit(X_scaled)
-        
-        # Predictions
-        y_pred = clf.predict(X_scaled)  # 0 = normal, 1 = anomaly
+    def _apply_detector(self, model_name: str, df: pd.DataFrame, clf: Any, scaler: Any,
+                        contamination: float) -> Dict[str, Any]:
+        """Build the result for a fitted unsupervised detector and record it."""
+        # Training-set predictions
+        y_pred = clf.labels_  # 0 = normal, 1 = anomaly
         scores = clf.decision_scores_
         
         # Add results to dataframe
@@ -181,7 +638,7 @@ class MLFraudDetector:
         anomalies = df[df['anomaly'] == 1].sort_values('anomaly_score', ascending=False)
         
         result = {
-            'model': 'Isolation Forest',
+            'model': DETECTOR_LABELS[model_name],
             'contamination': contamination,
             'total_samples': len(df),
             'anomalies_detected': int((y_pred == 1).sum()),
@@ -192,59 +649,45 @@ class MLFraudDetector:
             ]].head(20).to_dict('records')
         }
         
-        self.models['iforest'] = clf
-        self.scalers['iforest'] = scaler
-        self.results['iforest'] = result
+        self.models[model_name] = clf
+        if scaler is not None:
+            self.scalers[model_name] = scaler
+        self.results[model_name] = result
         
         print(f"  ✓ Detected {result['anomalies_detected']} anomalies ({result['anomaly_rate']:.1f}%)")
         
         return result
     
+    def _run_detector(self, model_name: str, contamination: float) -> Dict[str, Any]:
+        """Fit (or reuse) an unsupervised detector on the cached feature matrix."""
+        df, X = self.prepare_features()
+        
+        fitted = self._get_fitted(model_name, contamination, rows=len(df))
+        if fitted:
+            clf, scaler = fitted['model'], fitted['scaler']
+            if fitted.get('profile') is None:
+                self._register_fitted(model_name, clf, scaler, contamination, X=X)
+        else:
+            clf, scaler = fit_detector(model_name, X, contamination)
+            self._register_fitted(model_name, clf, scaler, contamination, X=X)
+        
+        return self._apply_detector(model_name, df, clf, scaler, contamination)
+    
+    def run_isolation_forest(self, contamination: float = 0.1) -> Dict[str, Any]:
+        """
+        Isolation Forest - Excellent for fraud detection in financial data.
+        Fast, scalable, and effective for high-dimensional data.
+        """
+        print("\n🌲 Running Isolation Forest...")
+        return self._run_detector('iforest', contamination)
+    
     def run_lof(self, contamination: float = 0.1) -> Dict[str, Any]:
         """
         Local Outlier Factor - Identifies anomalies with unusual local density.
         Great for finding facilities with suspicious patterns compared to neighbors.
         """
         print("\n🎯 Running Local Outlier Factor (LOF)...")
-        
-        df, X = self.prepare_features()
-        
-        # Scale features
-        scaler = StandardScaler()
-        X_scaled = scaler.fit_transform(X)
-        
-        # Train LOF
-        clf = LOF(contamination=contamination, n_neighbors=20)
-        clf.fit(X_scaled)
-        
-        # Predictions
-        y_pred = clf.predict(X_scaled)
-        scores = clf.decision_scores_
-        
-        df['anomaly'] = y_pred
-        df['anomaly_score'] = scores
-        
-        anomalies = df[df['anomaly'] == 1].sort_values('anomaly_score', ascending=False)
-        
-        result = {
-            'model': 'Local Outlier Factor (LOF)',
-            'contamination': contamination,
-            'total_samples': len(df),
-            'anomalies_detected': int((y_pred == 1).sum()),
-            'anomaly_rate': float((y_pred == 1).sum() / len(df) * 100),
-            'top_anomalies': anomalies[[
-                'name', 'county', 'category_name', 'total_revenue',
-                'profit_margin', 'anomaly_score'
-            ]].head(20).to_dict('records')
-        }
-        
-        self.models['lof'] = clf
-        self.scalers['lof'] = scaler
-        self.results['lof'] = result
-        
-        print(f"  ✓ Detected {result['anomalies_detected']} anomalies ({result['anomaly_rate']:.1f}%)")
-        
-        return result
+        return self._run_detector('lof', contamination)
     
     def run_ecod(self, contamination: float = 0.1) -> Dict[str, Any]:
         """
@@ -252,39 +695,7 @@ class MLFraudDetector:
         Parameter-free, fast, and interpretable.
         """
         print("\n📊 Running ECOD...")
-        
-        df, X = self.prepare_features()
-        
-        # ECOD doesn't require scaling
-        clf = ECOD(contamination=contamination)
-        clf.fit(X)
-        
-        y_pred = clf.predict(X)
-        scores = clf.decision_scores_
-        
-        df['anomaly'] = y_pred
-        df['anomaly_score'] = scores
-        
-        anomalies = df[df['anomaly'] == 1].sort_values('anomaly_score', ascending=False)
-        
-        result = {
-            'model': 'ECOD',
-            'contamination': contamination,
-            'total_samples': len(df),
-            'anomalies_detected': int((y_pred == 1).sum()),
-            'anomaly_rate': float((y_pred == 1).sum() / len(df) * 100),
-            'top_anomalies': anomalies[[
-                'name', 'county', 'category_name', 'total_revenue',
-                'profit_margin', 'anomaly_score'
-            ]].head(20).to_dict('records')
-        }
-        
-        self.models['ecod'] = clf
-        self.results['ecod'] = result
-        
-        print(f"  ✓ Detected {result['anomalies_detected']} anomalies ({result['anomaly_rate']:.1f}%)")
-        
-        return result
+        return self._run_detector('ecod', contamination)
     
     def run_ensemble_voting(self) -> Dict[str, Any]:
         """
@@ -307,17 +718,9 @@ class MLFraudDetector:
             if model_name in self.models:
                 clf = self.models[model_name]
                 
-                # Scale if needed
-                if model_name in self.scalers:
-                    X_scaled = self.scalers[model_name].transform(X)
-                    pred = clf.predict(X_scaled)
-                    score = clf.decision_scores_
-                else:
-                    pred = clf.predict(X)
-                    score = clf.decision_scores_
-                
-                predictions.append(pred)
-                scores.append(score)
+                # Models were fitted on this same matrix, so use their training-set outputs
+                predictions.append(clf.labels_)
+                scores.append(clf.decision_scores_)
         
         if not predictions:
             return {}
@@ -359,204 +762,150 @@ class MLFraudDetector:
         """
         Create pseudo-labels for semi-supervised learning.
         Uses unsupervised methods to label data for supervised training.
+        Labels are computed once per data fingerprint and contamination.
         """
         print("\n🏷️  Creating pseudo-labels for supervised learning...")
         
         df, X = self.prepare_features()
         
-        # Use multiple unsupervised methods
-        scaler = RobustScaler()
-        X_scaled = scaler.fit_transform(X)
-        
-        # Isolation Forest
-        iforest = IForest(contamination=contamination, random_state=42)
-        iforest.fit(X_scaled)
-        pred_if = iforest.predict(X_scaled)
-        
-        # LOF
-        lof = LOF(contamination=contamination)
-        lof.fit(X_scaled)
-        pred_lof = lof.predict(X_scaled)
-        
-        # ECOD
-        ecod = ECOD(contamination=contamination)
-        ecod.fit(X)
-        pred_ecod = ecod.predict(X)
-        
-        # Pseudo-labels: fraud if 2+ models agree
-        y_pseudo = ((pred_if + pred_lof + pred_ecod) >= 2).astype(int)
+        key = (self.get_data_fingerprint(), contamination)
+        y_pseudo = self._pseudo_labels.get(key)
+        if y_pseudo is None:
+            y_pseudo = compute_pseudo_labels(X, contamination)
+            self._pseudo_labels = {key: y_pseudo}
         
         print(f"  ✓ Created {y_pseudo.sum()} fraud labels, {len(y_pseudo) - y_pseudo.sum()} normal labels")
         print(f"  ✓ Fraud rate: {y_pseudo.sum() / len(y_pseudo) * 100:.1f}%")
         
         return df, X, y_pseudo
     
-    def train_xgboost(self, use_smote: bool = True) -> Dict[str, Any]:
+    def _reuse_booster(self, kind: str, use_smote: bool, label_contamination: float = 0.1) -> bool:
+        """Load a booster trained on the current data and pseudo-labels from the registry."""
+        fitted = self._get_fitted(kind if use_smote else f'{kind}_nosmote', label_contamination)
+        if not fitted:
+            return False
+        
+        self.models[kind] = fitted['model']
+        self.results[kind] = fitted['result']
+        return True
+    
+    def _store_booster(self, kind: str, use_smote: bool, clf: Any, result: Dict[str, Any],
+                       label_contamination: float = 0.1):
+        """Record a freshly trained booster."""
+        self.models[kind] = clf
+        self.results[kind] = result
+        self._register_fitted(kind if use_smote else f'{kind}_nosmote', clf,
+                              contamination=label_contamination, result=result)
+        
+        print(f"  ✓ Accuracy: {result['accuracy']:.3f} | Precision: {result['precision']:.3f} | "
+              f"Recall: {result['recall']:.3f} | F1: {result['f1_score']:.3f}")
+    
+    def _train_booster(self, kind: str, use_smote: bool, label_contamination: float = 0.1) -> Dict[str, Any]:
+        """Train (or reuse) a gradient-boosted classifier on pseudo-labels."""
+        if self._reuse_booster(kind, use_smote, label_contamination):
+            return self.results[kind]
+        
+        df, X, y = self.create_pseudo_labels(label_contamination)
+        clf, result = train_booster(kind, X, y, use_smote)
+        self._store_booster(kind, use_smote, clf, result, label_contamination)
+        
+        return result
+    
+    def train_xgboost(self, use_smote: bool = True, label_contamination: float = 0.1) -> Dict[str, Any]:
         """
         XGBoost Classifier - Gradient boosting for fraud classification.
         Excellent performance on imbalanced healthcare fraud data.
         """
         print("\n🚀 Training XGBoost Classifier...")
-        
-        df, X, y = self.create_pseudo_labels()
-        
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.3, random_state=42, stratify=y
-        )
-        
-        # Handle imbalance with SMOTE
-        if use_smote and y_train.sum() > 5:
-            smote = SMOTE(random_state=42)
-            X_train, y_train = smote.fit_resample(X_train, y_train)
-            print(f"  ✓ Applied SMOTE: {y_train.sum()} fraud, {len(y_train) - y_train.sum()} normal")
-        
-        # Train XGBoost
-        clf = xgb.XGBClassifier(
-            n_estimators=200,
-            max_depth=6,
-            learning_rate=0.1,
-            subsample=0.8,
-            colsample_bytree=0.8,
-            scale_pos_weight=len(y_train) / y_train.sum() if y_train.sum() > 0 else 1,
-            random_state=42,
-            eval_metric='logloss'
-        )
-        
-        clf.fit(X_train, y_train)
-        
-        # Predictions
-        y_pred = clf.predict(X_test)
-        y_proba = clf.predict_proba(X_test)[:, 1]
-        
-        # Metrics
-        from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
-        
-        accuracy = accuracy_score(y_test, y_pred)
-        precision = precision_score(y_test, y_pred, zero_division=0)
-        recall = recall_score(y_test, y_pred, zero_division=0)
-        f1 = f1_score(y_test, y_pred, zero_division=0)
-        
-        # Feature importance
-        feature_names = [
-            'capacity', 'total_revenue', 'total_expenses', 'net_income',
-            'total_visits', 'total_patients', 'revenue_per_visit',
-            'profit_margin', 'revenue_per_patient', 'visits_per_patient',
-            'expense_ratio', 'revenue_per_capacity', 'log_revenue', 'log_visits'
-        ]
-        
-        importances = clf.feature_importances_
-        feature_importance = sorted(
-            zip(feature_names, importances),
-            key=lambda x: x[1],
-            reverse=True
-        )[:10]
-        
-        result = {
-            'model': 'XGBoost',
-            'train_samples': len(X_train),
-            'test_samples': len(X_test),
-            'accuracy': float(accuracy),
-            'precision': float(precision),
-            'recall': float(recall),
-            'f1_score': float(f1),
-            'feature_importance': [
-                {'feature': f, 'importance': float(imp)}
-                for f, imp in feature_importance
-            ]
-        }
-        
-        self.models['xgboost'] = clf
-        self.results['xgboost'] = result
-        
-        print(f"  ✓ Accuracy: {accuracy:.3f} | Precision: {precision:.3f} | Recall: {recall:.3f} | F1: {f1:.3f}")
-        
-        return result
+        return self._train_booster('xgboost', use_smote, label_contamination)
     
-    def train_lightgbm(self, use_smote: bool = True) -> Dict[str, Any]:
+    def train_lightgbm(self, use_smote: bool = True, label_contamination: float = 0.1) -> Dict[str, Any]:
         """
         LightGBM Classifier - Fast gradient boosting.
         Often outperforms XGBoost on large datasets.
         """
         print("\n⚡ Training LightGBM Classifier...")
+        return self._train_booster('lightgbm', use_smote, label_contamination)
+    
+    def _run_models_parallel(self, contamination: float, n_workers: Optional[int],
+                             label_contamination: float = 0.1) -> Dict[str, float]:
+        """
+        Fit the unsupervised detectors, then the boosters, in a process pool.
         
-        df, X, y = self.create_pseudo_labels()
-        
-        # Split data
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.3, random_state=42, stratify=y
-        )
-        
-        # Handle imbalance
-        if use_smote and y_train.sum() > 5:
-            smote = SMOTE(random_state=42)
-            X_train, y_train = smote.fit_resample(X_train, y_train)
-            print(f"  ✓ Applied SMOTE: {y_train.sum()} fraud, {len(y_train) - y_train.sum()} normal")
-        
-        # Train LightGBM
-        clf = lgb.LGBMClassifier(
-            n_estimators=200,
-            max_depth=6,
-            learning_rate=0.1,
-            subsample=0.8,
-            colsample_bytree=0.8,
-            class_weight='balanced',
-            random_state=42,
-            verbose=-1
-        )
-        
-        clf.fit(X_train, y_train)
-        
-        # Predictions
-        y_pred = clf.predict(X_test)
-        y_proba = clf.predict_proba(X_test)[:, 1]
-        
-        # Metrics
-        from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
-        
-        accuracy = accuracy_score(y_test, y_pred)
-        precision = precision_score(y_test, y_pred, zero_division=0)
-        recall = recall_score(y_test, y_pred, zero_division=0)
-        f1 = f1_score(y_test, y_pred, zero_division=0)
-        
-        # Feature importance
-        feature_names = [
-            'capacity', 'total_revenue', 'total_expenses', 'net_income',
-            'total_visits', 'total_patients', 'revenue_per_visit',
-            'profit_margin', 'revenue_per_patient', 'visits_per_patient',
-            'expense_ratio', 'revenue_per_capacity', 'log_revenue', 'log_visits'
-        ]
+        Workers read the feature matrix from a read-only memmap instead of
+        receiving a pickled copy. Returns per-model wall times in seconds.
+        """
+        df, X = self.prepare_features()
+        wall_times = {}
         
-        importances = clf.feature_importances_
-        feature_importance = sorted(
-            zip(feature_names, importances),
-            key=lambda x: x[1],
-            reverse=True
-        )[:10]
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                ProcessPoolExecutor(max_workers=n_workers) as pool:
+            matrix_path = str(Path(tmp_dir) / "features.npy")
+            np.save(matrix_path, X)
+            
+            pending = {}
+            for model_name in DETECTOR_LABELS:
+                fitted = self._get_fitted(model_name, contamination, rows=len(df))
+                if fitted:
+                    self._apply_detector(model_name, df.copy(), fitted['model'], fitted['scaler'], contamination)
+                    wall_times[model_name] = 0.0
+                else:
+                    pending[pool.submit(_detector_worker, model_name, matrix_path, contamination)] = model_name
+            
+            # Pseudo-labels are computed once, alongside the detectors
+            boosters = [kind for kind in BOOSTER_LABELS if not self._reuse_booster(kind, True, label_contamination)]
+            labels_future = pool.submit(_pseudo_label_worker, matrix_path, label_contamination) if boosters else None
+            
+            for future in as_completed(pending):
+                model_name = pending[future]
+                clf, scaler, elapsed = future.result()
+                print(f"\n✓ {DETECTOR_LABELS[model_name]} fitted in {elapsed:.2f}s")
+                self._register_fitted(model_name, clf, scaler, contamination, X=X)
+                self._apply_detector(model_name, df.copy(), clf, scaler, contamination)
+                wall_times[model_name] = elapsed
+            
+            start = time.perf_counter()
+            self.run_ensemble_voting()
+            wall_times['ensemble'] = round(time.perf_counter() - start, 3)
+            
+            if labels_future:
+                y_pseudo, elapsed = labels_future.result()
+                self._pseudo_labels = {(self.get_data_fingerprint(), label_contamination): y_pseudo}
+                wall_times['pseudo_labels'] = elapsed
+                
+                futures = {pool.submit(_booster_worker, kind, matrix_path, y_pseudo, True): kind for kind in boosters}
+                for future in as_completed(futures):
+                    kind = futures[future]
+                    clf, result, elapsed = future.result()
+                    print(f"\n✓ {BOOSTER_LABELS[kind]} trained in {elapsed:.2f}s")
+                    self._store_booster(kind, True, clf, result, label_contamination)
+                    wall_times[kind] = elapsed
+            
+            for kind in BOOSTER_LABELS:
+                wall_times.setdefault(kind, 0.0)
         
-        result = {
-            'model': 'LightGBM',
-            'train_samples': len(X_train),
-            'test_samples': len(X_test),
-            'accuracy': float(accuracy),
-            'precision': float(precision),
-            'recall': float(recall),
-            'f1_score': float(f1),
-            'feature_importance': [
-                {'feature': f, 'importance': float(imp)}
-                for f, imp in feature_importance
-            ]
-        }
+        return wall_times
+    
+    def run_all_models(self, contamination: float = 0.1, parallel: bool = False,
+                       n_workers: Optional[int] = None,
+                       label_contamination: float = 0.1) -> Dict[str, Any]:
+        """
+        Run all fraud detection models and compare results.
         
-        self.models['lightgbm'] = clf
-        self.results['lightgbm'] = result
+        With parallel=True, IForest/LOF/ECOD are fitted concurrently in a
+        process pool of n_workers (default: CPU count), followed by XGBoost
+        and LightGBM in parallel on a single set of pseudo-labels.
+        label_contamination is the contamination used for those pseudo-labels.
         
-        print(f"  ✓ Accuracy: {accuracy:.3f} | Precision: {precision:.3f} | Recall: {recall:.3f} | F1: {f1:.3f}")
+        Raises:
+            ValueError: contamination outside (0, 0.5] or n_workers < 1
+        """
+        for name, value in (('contamination', contamination), ('label_contamination', label_contamination)):
+            if not 0 < value <= 0.5:
+                raise ValueError(f"{name} must be in (0, 0.5], got {value}")
+        if n_workers is not None and n_workers < 1:
+            raise ValueError(f"n_workers must be at least 1, got {n_workers}")
         
-        return result
-    
-    def run_all_models(self, contamination: float = 0.1) -> Dict[str, Any]:
-        """Run all fraud detection models and compare results."""
         print("=" * 70)
         print("🤖 ML-POWERED FRAUD DETECTION - COMPREHENSIVE ANALYSIS")
         print("=" * 70)
@@ -564,20 +913,36 @@ class MLFraudDetector:
         results = {
             'timestamp': datetime.now().isoformat(),
             'contamination': contamination,
-            'models': {}
+            'label_contamination': label_contamination,
+            'execution_mode': 'parallel' if parallel else 'sequential',
+            'models': {},
+            'wall_times': {}
         }
         
-        # Unsupervised models
-        results['models']['iforest'] = self.run_isolation_forest(contamination)
-        results['models']['lof'] = self.run_lof(contamination)
-        results['models']['ecod'] = self.run_ecod(contamination)
-        
-        # Ensemble
-        results['models']['ensemble'] = self.run_ensemble_voting()
+        run_start = time.perf_counter()
+        
+        if parallel:
+            results['wall_times'] = self._run_models_parallel(contamination, n_workers, label_contamination)
+            for model_name in ['iforest', 'lof', 'ecod', 'ensemble', 'xgboost', 'lightgbm']:
+                results['models'][model_name] = self.results.get(model_name, {})
+        else:
+            steps = [
+                # Unsupervised models
+                ('iforest', lambda: self.run_isolation_forest(contamination)),
+                ('lof', lambda: self.run_lof(contamination)),
+                ('ecod', lambda: self.run_ecod(contamination)),
+                # Ensemble
+                ('ensemble', self.run_ensemble_voting),
+                # Supervised models
+                ('xgboost', lambda: self.train_xgboost(label_contamination=label_contamination)),
+                ('lightgbm', lambda: self.train_lightgbm(label_contamination=label_contamination)),
+            ]
+            for model_name, step in steps:
+                start = time.perf_counter()
+                results['models'][model_name] = step()
+                results['wall_times'][model_name] = round(time.perf_counter() - start, 3)
         
-        # Supervised models
-        results['models']['xgboost'] = self.train_xgboost()
-        results['models']['lightgbm'] = self.train_lightgbm()
+        results['wall_times']['total'] = round(time.perf_counter() - run_start, 3)
         
         # Summary comparison
         print("\n" + "=" * 70)
@@ -590,10 +955,187 @@ class MLFraudDetector:
             elif 'f1_score' in model_result:
                 print(f"{model_result['model']:30s} → F1: {model_result['f1_score']:.3f} | Precision: {model_result['precision']:.3f} | Recall: {model_result['recall']:.3f}")
         
+        print(f"{'Wall time':30s} → {results['wall_times']['total']:.2f}s ({results['execution_mode']})")
         print("=" * 70)
         
         return results
     
+    def init_scoring_tables(self):
+        """Initialize tables for persisted anomaly scores."""
+        cursor = self.conn.cursor()
+        
+        # Latest score per financial record and model, with the row_hash of
+        # the features it was computed from
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS anomaly_scores (
+                facility_id TEXT NOT NULL,
+                financial_id INTEGER NOT NULL,
+                model TEXT NOT NULL,
+                score REAL NOT NULL,
+                is_anomaly INTEGER NOT NULL,
+                model_fingerprint TEXT,
+                row_hash TEXT,
+                scored_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (facility_id, financial_id, model)
+            )
+        """)
+        
+        # Columns added after the table was first created
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(anomaly_scores)")}
+        if 'row_hash' not in columns:
+            cursor.execute("ALTER TABLE anomaly_scores ADD COLUMN row_hash TEXT")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_anomaly_scores_model
+            ON anomaly_scores(model, is_anomaly, score)
+        """)
+        
+        # Last scoring pass per model
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS anomaly_scoring_state (
+                model TEXT PRIMARY KEY,
+                model_fingerprint TEXT,
+                scored_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        self.conn.commit()
+    
+    def _scored_row_hashes(self, model_name: str) -> Dict[Tuple[str, int], str]:
+        """row_hash of every row currently scored by a model, keyed by (facility_id, financial_id)."""
+        return {
+            (facility_id, financial_id): row_hash
+            for facility_id, financial_id, row_hash in self.conn.execute("""
+                SELECT facility_id, financial_id, row_hash FROM anomaly_scores WHERE model = ?
+            """, (model_name,))
+        }
+    
+    def _write_anomaly_scores(self, model_name: str, df: pd.DataFrame, scores: np.ndarray,
+                              labels: np.ndarray, model_fingerprint: str):
+        """Upsert scores for the rows of df into anomaly_scores."""
+        scored_at = datetime.now().isoformat()
+        rows = [
+            (str(facility_id), int(financial_id), model_name, float(score), int(label), model_fingerprint,
+             row_hash, scored_at)
+            for facility_id, financial_id, score, label, row_hash
+            in zip(df['facility_id'], df['financial_id'], scores, labels, df['row_hash'])
+        ]
+        
+        self.conn.executemany("""
+            INSERT INTO anomaly_scores (facility_id, financial_id, model, score, is_anomaly, model_fingerprint,
+                                        row_hash, scored_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(facility_id, financial_id, model) DO UPDATE SET
+                score = excluded.score,
+                is_anomaly = excluded.is_anomaly,
+                model_fingerprint = excluded.model_fingerprint,
+                row_hash = excluded.row_hash,
+                scored_at = excluded.scored_at
+        """, rows)
+    
+    def _delete_anomaly_scores(self, model_name: str, keys: List[Tuple[str, int]]):
+        """Drop scores for rows that no longer exist."""
+        self.conn.executemany("""
+            DELETE FROM anomaly_scores WHERE facility_id = ? AND financial_id = ? AND model = ?
+        """, [(facility_id, financial_id, model_name) for facility_id, financial_id in keys])
+    
+    def score_incremental(self, contamination: float = 0.1, drift_threshold: float = 0.5,
+                          refit_fraction: float = 0.25,
+                          models: Tuple[str, ...] = ('iforest', 'lof', 'ecod')) -> Dict[str, Any]:
+        """
+        Score only feature rows inserted or updated since the last pass.
+        
+        A row counts as changed when its row_hash (a content hash of its raw
+        features) differs from the one stored with its score, so in-place
+        UPDATEs are rescored as well as new rows; scores of rows that no longer
+        exist are dropped. Changed rows are imputed with the training medians
+        and scored with decision_function on the registry's fitted models;
+        results are upserted into anomaly_scores. A model is refitted on the
+        full dataset instead when it has no fitted version for this
+        contamination, when the changed rows' feature means drift more than
+        drift_threshold training standard deviations, or when they exceed
+        refit_fraction of the training rows.
+        """
+        if not self.registry:
+            raise ValueError("Incremental scoring requires a ModelRegistry")
+        
+        print("\n🔁 Incremental anomaly scoring...")
+        self.init_scoring_tables()
+        cursor = self.conn.cursor()
+        
+        summary = {
+            'timestamp': datetime.now().isoformat(),
+            'contamination': contamination,
+            'drift_threshold': drift_threshold,
+            'models': {}
+        }
+        
+        for model_name in models:
+            scored = self._scored_row_hashes(model_name)
+            entry = self.registry.latest(self.db_path, model_name)
+            stats = {'changed_rows': None, 'drift': None}
+            refit_reason = None
+            
+            if entry is None or entry.get('profile') is None:
+                refit_reason = 'no fitted model'
+            elif not entry['fingerprint'].startswith(f"{FEATURE_SIGNATURE}-"):
+                refit_reason = 'feature set changed'
+            elif entry['contamination'] != contamination:
+                refit_reason = 'contamination changed'
+            else:
+                df, X = self._build_features(fill_values=entry['profile']['medians'])
+                keys = list(zip(df['facility_id'].astype(str), df['financial_id'].astype(int)))
+                stale = list(scored.keys() - set(keys))
+                changed = np.fromiter((scored.get(key) != row_hash for key, row_hash in zip(keys, df['row_hash'])),
+                                      dtype=bool, count=len(df))
+                df, X = df[changed], X[changed]
+                stats['changed_rows'] = len(df)
+                stats['drift'] = round(feature_drift(entry['profile'], X), 4)
+                
+                if stats['drift'] > drift_threshold:
+                    refit_reason = 'feature drift'
+                elif len(df) > refit_fraction * entry['profile']['rows']:
+                    refit_reason = 'too many changed rows'
+            
+            if refit_reason:
+                print(f"  ↻ Refitting {DETECTOR_LABELS[model_name]}: {refit_reason}")
+                self._run_detector(model_name, contamination)
+                df, _ = self.prepare_features()
+                clf = self.models[model_name]
+                self._write_anomaly_scores(model_name, df, clf.decision_scores_, clf.labels_,
+                                           self.get_model_fingerprint())
+                current = set(zip(df['facility_id'].astype(str), df['financial_id'].astype(int)))
+                stale = [key for key in scored if key not in current]
+                stats.update({'mode': 'refit', 'refit_reason': refit_reason, 'rows_scored': len(df)})
+            else:
+                if len(df) > 0:
+                    clf, scaler = entry['model'], entry['scaler']
+                    scores = clf.decision_function(scaler.transform(X) if scaler is not None else X)
+                    labels = (scores > clf.threshold_).astype(int)
+                    self._write_anomaly_scores(model_name, df, scores, labels, entry['fingerprint'])
+                    stats['anomalies_detected'] = int(labels.sum())
+                print(f"  ✓ {DETECTOR_LABELS[model_name]}: scored {len(df)} changed rows (drift {stats['drift']:.3f})")
+                stats.update({'mode': 'incremental', 'rows_scored': len(df)})
+            
+            self._delete_anomaly_scores(model_name, stale)
+            stats['rows_removed'] = len(stale)
+            
+            cursor.execute("""
+                INSERT INTO anomaly_scoring_state (model, model_fingerprint, scored_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT(model) DO UPDATE SET
+                    model_fingerprint = excluded.model_fingerprint,
+                    scored_at = excluded.scored_at
+            """, (
+                model_name,
+                self.registry.latest(self.db_path, model_name)['fingerprint'],
+                datetime.now().isoformat()
+            ))
+            self.conn.commit()
+            
+            summary['models'][model_name] = stats
+        
+        return summary
+    
     def export_results(self, filename: str = "ml_fraud_detection_results.json"):
         """Export all results to JSON file."""
         if not self.results:
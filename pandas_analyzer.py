@@ -6,237 +6,376 @@ Comprehensive statistical analysis and profiling of ingested healthcare data
 import sys
 sys.stdout.reconfigure(encoding='utf-8')
 
-import sqlite3
+import threading
+import time
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 import json
 
+from db_pool import get_pool, compute_data_fingerprint
+from rollup_cubes import get_rollup_cubes, MEASURES
+from data_profiler import get_table_profile, DEFAULT_SAMPLE_SIZE
+from dataset_snapshots import load_snapshot, write_snapshot, SNAPSHOT_TABLES, DEFAULT_FORMAT
+
+# Low-cardinality text columns stored as pandas categoricals
+CATEGORICAL_COLUMNS = ('county', 'category_code', 'category_name', 'city')
+
+# Columns safe to narrow to float32 (money columns stay float64 so sums match)
+FLOAT32_COLUMNS = ('lat', 'lng')
+
+# Seconds a cached fingerprint is trusted before the tables are re-checked,
+# so a burst of dashboard requests costs one fingerprint query
+FINGERPRINT_CHECK_INTERVAL = 2.0
+
+FACILITIES_QUERY = """
+    SELECT 
+        id, name, license_number, category_code, category_name,
+        address, city, county, zip, phone,
+        lat, lng, in_service, business_name, owner_name, admin_name,
+        capacity, created_at
+    FROM facilities
+    ORDER BY rowid
+"""
+
+FINANCIALS_QUERY = """
+    SELECT 
+        id, facility_id, oshpd_id, facility_name, license_number,
+        year, total_revenue, total_expenses, net_income,
+        total_visits, total_patients, revenue_per_visit,
+        created_at
+    FROM financials
+    ORDER BY id
+"""
+
+# Facility columns carried into the merged frame (id becomes facility_id)
+MERGED_FACILITY_COLUMNS = ['id', 'name', 'license_number', 'category_name', 'city', 'county', 'capacity']
+MERGED_FINANCIAL_COLUMNS = ['year', 'total_revenue', 'total_expenses', 'net_income',
+                            'total_visits', 'total_patients', 'revenue_per_visit']
+
+
+# Rollup measures reported per analysis, in the column order of the old groupby output
+COUNTY_MEASURES = ['capacity_sum', 'total_revenue_sum', 'total_revenue_mean', 'total_revenue_median',
+                   'net_income_sum', 'net_income_mean', 'total_visits_sum']
+CATEGORY_MEASURES = ['capacity_sum', 'capacity_mean', 'total_revenue_sum', 'total_revenue_mean',
+                     'net_income_sum', 'net_income_mean', 'total_visits_sum']
+YEARLY_MEASURES = ['total_revenue_sum', 'total_revenue_mean', 'total_revenue_count',
+                   'total_expenses_sum', 'total_expenses_mean', 'net_income_sum', 'net_income_mean',
+                   'total_visits_sum']
+
+
+def _cube_record(row: Dict[str, Any], key: str, measures: List[str]) -> Dict[str, Any]:
+    """Shape a rollup row like the former groupby records."""
+    record = {key: row[key]}
+    if key != 'year':
+        record['facility_id_count'] = row['row_count']
+    record.update((m, row[m]) for m in measures)
+    return record
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Convert text columns to categoricals and downcast numerics in place."""
+    for col in df.columns:
+        if col in CATEGORICAL_COLUMNS:
+            df[col] = df[col].astype('category')
+        elif col in FLOAT32_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(np.float32)
+        elif pd.api.types.is_integer_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+    return df
+
+
+class FrameCache:
+    """
+    Process-wide cache of the analysis frames for one database.
+    
+    Frames come from the memory-mapped dataset snapshot matching the data
+    fingerprint when one has been exported (see dataset_snapshots).
+    Otherwise facilities and financials are each read with a single query
+    and the merged frame is built from them in memory. Everything is
+    reloaded when the db_pool data fingerprint changes. Cached frames are
+    shared between callers and must be treated as read-only.
+    """
+    
+    def __init__(self, db_path: str):
+        self.pool = get_pool(db_path)
+        self.fingerprint = None
+        self.checked_at = 0.0
+        self.loads = 0
+        self.source = None  # 'snapshot' or 'sqlite'
+        self._frames: Dict[str, pd.DataFrame] = {}
+        self._lock = threading.Lock()
+    
+    def _load(self, fingerprint: str):
+        frames = load_snapshot(self.pool.db_path, fingerprint)
+        if frames is not None:
+            self._frames = frames
+            self.source = 'snapshot'
+            self.loads += 1
+            return
+        
+        with self.pool.connection() as conn:
+            facilities = compact_frame(pd.read_sql_query(FACILITIES_QUERY, conn))
+            financials = compact_frame(pd.read_sql_query(FINANCIALS_QUERY, conn))
+        
+        # LEFT JOIN on license_number; NULL licenses never match, as in SQL
+        merged = facilities[MERGED_FACILITY_COLUMNS].rename(columns={'id': 'facility_id'}).merge(
+            financials.loc[financials['license_number'].notna(), ['license_number'] + MERGED_FINANCIAL_COLUMNS],
+            on='license_number', how='left'
+        )
+        
+        self._frames = {'facilities': facilities, 'financials': financials, 'merged': merged}
+        self.source = 'sqlite'
+        self.loads += 1
+    
+    def _current(self, force_check: bool = False):
+        """Fingerprint and frames, reloaded if the data changed. Caller holds the lock."""
+        now = time.time()
+        if not self._frames or force_check or now - self.checked_at >= FINGERPRINT_CHECK_INTERVAL:
+            with self.pool.connection() as conn:
+                fingerprint = compute_data_fingerprint(conn)
+            if fingerprint != self.fingerprint or not self._frames:
+                self._load(fingerprint)
+                self.fingerprint = fingerprint
+            self.checked_at = now
+        return self.fingerprint, self._frames
+    
+    def get(self, name: str) -> pd.DataFrame:
+        """Get a cached frame ('facilities', 'financials' or 'merged')."""
+        with self._lock:
+            return self._current()[1][name]
+    
+    def export_snapshot(self, fmt: str = DEFAULT_FORMAT) -> Dict[str, Any]:
+        """
+        Write the current frames as the dataset snapshot for their fingerprint.
+        
+        Run after ingestion so every analyzer (in this or another process)
+        can memory-map the new data instead of querying SQLite.
+        
+        Returns:
+            The snapshot manifest (see dataset_snapshots.write_snapshot)
+        """
+        with self._lock:
+            fingerprint, frames = self._current(force_check=True)
+        
+        # Reloads replace the frames dict, so it is safe to write outside the lock
+        return write_snapshot(self.pool.db_path, fingerprint,
+                              {name: frames[name] for name in SNAPSHOT_TABLES}, fmt)
+    
+    def invalidate(self):
+        """Drop the cached frames; the next get() reloads them."""
+        with self._lock:
+            self._frames = {}
+            self.fingerprint = None
+
+
+# Shared frame caches keyed by resolved database path
+_FRAME_CACHES: Dict[str, FrameCache] = {}
+_FRAME_CACHES_LOCK = threading.Lock()
+
+
+def get_frame_cache(db_path: str = "local.db") -> FrameCache:
+    """Get the shared frame cache for a database file, creating it on first use."""
+    key = get_pool(db_path).db_path
+    with _FRAME_CACHES_LOCK:
+        cache = _FRAME_CACHES.get(key)
+        if cache is None:
+            cache = _FRAME_CACHES[key] = FrameCache(key)
+        return cache
+
+
 class PandasAnalyzer:
     """Advanced data analysis using pandas for healthcare fraud detection."""
     
     def __init__(self, db_path: str = "local.db"):
         self.db_path = db_path
-        self.conn = sqlite3.connect(db_path)
-    
-    def __del__(self):
-        if hasattr(self, 'conn'):
-            self.conn.close()
+        self.frames = get_frame_cache(db_path)
+        self.cubes = get_rollup_cubes(db_path)
     
     def load_facilities(self) -> pd.DataFrame:
-        """Load facilities data into pandas DataFrame."""
-        query = """
-            SELECT 
-                id, name, license_number, category_code, category_name,
-                address, city, county, zip, phone,
-                lat, lng, in_service, business_name, owner_name, admin_name,
-                capacity, created_at
-            FROM facilities
-        """
-        df = pd.read_sql_query(query, self.conn)
-        return df
+        """Facilities data as a (cached, read-only) pandas DataFrame."""
+        return self.frames.get('facilities')
     
     def load_financials(self) -> pd.DataFrame:
-        """Load financial data into pandas DataFrame."""
-        query = """
-            SELECT 
-                id, facility_id, oshpd_id, facility_name, license_number,
-                year, total_revenue, total_expenses, net_income,
-                total_visits, total_patients, revenue_per_visit,
-                created_at
-            FROM financials
-        """
-        df = pd.read_sql_query(query, self.conn)
-        return df
+        """Financial data as a (cached, read-only) pandas DataFrame."""
+        return self.frames.get('financials')
     
     def load_merged_data(self) -> pd.DataFrame:
-        """Load facilities merged with financial data."""
-        query = """
-            SELECT 
-                f.id as facility_id,
-                f.name,
-                f.license_number,
-                f.category_name,
-                f.city,
-                f.county,
-                f.capacity,
-                fin.year,
-                fin.total_revenue,
-                fin.total_expenses,
-                fin.net_income,
-                fin.total_visits,
-                fin.total_patients,
-                fin.revenue_per_visit
-            FROM facilities f
-            LEFT JOIN financials fin ON f.license_number = fin.license_number
-        """
-        df = pd.read_sql_query(query, self.conn)
-        return df
+        """Facilities left-joined with financial data on license_number (cached, read-only)."""
+        return self.frames.get('merged')
     
-    def get_data_profile(self, table: str = "facilities") -> Dict[str, Any]:
-        """Get comprehensive data profile for a table."""
-        
-        if table == "facilities":
-            df = self.load_facilities()
-        elif table == "financials":
-            df = self.load_financials()
-        else:
-            df = self.load_merged_data()
-        
-        profile = {
-            'table': table,
-            'total_rows': len(df),
-            'total_columns': len(df.columns),
-            'memory_usage': f"{df.memory_usage(deep=True).sum() / 1024 / 1024:.2f} MB",
-            'columns': {},
-            'timestamp': datetime.now().isoformat()
-        }
-        
-        # Column-level analysis
-        for col in df.columns:
-            col_profile = {
-                'dtype': str(df[col].dtype),
-                'null_count': int(df[col].isnull().sum()),
-                'null_percentage': float(df[col].isnull().sum() / len(df) * 100),
-                'unique_count': int(df[col].nunique())
-            }
-            
-            # Numeric column statistics
-            if pd.api.types.is_numeric_dtype(df[col]):
-                col_profile.update({
-                    'mean': float(df[col].mean()) if not df[col].isnull().all() else None,
-                    'median': float(df[col].median()) if not df[col].isnull().all() else None,
-                    'std': float(df[col].std()) if not df[col].isnull().all() else None,
-                    'min': float(df[col].min()) if not df[col].isnull().all() else None,
-                    'max': float(df[col].max()) if not df[col].isnull().all() else None,
-                    'q25': float(df[col].quantile(0.25)) if not df[col].isnull().all() else None,
-                    'q75': float(df[col].quantile(0.75)) if not df[col].isnull().all() else None
-                })
-            
-            # String column statistics
-            elif pd.api.types.is_string_dtype(df[col]) or df[col].dtype == 'object':
-                if df[col].notna().any():
-                    col_profile.update({
-                        'avg_length': float(df[col].str.len().mean()) if not df[col].isnull().all() else None,
-                        'max_length': int(df[col].str.len().max()) if not df[col].isnull().all() else None,
-                        'most_common': str(df[col].mode().iloc[0]) if len(df[col].mode()) > 0 else None
-                    })
-            
-            profile['columns'][col] = col_profile
+    def get_data_profile(self, table: str = "facilities", columns: Optional[List[str]] = None,
+                         sample_size: int = DEFAULT_SAMPLE_SIZE, exact: bool = False) -> Dict[str, Any]:
+        """
+        Get a data profile for a table ('facilities', 'financials' or merged).
         
-        return profile
+        Args:
+            table: Table to profile; anything else profiles the merged frame
+            columns: Only profile these columns (default: all)
+            sample_size: Tables with more rows are profiled from a sample
+            exact: Profile every row exactly
+        """
+        if table not in ("facilities", "financials"):
+            table = "merged"
+        profile = get_table_profile(self.frames, table, sample_size=0 if exact else sample_size)
+        return profile.profile(columns)
     
-    def get_county_analysis(self) -> Dict[str, Any]:
-        """Analyze facilities and financials by county."""
-        df = self.load_merged_data()
+    def get_county_analysis(self, category: Optional[str] = None,
+                            year: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Analyze facilities and financials by county (from the rollup cubes).
         
-        county_stats = df.groupby('county').agg({
-            'facility_id': 'count',
-            'capacity': 'sum',
-            'total_revenue': ['sum', 'mean', 'median'],
-            'net_income': ['sum', 'mean'],
-            'total_visits': 'sum'
-        }).round(2)
-        
-        county_stats.columns = ['_'.join(col).strip('_') for col in county_stats.columns.values]
-        county_stats = county_stats.reset_index()
-        
-        # Convert to dict
-        result = {
-            'counties': county_stats.to_dict('records'),
-            'total_counties': len(county_stats),
-            'top_revenue_county': county_stats.nlargest(1, 'total_revenue_sum').iloc[0]['county'] if len(county_stats) > 0 else None,
-            'top_facilities_county': county_stats.nlargest(1, 'facility_id_count').iloc[0]['county'] if len(county_stats) > 0 else None
-        }
+        Args:
+            category: Only facilities in this category_name
+            year: Only financial rows for this year
+        """
+        records = [
+            _cube_record(r, 'county', COUNTY_MEASURES)
+            for r in self.cubes.rollup('county', category_name=category, year=year)
+        ]
         
-        return result
+        return {
+            'counties': records,
+            'total_counties': len(records),
+            'top_revenue_county': max(records, key=lambda r: r['total_revenue_sum'])['county'] if records else None,
+            'top_facilities_county': max(records, key=lambda r: r['facility_id_count'])['county'] if records else None
+        }
     
-    def get_category_analysis(self) -> Dict[str, Any]:
-        """Analyze by facility category."""
-        df = self.load_merged_data()
-        
-        category_stats = df.groupby('category_name').agg({
-            'facility_id': 'count',
-            'capacity': ['sum', 'mean'],
-            'total_revenue': ['sum', 'mean'],
-            'net_income': ['sum', 'mean'],
-            'total_visits': 'sum'
-        }).round(2)
+    def get_category_analysis(self, county: Optional[str] = None,
+                              year: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Analyze by facility category (from the rollup cubes).
         
-        category_stats.columns = ['_'.join(col).strip('_') for col in category_stats.columns.values]
-        category_stats = category_stats.reset_index()
+        Args:
+            county: Only facilities in this county
+            year: Only financial rows for this year
+        """
+        records = [
+            _cube_record(r, 'category_name', CATEGORY_MEASURES)
+            for r in self.cubes.rollup('category_name', county=county, year=year)
+        ]
         
         return {
-            'categories': category_stats.to_dict('records'),
-            'total_categories': len(category_stats)
+            'categories': records,
+            'total_categories': len(records)
         }
     
-    def get_revenue_distribution(self, bins: int = 10) -> Dict[str, Any]:
-        """Analyze revenue distribution across facilities."""
-        df = self.load_financials()
-        df = df[df['total_revenue'].notna() & (df['total_revenue'] > 0)]
-        
-        if len(df) == 0:
-            return {'bins': [], 'counts': [], 'total': 0}
+    def _drill_down(self, df: pd.DataFrame, county: Optional[str], category: Optional[str]) -> pd.DataFrame:
+        """Rows of a cached frame in one county and/or category."""
+        if county is not None:
+            df = df[df['county'] == county]
+        if category is not None:
+            df = df[df['category_name'] == category]
+        return df
+    
+    def get_revenue_distribution(self, bins: int = 10, county: Optional[str] = None,
+                                 category: Optional[str] = None, exact: bool = False) -> Dict[str, Any]:
+        """
+        Analyze revenue distribution across facilities.
         
-        # Create histogram
-        hist, bin_edges = np.histogram(df['total_revenue'], bins=bins)
+        Histogram and statistics come from the rollup cube sketches unless
+        `exact` is set. With a county or category the distribution covers
+        financials matched to those facilities.
+        """
+        if exact:
+            if county is None and category is None:
+                df = self.load_financials()
+            else:
+                df = self._drill_down(self.load_merged_data(), county, category)
+            df = df[df['total_revenue'].notna() & (df['total_revenue'] > 0)]
+            
+            if len(df) == 0:
+                return {'bins': [], 'counts': [], 'total': 0}
+            
+            # Create histogram
+            hist, bin_edges = np.histogram(df['total_revenue'], bins=bins)
+            counts = hist.tolist()
+            total, mean, median, revenue = (len(df), float(df['total_revenue'].mean()),
+                                            float(df['total_revenue'].median()), float(df['total_revenue'].sum()))
+        else:
+            if county is None and category is None:
+                sketch = self.cubes.sketch('total_revenue', source='financials')
+            else:
+                sketch = self.cubes.sketch('total_revenue', county=county, category_name=category)
+            sketch = sketch.positive_part()
+            
+            if not sketch.count:
+                return {'bins': [], 'counts': [], 'total': 0}
+            
+            bin_edges = np.linspace(sketch.min, sketch.max, bins + 1)
+            counts = sketch.histogram(bin_edges)
+            total, mean, median, revenue = (sketch.count, sketch.sum / sketch.count,
+                                            sketch.quantile(0.5), sketch.sum)
         
         return {
             'bins': [f"${int(bin_edges[i]):,} - ${int(bin_edges[i+1]):,}" for i in range(len(bin_edges)-1)],
-            'counts': hist.tolist(),
-            'total': len(df),
-            'mean_revenue': float(df['total_revenue'].mean()),
-            'median_revenue': float(df['total_revenue'].median()),
-            'total_revenue': float(df['total_revenue'].sum())
+            'counts': counts,
+            'total': total,
+            'mean_revenue': mean,
+            'median_revenue': median,
+            'total_revenue': revenue,
+            'approximate': not exact
         }
     
-    def get_capacity_analysis(self) -> Dict[str, Any]:
-        """Analyze facility capacity distribution."""
-        df = self.load_facilities()
-        df = df[df['capacity'].notna() & (df['capacity'] > 0)]
-        
-        if len(df) == 0:
-            return {'total': 0}
+    def get_capacity_analysis(self, county: Optional[str] = None, category: Optional[str] = None,
+                              exact: bool = False) -> Dict[str, Any]:
+        """Analyze facility capacity distribution (percentiles from sketches unless `exact`)."""
+        if exact:
+            df = self._drill_down(self.load_facilities(), county, category)
+            capacity = df.loc[df['capacity'].notna() & (df['capacity'] > 0), 'capacity']
+            
+            if len(capacity) == 0:
+                return {'total': 0}
+            
+            total, total_capacity, low, high = len(capacity), capacity.sum(), capacity.min(), capacity.max()
+            
+            def quantile(q: float) -> float:
+                return float(capacity.quantile(q))
+        else:
+            sketch = self.cubes.sketch('capacity', source='facilities',
+                                       county=county, category_name=category).positive_part()
+            
+            if not sketch.count:
+                return {'total': 0}
+            
+            total, total_capacity, low, high = sketch.count, sketch.sum, sketch.min, sketch.max
+            quantile = sketch.quantile
         
         return {
-            'total_facilities': len(df),
-            'total_capacity': int(df['capacity'].sum()),
-            'mean_capacity': float(df['capacity'].mean()),
-            'median_capacity': float(df['capacity'].median()),
-            'max_capacity': int(df['capacity'].max()),
-            'min_capacity': int(df['capacity'].min()),
+            'total_facilities': total,
+            'total_capacity': int(total_capacity),
+            'mean_capacity': float(total_capacity / total),
+            'median_capacity': quantile(0.50),
+            'max_capacity': int(high),
+            'min_capacity': int(low),
             'capacity_percentiles': {
-                'p25': float(df['capacity'].quantile(0.25)),
-                'p50': float(df['capacity'].quantile(0.50)),
-                'p75': float(df['capacity'].quantile(0.75)),
-                'p90': float(df['capacity'].quantile(0.90)),
-                'p95': float(df['capacity'].quantile(0.95))
-            }
+                'p25': quantile(0.25),
+                'p50': quantile(0.50),
+                'p75': quantile(0.75),
+                'p90': quantile(0.90),
+                'p95': quantile(0.95)
+            },
+            'approximate': not exact
         }
     
-    def get_time_series_analysis(self) -> Dict[str, Any]:
-        """Analyze financial trends over time."""
-        df = self.load_financials()
-        df = df[df['year'].notna()]
-        
-        if len(df) == 0:
-            return {'years': [], 'data': {}}
-        
-        yearly_stats = df.groupby('year').agg({
-            'total_revenue': ['sum', 'mean', 'count'],
-            'total_expenses': ['sum', 'mean'],
-            'net_income': ['sum', 'mean'],
-            'total_visits': 'sum'
-        }).round(2)
+    def get_time_series_analysis(self, county: Optional[str] = None,
+                                 category: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Analyze financial trends over time (from the rollup cubes).
         
-        yearly_stats.columns = ['_'.join(col).strip('_') for col in yearly_stats.columns.values]
-        yearly_stats = yearly_stats.reset_index()
+        Without filters every financial record counts once; with a county or
+        category the series covers financials matched to those facilities.
+        """
+        if county is None and category is None:
+            rows = self.cubes.rollup('year', source='financials')
+        else:
+            rows = self.cubes.rollup('year', county=county, category_name=category)
+        records = [_cube_record(r, 'year', YEARLY_MEASURES) for r in rows]
         
         return {
-            'years': yearly_stats['year'].tolist(),
-            'data': yearly_stats.to_dict('records')
+            'years': [r['year'] for r in records],
+            'data': records
         }
     
     def get_correlation_matrix(self) -> Dict[str, Any]:
@@ -259,17 +398,31 @@ class PandasAnalyzer:
             'matrix': corr_matrix.values.tolist()
         }
     
-    def get_outlier_analysis(self, column: str = 'total_revenue', 
-                            threshold: float = 3.0) -> Dict[str, Any]:
-        """Identify outliers using IQR method."""
-        df = self.load_merged_data()
-        df = df[df[column].notna()]
+    def get_outlier_analysis(self, column: str = 'total_revenue', threshold: float = 3.0,
+                             county: Optional[str] = None, category: Optional[str] = None,
+                             exact: bool = False) -> Dict[str, Any]:
+        """
+        Identify outliers using the IQR method.
         
-        if len(df) == 0 or column not in df.columns:
+        Quartiles come from the rollup cube sketches unless `exact` is set
+        or the column has no sketch; outlier rows are then picked from the
+        cached merged frame.
+        """
+        df = self._drill_down(self.load_merged_data(), county, category)
+        if column not in df.columns:
+            return {'outliers': [], 'count': 0}
+        
+        df = df[df[column].notna()]
+        if len(df) == 0:
             return {'outliers': [], 'count': 0}
         
-        Q1 = df[column].quantile(0.25)
-        Q3 = df[column].quantile(0.75)
+        exact = exact or column not in MEASURES
+        if exact:
+            Q1 = df[column].quantile(0.25)
+            Q3 = df[column].quantile(0.75)
+        else:
+            sketch = self.cubes.sketch(column, county=county, category_name=category)
+            Q1, Q3 = sketch.quantile(0.25), sketch.quantile(0.75)
         IQR = Q3 - Q1
         
         lower_bound = Q1 - threshold * IQR
@@ -285,7 +438,8 @@ class PandasAnalyzer:
             'outlier_count': len(outliers),
             'total_count': len(df),
             'outlier_percentage': float(len(outliers) / len(df) * 100),
-            'outliers': outliers[['name', 'county', column]].head(50).to_dict('records')
+            'outliers': outliers[['name', 'county', column]].head(50).to_dict('records'),
+            'approximate': not exact
         }
     
     def get_summary_statistics(self) -> Dict[str, Any]:
@@ -0,0 +1,480 @@
+"""
+Precomputed rollup cubes for Hippocratic analytics.
+
+Materializes the facilities/financials aggregates behind the county,
+category and time-series analyses into a summary table, one row per cell:
+
+- source 'merged': facilities LEFT JOIN financials on license_number,
+  by (county, category_name, year); facilities without financials land in
+  the year-NULL cell
+- source 'facilities': the facilities table alone, by (county, category_name)
+- source 'financials': the financials table alone, by year
+
+Each cell holds row counts, per-measure sums and non-null counts (so means
+combine exactly) and a mergeable QuantileSketch per numeric column for
+quantiles and histograms.
+Appended facilities and financials are folded in incrementally; deletes
+trigger a full rebuild. Queries roll the cells up in memory with optional
+drill-down filters.
+
+Usage:
+    cubes = get_rollup_cubes("local.db")
+    cubes.refresh()                       # after ingestion
+    cubes.rollup('county', category_name='Hospice', year=2024)
+    cubes.sketch('capacity', source='facilities', county='Alameda').quantile(0.9)
+"""
+
+import json
+import threading
+import time
+import numpy as np
+from typing import Dict, Any, List, Optional, Tuple
+
+from db_pool import get_pool
+from sketches import QuantileSketch
+
+# Measures kept per cell: name -> SQL expression over the joined rows
+MEASURES = {
+    'capacity': 'f.capacity',
+    'total_revenue': 'fin.total_revenue',
+    'total_expenses': 'fin.total_expenses',
+    'net_income': 'fin.net_income',
+    'total_visits': 'fin.total_visits',
+    'total_patients': 'fin.total_patients',
+    'revenue_per_visit': 'fin.revenue_per_visit',
+}
+
+# Drill-down dimensions per source
+DIMENSIONS = {
+    'merged': ('county', 'category_name', 'year'),
+    'facilities': ('county', 'category_name'),
+    'financials': ('year',),
+}
+
+# Seconds between checks for appended rows when answering queries
+REFRESH_CHECK_INTERVAL = 2.0
+
+# Memoized rollup results per cube version
+RESULT_CACHE_SIZE = 256
+
+
+def _measure_columns() -> str:
+    return ', '.join(f"SUM({expr}), COUNT({expr})" for expr in MEASURES.values())
+
+
+class RollupCubes:
+    """Rollup cells for one database, persisted in rollup_cells."""
+    
+    def __init__(self, db_path: str = "local.db"):
+        self.pool = get_pool(db_path)
+        self._cells: Dict[str, Dict[str, Any]] = {}
+        self._results: Dict[Tuple, Any] = {}
+        self._loaded = False
+        self._checked_at = 0.0
+        self._lock = threading.RLock()
+        self.init_tables()
+    
+    def init_tables(self):
+        """Create the rollup tables."""
+        with self.pool.connection() as conn, conn:
+            # Cells from before per-column sketches are dropped and rebuilt
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(rollup_cells)")}
+            if columns and 'sketches' not in columns:
+                conn.execute("DROP TABLE rollup_cells")
+                conn.execute("DROP TABLE IF EXISTS rollup_meta")
+            
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS rollup_cells (
+                    cell_key TEXT PRIMARY KEY,
+                    source TEXT NOT NULL,
+                    county TEXT,
+                    category_name TEXT,
+                    year INTEGER,
+                    row_count INTEGER NOT NULL,
+                    measures TEXT NOT NULL,
+                    sketches TEXT,
+                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS rollup_meta (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER
+                )
+            """)
+    
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+    
+    def _read_meta(self, conn) -> Dict[str, int]:
+        return dict(conn.execute("SELECT key, value FROM rollup_meta").fetchall())
+    
+    def _new_cell(self, source: str, county, category_name, year) -> Dict[str, Any]:
+        return {
+            'source': source,
+            'county': county,
+            'category_name': category_name,
+            'year': year,
+            'row_count': 0,
+            'measures': {name: [0, 0] for name in MEASURES},
+            'sketches': {},
+        }
+    
+    def _copy_cell(self, key: str) -> Optional[Dict[str, Any]]:
+        """Working copy of a stored cell, so a failed refresh leaves memory untouched."""
+        cell = self._cells.get(key)
+        if cell is None:
+            return None
+        return {
+            **cell,
+            'measures': {name: list(values) for name, values in cell['measures'].items()},
+            'sketches': {name: QuantileSketch.from_dict(sk.to_dict()) for name, sk in cell['sketches'].items()},
+        }
+    
+    def _cell(self, touched: Dict[str, Dict[str, Any]], source: str, county, category_name, year) -> Dict[str, Any]:
+        key = json.dumps([source, county, category_name, year])
+        cell = touched.get(key)
+        if cell is None:
+            cell = touched[key] = self._copy_cell(key) or self._new_cell(source, county, category_name, year)
+        return cell
+    
+    def _apply(self, touched: Dict[str, Dict[str, Any]], source: str, rows: List[tuple], sign: int = 1):
+        """Fold grouped rows (county, category, year, count, sum, n, sum, n, ...) into cells."""
+        for row in rows:
+            cell = self._cell(touched, source, *row[:3])
+            cell['row_count'] += sign * row[3]
+            for i, name in enumerate(MEASURES):
+                total, n = row[4 + 2 * i], row[5 + 2 * i]
+                cell['measures'][name][0] += sign * (total or 0)
+                cell['measures'][name][1] += sign * n
+    
+    def _sketch_values(self, touched: Dict[str, Dict[str, Any]], source: str, rows: List[tuple], sign: int = 1):
+        """Add (or remove) detail rows (county, category, year, measure values...) in the cells' sketches."""
+        by_cell: Dict[tuple, List[tuple]] = {}
+        for row in rows:
+            by_cell.setdefault(row[:3], []).append(row[3:])
+        
+        for dims, values in by_cell.items():
+            cell = self._cell(touched, source, *dims)
+            columns = np.array(values, dtype=np.float64)
+            for i, name in enumerate(MEASURES):
+                column = columns[:, i]
+                if not np.isfinite(column).any():
+                    continue
+                sketch = cell['sketches'].setdefault(name, QuantileSketch())
+                if sign > 0:
+                    sketch.add(column)
+                else:
+                    sketch.remove(column)
+    
+    def _fold(self, conn, touched: Dict[str, Dict[str, Any]], fac_range: Tuple[int, int],
+              fin_range: Tuple[int, int], old_fin: int):
+        """
+        Fold facilities with rowid in fac_range and financials with rowid in
+        fin_range into the cells. old_fin is the financials watermark the
+        existing cells already cover.
+        """
+        fac_lo, fac_hi = fac_range
+        fin_lo, fin_hi = fin_range
+        
+        # (source, FROM/WHERE clause, params, sign); rows are always f x fin,
+        # with "ON 0" joins standing in for the side a source lacks
+        parts = [
+            # New facilities against already-covered financials (year-NULL cell if none)
+            ('merged', """
+                FROM facilities f
+                LEFT JOIN financials fin ON f.license_number = fin.license_number AND fin.rowid <= ?
+                WHERE f.rowid > ? AND f.rowid <= ?
+            """, (old_fin, fac_lo, fac_hi), 1),
+            # New financials against every facility up to the new watermark
+            ('merged', """
+                FROM financials fin
+                JOIN facilities f ON f.license_number = fin.license_number
+                WHERE fin.rowid > ? AND fin.rowid <= ? AND f.rowid <= ?
+            """, (fin_lo, fin_hi, fac_hi), 1),
+            # Facilities and financials on their own
+            ('facilities', """
+                FROM facilities f
+                LEFT JOIN financials fin ON 0
+                WHERE f.rowid > ? AND f.rowid <= ?
+            """, (fac_lo, fac_hi), 1),
+            ('financials', """
+                FROM financials fin
+                LEFT JOIN facilities f ON 0
+                WHERE fin.rowid > ? AND fin.rowid <= ?
+            """, (fin_lo, fin_hi), 1),
+        ]
+        if fin_hi > fin_lo:
+            # Facilities getting their first financials lose their year-NULL row
+            parts.append(('merged', """
+                FROM facilities f
+                LEFT JOIN financials fin ON 0
+                WHERE f.rowid <= ?
+                  AND f.license_number IN (SELECT license_number FROM financials WHERE rowid > ? AND rowid <= ?)
+                  AND NOT EXISTS (SELECT 1 FROM financials o WHERE o.license_number = f.license_number AND o.rowid <= ?)
+            """, (fac_hi, fin_lo, fin_hi, old_fin), -1))
+        
+        for source, clause, params, sign in parts:
+            self._apply(touched, source, conn.execute(f"""
+                SELECT f.county, f.category_name, fin.year, COUNT(*), {_measure_columns()}
+                {clause}
+                GROUP BY 1, 2, 3
+            """, params).fetchall(), sign)
+            self._sketch_values(touched, source, conn.execute(f"""
+                SELECT f.county, f.category_name, fin.year, {', '.join(MEASURES.values())}
+                {clause}
+            """, params).fetchall(), sign)
+    
+    def _save(self, conn, touched: Dict[str, Dict[str, Any]], meta: Dict[str, int]):
+        """Write touched cells (dropping empty ones) and the new watermarks."""
+        drop = [(key,) for key, cell in touched.items() if cell['row_count'] <= 0]
+        keep = [
+            (key, cell['source'], cell['county'], cell['category_name'], cell['year'], cell['row_count'],
+             json.dumps(cell['measures']),
+             json.dumps({name: sk.to_dict() for name, sk in cell['sketches'].items()}))
+            for key, cell in touched.items() if cell['row_count'] > 0
+        ]
+        conn.executemany("DELETE FROM rollup_cells WHERE cell_key = ?", drop)
+        conn.executemany("""
+            INSERT OR REPLACE INTO rollup_cells
+                (cell_key, source, county, category_name, year, row_count, measures, sketches)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, keep)
+        conn.executemany("INSERT OR REPLACE INTO rollup_meta (key, value) VALUES (?, ?)", list(meta.items()))
+        
+        for key, cell in touched.items():
+            if cell['row_count'] > 0:
+                self._cells[key] = cell
+            else:
+                self._cells.pop(key, None)
+        self._results.clear()
+    
+    def _watermarks(self, conn) -> Dict[str, int]:
+        fac_wm, fac_count = conn.execute("SELECT IFNULL(MAX(rowid), 0), COUNT(*) FROM facilities").fetchone()
+        fin_wm, fin_count = conn.execute("SELECT IFNULL(MAX(rowid), 0), COUNT(*) FROM financials").fetchone()
+        return {'facilities_rowid': fac_wm, 'facilities_count': fac_count,
+                'financials_rowid': fin_wm, 'financials_count': fin_count}
+    
+    def rebuild(self) -> Dict[str, Any]:
+        """Recompute every cell from scratch."""
+        with self._lock, self.pool.connection() as conn, conn:
+            start = time.time()
+            meta = self._watermarks(conn)
+            conn.execute("DELETE FROM rollup_cells")
+            self._cells = {}
+            
+            touched: Dict[str, Dict[str, Any]] = {}
+            self._fold(conn, touched, (0, meta['facilities_rowid']), (0, meta['financials_rowid']), old_fin=0)
+            self._save(conn, touched, meta)
+            self._loaded = True
+        
+        return {'mode': 'rebuild', 'cells': len(self._cells), 'duration_ms': (time.time() - start) * 1000}
+    
+    def refresh(self) -> Dict[str, Any]:
+        """
+        Bring the cells up to date with facilities and financials.
+        
+        Rows appended since the last refresh are folded in incrementally.
+        If rows were deleted (fewer rows below the stored watermarks) the
+        cube is rebuilt. In-place edits are not detected; call rebuild()
+        after ingestion that rewrites existing rows.
+        
+        Returns:
+            Dict with mode ('incremental', 'rebuild' or 'current') and counts
+        """
+        with self._lock:
+            self._load()
+            with self.pool.connection() as conn, conn:
+                start = time.time()
+                old = self._read_meta(conn)
+                new = self._watermarks(conn)
+                
+                # Deleted rows (fewer rows below the watermarks) need a rebuild
+                stale = not old
+                if old:
+                    fac_kept, fin_kept = conn.execute("""
+                        SELECT (SELECT COUNT(*) FROM facilities WHERE rowid <= ?),
+                               (SELECT COUNT(*) FROM financials WHERE rowid <= ?)
+                    """, (old['facilities_rowid'], old['financials_rowid'])).fetchone()
+                    stale = fac_kept != old['facilities_count'] or fin_kept != old['financials_count']
+                
+                if not stale:
+                    if (new['facilities_rowid'], new['financials_rowid']) == (old['facilities_rowid'], old['financials_rowid']):
+                        return {'mode': 'current', 'cells': len(self._cells)}
+                    
+                    touched: Dict[str, Dict[str, Any]] = {}
+                    self._fold(conn, touched,
+                               (old['facilities_rowid'], new['facilities_rowid']),
+                               (old['financials_rowid'], new['financials_rowid']),
+                               old_fin=old['financials_rowid'])
+                    self._save(conn, touched, new)
+            
+            if stale:
+                return self.rebuild()
+        
+        return {
+            'mode': 'incremental',
+            'facilities_added': new['facilities_count'] - old['facilities_count'],
+            'financials_added': new['financials_count'] - old['financials_count'],
+            'cells_updated': len(touched),
+            'duration_ms': (time.time() - start) * 1000,
+        }
+    
+    def _load(self):
+        """Read the persisted cells into memory once."""
+        if self._loaded:
+            return
+        with self.pool.connection() as conn:
+            rows = conn.execute("""
+                SELECT cell_key, source, county, category_name, year, row_count, measures, sketches
+                FROM rollup_cells
+            """).fetchall()
+        self._cells = {
+            key: {
+                'source': source,
+                'county': county,
+                'category_name': category_name,
+                'year': year,
+                'row_count': row_count,
+                'measures': json.loads(measures),
+                'sketches': {name: QuantileSketch.from_dict(sk) for name, sk in json.loads(sketches or '{}').items()},
+            }
+            for key, source, county, category_name, year, row_count, measures, sketches in rows
+        }
+        self._loaded = True
+    
+    def _ensure_current(self):
+        """Fold in appended rows, checking at most every REFRESH_CHECK_INTERVAL seconds."""
+        now = time.time()
+        if now - self._checked_at >= REFRESH_CHECK_INTERVAL:
+            self.refresh()
+            self._checked_at = now
+    
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    
+    def rollup(self, group_by: Optional[str], source: str = 'merged', **filters) -> List[Dict[str, Any]]:
+        """
+        Roll cells up to one dimension (or everything, if group_by is None).
+        
+        Args:
+            group_by: A dimension of the source (see DIMENSIONS)
+            source: 'merged', 'facilities' or 'financials'
+            **filters: Exact-match drill-down on the source's dimensions
+        
+        Returns:
+            One dict per group, sorted by key (NULL keys excluded), with
+            row_count, {measure}_sum / _count / _mean and total_revenue_median
+        """
+        filters = self._check_dims(source, [group_by] if group_by else [], filters)
+        
+        with self._lock:
+            self._ensure_current()
+            cache_key = ('rollup', group_by, source, tuple(sorted(filters.items())))
+            if cache_key in self._results:
+                return self._results[cache_key]
+            
+            groups: Dict[Any, Dict[str, Any]] = {}
+            for cell in self._matching(source, filters):
+                key = cell[group_by] if group_by else None
+                if group_by and key is None:
+                    continue
+                
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = {'row_count': 0, 'measures': {name: [0, 0] for name in MEASURES},
+                                           'sketch': QuantileSketch()}
+                group['row_count'] += cell['row_count']
+                for name, (total, n) in cell['measures'].items():
+                    group['measures'][name][0] += total
+                    group['measures'][name][1] += n
+                if 'total_revenue' in cell['sketches']:
+                    group['sketch'].merge(cell['sketches']['total_revenue'])
+            
+            results = []
+            for key in sorted(groups, key=lambda k: (k is None, k)):
+                group = groups[key]
+                record = {group_by: key} if group_by else {}
+                record['row_count'] = group['row_count']
+                for name, (total, n) in group['measures'].items():
+                    record[f'{name}_sum'] = round(total, 2)
+                    record[f'{name}_count'] = n
+                    record[f'{name}_mean'] = round(total / n, 2) if n else None
+                median = group['sketch'].quantile(0.5)
+                record['total_revenue_median'] = round(median, 2) if median is not None else None
+                results.append(record)
+            
+            self._remember(cache_key, results)
+            return results
+    
+    def sketch(self, column: str, source: str = 'merged', **filters) -> QuantileSketch:
+        """
+        Merged QuantileSketch of one column over the matching cells.
+        
+        The result is shared between callers; treat it as read-only.
+        
+        Args:
+            column: A key of MEASURES
+            source: 'merged', 'facilities' or 'financials'
+            **filters: Exact-match drill-down on the source's dimensions
+        """
+        if column not in MEASURES:
+            raise ValueError(f"No sketch for column {column}")
+        filters = self._check_dims(source, [], filters)
+        
+        with self._lock:
+            self._ensure_current()
+            cache_key = ('sketch', column, source, tuple(sorted(filters.items())))
+            if cache_key in self._results:
+                return self._results[cache_key]
+            
+            merged = QuantileSketch()
+            for cell in self._matching(source, filters):
+                if column in cell['sketches']:
+                    merged.merge(cell['sketches'][column])
+            
+            self._remember(cache_key, merged)
+            return merged
+    
+    def _check_dims(self, source: str, group_by: List[str], filters: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate dimensions for a source; returns the non-None filters."""
+        if source not in DIMENSIONS:
+            raise ValueError(f"Unknown rollup source {source}")
+        filters = {k: v for k, v in filters.items() if v is not None}
+        for dim in [*group_by, *filters]:
+            if dim not in DIMENSIONS[source]:
+                raise ValueError(f"{source} rollups have no dimension {dim}")
+        return filters
+    
+    def _matching(self, source: str, filters: Dict[str, Any]):
+        for cell in self._cells.values():
+            if cell['source'] == source and all(str(cell[d]) == str(v) for d, v in filters.items()):
+                yield cell
+    
+    def _remember(self, cache_key: Tuple, result: Any):
+        if len(self._results) >= RESULT_CACHE_SIZE:
+            self._results.clear()
+        self._results[cache_key] = result
+
+
+# Shared cubes keyed by resolved database path
+_CUBES: Dict[str, RollupCubes] = {}
+_CUBES_LOCK = threading.Lock()
+
+
+def get_rollup_cubes(db_path: str = "local.db") -> RollupCubes:
+    """Get the shared RollupCubes for a database file, creating it on first use."""
+    key = get_pool(db_path).db_path
+    with _CUBES_LOCK:
+        cubes = _CUBES.get(key)
+        if cubes is None:
+            cubes = _CUBES[key] = RollupCubes(key)
+        return cubes
+
+
+if __name__ == "__main__":
+    print("🧊 Rebuilding rollup cubes...")
+    stats = get_rollup_cubes().rebuild()
+    print(f"✅ {stats['cells']} cells in {stats['duration_ms']:.0f} ms")
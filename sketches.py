@@ -0,0 +1,302 @@
+"""
+Mergeable summary sketches for Hippocratic analytics.
+
+QuantileSketch is a DDSketch-style quantile sketch: values fall into
+logarithmic buckets whose width guarantees a relative error bound on every
+quantile. Sketches built on disjoint row sets merge exactly by adding bucket
+counts, so per-cell sketches in a rollup can be combined for any drill-down
+without rereading the rows. The buckets double as a fixed-bin (log-scale)
+histogram: counts below a value, and so histograms over any bin edges, are
+read off them without the raw values.
+
+HyperLogLog estimates distinct counts from 2**precision small registers
+(about 1.6% standard error at the default precision of 12) and merges by
+taking register maxima.
+
+Usage:
+    sketch = QuantileSketch()
+    sketch.add(df['total_revenue'].to_numpy())
+    sketch.quantile(0.5)            # median, within 1% of the true value
+    
+    combined = QuantileSketch.from_dict(json.loads(stored))
+    combined.merge(sketch)
+    combined.histogram(np.linspace(combined.min, combined.max, 11))
+    
+    hll = HyperLogLog()
+    hll.add(df['owner_name'])
+    hll.estimate()
+"""
+
+import math
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, Iterable, List, Optional
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+
+class QuantileSketch:
+    """
+    Relative-error quantile sketch over real values.
+    
+    Positive and negative values are kept in separate bucket stores keyed by
+    ceil(log_gamma(|x|)); zeros are counted apart. Any quantile is returned
+    within `relative_accuracy` of a value at that rank. Sums are exact;
+    min/max are exact unless values were removed (then they are bounds).
+    """
+    
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.positive_sum = 0.0
+        self.negative_sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    @property
+    def sum(self) -> float:
+        return self.positive_sum + self.negative_sum
+    
+    def _add_to_store(self, store: Dict[int, int], magnitudes: np.ndarray, sign: int = 1):
+        keys, counts = np.unique(np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64),
+                                 return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            remaining = store.get(key, 0) + sign * count
+            if remaining > 0:
+                store[key] = remaining
+            else:
+                store.pop(key, None)
+    
+    def _update(self, values: Iterable[float], sign: int) -> np.ndarray:
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return values
+        
+        positive = values[values > 0]
+        negative = values[values < 0]
+        if len(positive):
+            self._add_to_store(self.positive, positive, sign)
+            self.positive_sum += sign * float(positive.sum())
+        if len(negative):
+            self._add_to_store(self.negative, -negative, sign)
+            self.negative_sum += sign * float(negative.sum())
+        
+        self.zero_count += sign * int(len(values) - len(positive) - len(negative))
+        self.count += sign * int(len(values))
+        return values
+    
+    def add(self, values: Iterable[float]):
+        """Add values (NaN and infinities are ignored)."""
+        values = self._update(values, 1)
+        if len(values):
+            self.min = min(self.min, float(values.min()))
+            self.max = max(self.max, float(values.max()))
+    
+    def remove(self, values: Iterable[float]):
+        """Remove values previously added (min/max are left as bounds)."""
+        self._update(values, -1)
+        if self.count <= 0:
+            self.__init__(self.relative_accuracy)
+    
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """Fold another sketch (same accuracy) into this one."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in other_store.items():
+                store[key] = store.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.positive_sum += other.positive_sum
+        self.negative_sum += other.negative_sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+    
+    def _bucket_value(self, key: int) -> float:
+        return 2 * self.gamma ** key / (self.gamma + 1)
+    
+    def _value_at_rank(self, rank: int) -> float:
+        """Approximate value of the rank-th smallest element (0-based)."""
+        seen = 0
+        
+        # Most negative first: negative buckets by descending magnitude
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return max(-self._bucket_value(key), self.min)
+        
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return min(self._bucket_value(key), self.max)
+        return self.max
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Approximate q-quantile (0 <= q <= 1), or None for an empty sketch.
+        
+        Interpolates linearly between the neighbouring ranks, like
+        numpy/pandas quantiles, so e.g. the median of an even count is the
+        mean of the two middle values.
+        """
+        if not self.count:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        
+        rank = q * (self.count - 1)
+        lower = int(math.floor(rank))
+        value = self._value_at_rank(lower)
+        if rank > lower:
+            value += (rank - lower) * (self._value_at_rank(lower + 1) - value)
+        return value
+    
+    def positive_part(self) -> "QuantileSketch":
+        """New sketch of only the values > 0."""
+        part = QuantileSketch(self.relative_accuracy)
+        if self.positive:
+            part.positive = dict(self.positive)
+            part.count = sum(self.positive.values())
+            part.positive_sum = self.positive_sum
+            part.min = max(self.min, self.gamma ** (min(self.positive) - 1))
+            part.max = self.max
+        return part
+    
+    def count_below(self, x: float) -> float:
+        """Approximate number of values < x."""
+        if not self.count or x <= self.min:
+            return 0
+        if x > self.max:
+            return self.count
+        
+        below = 0
+        for key, count in self.negative.items():
+            if -self._bucket_value(key) < x:
+                below += count
+        if x > 0:
+            below += self.zero_count
+            below += sum(count for key, count in self.positive.items() if self._bucket_value(key) < x)
+        return below
+    
+    def histogram(self, edges: Iterable[float]) -> List[int]:
+        """
+        Approximate counts per bin, like np.histogram: bins are [a, b)
+        except the last, which includes its right edge.
+        """
+        edges = list(edges)
+        if len(edges) < 2:
+            return []
+        cumulative = [self.count_below(e) for e in edges[:-1]]
+        cumulative.append(self.count_below(math.nextafter(edges[-1], math.inf)))
+        return [int(b - a) for a, b in zip(cumulative[:-1], cumulative[1:])]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Compact JSON-serializable form (see from_dict)."""
+        return {
+            'a': self.relative_accuracy,
+            'n': self.count,
+            'z': self.zero_count,
+            's': [self.positive_sum, self.negative_sum],
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+            'p': {str(k): v for k, v in self.positive.items()},
+            'm': {str(k): v for k, v in self.negative.items()},
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "QuantileSketch":
+        sketch = cls(data['a']) if data else cls()
+        if data and data['n']:
+            sketch.positive = {int(k): v for k, v in data['p'].items()}
+            sketch.negative = {int(k): v for k, v in data['m'].items()}
+            sketch.zero_count = data['z']
+            sketch.count = data['n']
+            sketch.positive_sum, sketch.negative_sum = data.get('s', (0.0, 0.0))
+            sketch.min = data['min']
+            sketch.max = data['max']
+        return sketch
+
+
+DEFAULT_HLL_PRECISION = 12
+
+
+def _mix64(hashes: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer: spreads weak (e.g. small integer) hashes over all 64 bits."""
+    hashes = hashes ^ (hashes >> np.uint64(30))
+    hashes = hashes * np.uint64(0xbf58476d1ce4e5b9)
+    hashes = hashes ^ (hashes >> np.uint64(27))
+    hashes = hashes * np.uint64(0x94d049bb133111eb)
+    return hashes ^ (hashes >> np.uint64(31))
+
+
+class HyperLogLog:
+    """Distinct-count estimator over 64-bit value hashes."""
+    
+    def __init__(self, precision: int = DEFAULT_HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+    
+    def add_hashes(self, hashes: np.ndarray):
+        """Add precomputed uint64 hashes."""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if not len(hashes):
+            return
+        
+        p = self.precision
+        index = (hashes >> np.uint64(64 - p)).astype(np.int64)
+        rest = (hashes << np.uint64(p)) | np.uint64(1 << (p - 1))  # guard bit caps the rank
+        
+        # Rank = leading zeros of the remaining bits + 1
+        rank = (64 - np.floor(np.log2(rest.astype(np.float64))).astype(np.int64)).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+    
+    def add(self, values: Iterable[Any]):
+        """Add values (NaN/None are ignored); any hashable pandas-supported type."""
+        values = pd.Series(values)
+        values = values[values.notna()]
+        if not len(values):
+            return
+        
+        if pd.api.types.is_numeric_dtype(values) or isinstance(values.dtype, pd.CategoricalDtype):
+            hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+        else:
+            # Python caches str hashes, which beats rehashing every string;
+            # the builtin hash is per-process, so these sketches are not persisted
+            hashes = _mix64(np.fromiter(map(hash, values.to_numpy()), dtype=np.int64, count=len(values)).view(np.uint64))
+        self.add_hashes(hashes)
+    
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLogs with different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+    
+    def estimate(self) -> int:
+        """Estimated number of distinct values added."""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / float(np.sum(np.exp2(-self.registers.astype(np.float64))))
+        
+        # Small-range correction: linear counting while registers are still empty
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return int(round(m * math.log(m / zeros)))
+        return int(round(raw))
+
@@ -0,0 +1,43 @@
+"""Shared fixtures: a small facilities/financials database in a temp dir."""
+
+import os
+import random
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import populate_db
+
+
+def fill_sample_data(conn: sqlite3.Connection, facilities: int = 120, years=(2021, 2022), seed: int = 7):
+    """Insert facilities with one financial row per year, joined on license_number."""
+    rng = random.Random(seed)
+    for i in range(facilities):
+        conn.execute("""
+            INSERT INTO facilities (id, name, license_number, category_name, county, city, capacity)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (f"F{i:04d}", f"Facility {i}", f"LIC{i:04d}", rng.choice(['Clinic', 'Hospital']),
+              rng.choice(['Alameda', 'Fresno', 'Kern']), 'Town', rng.randint(5, 200)))
+        for year in years:
+            revenue = rng.lognormvariate(13, 0.8)
+            conn.execute("""
+                INSERT INTO financials (facility_id, license_number, year, total_revenue, total_expenses,
+                                        net_income, total_visits, total_patients, revenue_per_visit)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (f"F{i:04d}", f"LIC{i:04d}", year, revenue, revenue * 0.9, revenue * 0.1,
+                  rng.randint(100, 5000), rng.randint(50, 2000), None))
+    conn.commit()
+
+
+@pytest.fixture
+def sample_db(tmp_path):
+    """Path of a populated database."""
+    db_path = str(tmp_path / "test.db")
+    conn = sqlite3.connect(db_path)
+    populate_db.create_tables(conn)
+    fill_sample_data(conn)
+    conn.close()
+    return db_path
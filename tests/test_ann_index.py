@@ -0,0 +1,70 @@
+"""IVFFlatIndex incremental inserts, deletes and persistence."""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from ann_index import IVFFlatIndex, load_index, normalize
+
+DIM = 16
+
+
+def _vectors(n, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, DIM)).astype(np.float32)
+
+
+def _exact_top(ids, vectors, query, k):
+    scores = normalize(vectors) @ normalize(query)[0]
+    return set(ids[np.argsort(-scores)[:k]].tolist())
+
+
+def test_add_and_remove_without_retraining():
+    ids, vectors = np.arange(1, 401), _vectors(400)
+    index = IVFFlatIndex(DIM, nlist=8, nprobe=8)
+    index.build(ids[:300], vectors[:300])
+    centroids = index.centroids.copy()
+    
+    index.add(ids[300:], vectors[300:])
+    assert len(index) == 400 and index.watermark == 400
+    assert np.array_equal(index.centroids, centroids)
+    
+    # Re-adding an id replaces its vector instead of duplicating it
+    index.add(ids[:1], vectors[1:2])
+    assert len(index) == 400
+    found, scores = index.search(vectors[1], k=2)
+    assert set(found.tolist()) == {1, 2} and np.allclose(scores, 1.0, atol=1e-5)
+    
+    assert index.remove([5, 6, 9999]) == 2
+    assert len(index) == 398
+    assert not {5, 6} & set(index.ids().tolist())
+    
+    # nprobe == nlist scans every list: exact search over what's left
+    live = np.setdiff1d(ids, [5, 6])
+    live_vectors = vectors[live - 1]
+    live_vectors[0] = vectors[1]
+    query = _vectors(1, seed=9)
+    found, _ = index.search(query, k=10)
+    assert set(found.tolist()) == _exact_top(live, live_vectors, query, 10)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = IVFFlatIndex(DIM, nlist=4, nprobe=2)
+    index.build(np.arange(1, 201), _vectors(200))
+    index.remove([10, 20])
+    index.updated_watermark = '2024-01-01 00:00:00'
+    path = str(tmp_path / "test.facility_embeddings.ivf.npz")
+    index.save(path)
+    
+    loaded = load_index(path)
+    assert isinstance(loaded, IVFFlatIndex)
+    assert (len(loaded), loaded.watermark, loaded.nprobe) == (198, 200, 2)
+    assert loaded.updated_watermark == '2024-01-01 00:00:00'
+    assert np.array_equal(np.sort(loaded.ids()), np.sort(index.ids()))
+    
+    query = _vectors(1, seed=3)
+    assert np.array_equal(loaded.search(query, k=5)[0], index.search(query, k=5)[0])
+    
+    # The loaded index keeps accepting incremental changes
+    loaded.add([500], _vectors(1, seed=4))
+    assert loaded.remove([500, 10]) == 1
+    assert load_index(str(tmp_path / "missing.npz")) is None
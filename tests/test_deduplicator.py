@@ -0,0 +1,97 @@
+"""RecordDeduplicator batching and the record_hashes prefilter."""
+
+import os
+import sqlite3
+import sqlite3
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import data_sources.deduplicator as deduplicator
+from data_sources.deduplicator import RecordDeduplicator
+from db_pool import close_all_pools
+
+
+KEYS = ['id']
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    yield str(tmp_path / "dedupe.db")
+    deduplicator._PREFILTERS.clear()
+    close_all_pools()
+
+
+def test_stale_sidecar_is_discarded_for_recreated_db(db_path):
+    dedup = RecordDeduplicator(db_path)
+    job = dedup.start_job('test')
+    dedup.dedupe_batch([{'id': i} for i in range(10)], 'facility', KEYS, job)
+    dedup.prefilter.save()
+    assert dedup.prefilter.stats()['watermark'] == 10
+    
+    # Recreate the database, keeping the sidecar
+    deduplicator._PREFILTERS.clear()
+    close_all_pools()
+    os.remove(db_path)
+    other = RecordDeduplicator(db_path, use_prefilter=False)
+    job = other.start_job('other')
+    other.dedupe_batch([{'id': 3}], 'facility', KEYS, job)
+    
+    fresh = RecordDeduplicator(db_path)
+    result = fresh.dedupe_batch([{'id': 3}, {'id': 99}], 'facility', KEYS, job)
+    assert result['duplicate'] == [{'id': 3}]
+    assert result['new'] == [{'id': 99}]
+
+
+def _seen_counts(db_path):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT record_hash, seen_count FROM record_hashes").fetchall()
+    conn.close()
+    return dict(rows)
+
+
+def test_batch_partitions_first_occurrences_as_new(db_path):
+    dedup = RecordDeduplicator(db_path)
+    job = dedup.start_job('test')
+    
+    first = dedup.dedupe_batch([{'id': 1}, {'id': 2}, {'id': 1}], 'facility', KEYS, job)
+    assert first == {'new': [{'id': 1}, {'id': 2}], 'duplicate': [{'id': 1}]}
+    
+    second = dedup.dedupe_batch([{'id': 2}, {'id': 3}, {'id': 3}], 'facility', KEYS, job)
+    assert second == {'new': [{'id': 3}], 'duplicate': [{'id': 2}, {'id': 3}]}
+    
+    # A hash stored under another record type is a duplicate too
+    third = dedup.dedupe_batch([{'id': 1}], 'license', KEYS, job)
+    assert third == {'new': [], 'duplicate': [{'id': 1}]}
+    
+    seen = _seen_counts(db_path)
+    assert seen[dedup.compute_hash({'id': 1}, KEYS)] == 3
+    assert seen[dedup.compute_hash({'id': 2}, KEYS)] == 2
+    assert seen[dedup.compute_hash({'id': 3}, KEYS)] == 2
+
+
+def test_prefilter_catches_up_with_other_writers(db_path):
+    dedup = RecordDeduplicator(db_path)
+    job = dedup.start_job('test')
+    dedup.dedupe_batch([{'id': i} for i in range(5)], 'facility', KEYS, job)
+    assert dedup.prefilter.refresh() == 5
+    
+    # Rows written without the shared prefilter are pulled in on the next check
+    other = RecordDeduplicator(db_path, use_prefilter=False)
+    other.dedupe_batch([{'id': 100}], 'facility', KEYS, job)
+    assert dedup.prefilter.might_contain(dedup.compute_hash({'id': 100}, KEYS))
+    assert dedup.prefilter.stats()['watermark'] == 6
+    
+    # A write landing between the prefilter check and the batch transaction
+    # makes the batch look every hash up
+    check_many = dedup.prefilter.check_many
+    
+    def check_then_race(hashes):
+        result = check_many(hashes)
+        other.dedupe_batch([{'id': 200}], 'facility', KEYS, job)
+        return result
+    
+    dedup.prefilter.check_many = check_then_race
+    result = dedup.dedupe_batch([{'id': 200}, {'id': 201}], 'facility', KEYS, job)
+    assert result == {'new': [{'id': 201}], 'duplicate': [{'id': 200}]}
@@ -0,0 +1,76 @@
+"""Incremental fraud-alert maintenance in FinancialAnalyzer.save_fraud_alerts."""
+
+import sqlite3
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from financial_analyzer import FinancialAnalyzer, encode_cursor
+
+
+def _alert(facility_id, z_score=3.5, severity='high'):
+    return {
+        'facility_id': facility_id, 'facility_name': f"Facility {facility_id}", 'severity': severity,
+        'revenue': 1e6, 'total_visits': 10.0, 'revenue_per_visit': 1e5, 'z_score': z_score,
+    }
+
+
+def _save(analyzer, alerts):
+    return analyzer.save_fraud_alerts({}, detected={'high_revenue_per_patient': alerts,
+                                                    'extreme_profit_margin': []})
+
+
+def _rows(db_path):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT facility_id, severity, status FROM fraud_alerts ORDER BY id").fetchall()
+    conn.close()
+    return rows
+
+
+def test_numeric_looking_ids_are_updated_in_place(sample_db):
+    analyzer = FinancialAnalyzer(sample_db)
+    
+    assert _save(analyzer, [_alert('0123')])['inserted'] == 1
+    assert _save(analyzer, [_alert('0123')])['unchanged'] == 1
+    assert _save(analyzer, [_alert('0123', z_score=5.0, severity='critical')])['updated'] == 1
+    assert _rows(sample_db) == [('0123', 'critical', 'new')]
+
+
+def test_last_bit_metric_noise_is_unchanged(sample_db):
+    analyzer = FinancialAnalyzer(sample_db)
+    _save(analyzer, [_alert('F0001', z_score=3.604445036414494)])
+    
+    counts = _save(analyzer, [_alert('F0001', z_score=3.6044450364144938)])
+    assert counts['unchanged'] == 1 and counts['updated'] == 0
+
+
+def test_missing_alerts_close_and_reopen(sample_db):
+    analyzer = FinancialAnalyzer(sample_db)
+    _save(analyzer, [_alert('F0001'), _alert('F0002')])
+    
+    assert _save(analyzer, [_alert('F0001')])['closed'] == 1
+    assert _rows(sample_db)[1][2] == 'auto_closed'
+    
+    assert _save(analyzer, [_alert('F0001'), _alert('F0002')])['reopened'] == 1
+    assert [status for _, _, status in _rows(sample_db)] == ['new', 'new']
+
+
+def test_pages_follow_severity_rank_with_real_total(sample_db):
+    analyzer = FinancialAnalyzer(sample_db)
+    severities = ['low', 'critical', 'medium', 'high', 'medium']
+    _save(analyzer, [_alert(f"F{i:04d}", severity=severity) for i, severity in enumerate(severities)])
+    
+    seen, after = [], None
+    while True:
+        page = analyzer.get_fraud_alerts_page(2, after=after)
+        assert page['total'] == len(severities)
+        seen += [alert['severity'] for alert in page['alerts']]
+        after = page['next_cursor']
+        if after is None:
+            break
+    assert seen == ['critical', 'high', 'medium', 'medium', 'low']
+    assert analyzer.get_fraud_alerts_page(10, severity='medium')['total'] == 2
+    
+    with pytest.raises(ValueError):
+        analyzer.get_fraud_alerts_page(2, after=encode_cursor(('high', '2024-01-01', 1)))
@@ -0,0 +1,60 @@
+"""Incremental anomaly scoring: only inserted/updated rows are rescored."""
+
+import sqlite3
+
+import pytest
+
+pytest.importorskip("pyod")
+
+from ml_fraud_detector import MLFraudDetector, ModelRegistry
+
+
+def _scores(db_path, model='iforest'):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("""
+        SELECT financial_id, score, row_hash FROM anomaly_scores WHERE model = ?
+    """, (model,)).fetchall()
+    conn.close()
+    return {financial_id: (score, row_hash) for financial_id, score, row_hash in rows}
+
+
+def test_updated_row_is_rescored(sample_db):
+    detector = MLFraudDetector(sample_db, registry=ModelRegistry())
+    
+    first = detector.score_incremental(drift_threshold=10, models=('iforest',))['models']['iforest']
+    assert first['mode'] == 'refit'
+    before = _scores(sample_db)
+    assert len(before) == first['rows_scored']
+    
+    again = detector.score_incremental(drift_threshold=10, models=('iforest',))['models']['iforest']
+    assert again['mode'] == 'incremental'
+    assert again['changed_rows'] == 0
+    
+    # In-place UPDATE: no new rowid, no created_at change
+    conn = sqlite3.connect(sample_db)
+    conn.execute("UPDATE financials SET total_revenue = total_revenue * 40 WHERE id = 5")
+    conn.commit()
+    conn.close()
+    
+    third = detector.score_incremental(drift_threshold=10, models=('iforest',))['models']['iforest']
+    assert third['mode'] == 'incremental'
+    assert third['changed_rows'] == 1
+    
+    after = _scores(sample_db)
+    assert after[5][1] != before[5][1]
+    assert after[5][0] != before[5][0]
+    assert all(after[i] == before[i] for i in before if i != 5)
+
+
+def test_deleted_row_scores_are_dropped(sample_db):
+    detector = MLFraudDetector(sample_db, registry=ModelRegistry())
+    detector.score_incremental(drift_threshold=10, models=('iforest',))
+    
+    conn = sqlite3.connect(sample_db)
+    conn.execute("DELETE FROM financials WHERE id = 7")
+    conn.commit()
+    conn.close()
+    
+    result = detector.score_incremental(drift_threshold=10, models=('iforest',))['models']['iforest']
+    assert result['rows_removed'] == 1
+    assert 7 not in _scores(sample_db)
@@ -0,0 +1,102 @@
+"""Incremental RollupCubes refresh matches a full rebuild."""
+
+import json
+import sqlite3
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from db_pool import close_all_pools
+from rollup_cubes import RollupCubes
+
+
+@pytest.fixture
+def cubes(sample_db):
+    cubes = RollupCubes(sample_db)
+    cubes.rebuild()
+    yield cubes
+    close_all_pools()
+
+
+def _execute(db_path, sql, params=()):
+    conn = sqlite3.connect(db_path)
+    conn.execute(sql, params)
+    conn.commit()
+    conn.close()
+
+
+def _add_facility(db_path, i, county='Kern', category='Clinic'):
+    _execute(db_path, """
+        INSERT INTO facilities (id, name, license_number, category_name, county, city, capacity)
+        VALUES (?, ?, ?, ?, ?, 'Town', 40)
+    """, (f"N{i:04d}", f"New {i}", f"NEW{i:04d}", category, county))
+
+
+def _add_financials(db_path, i, year, revenue):
+    _execute(db_path, """
+        INSERT INTO financials (facility_id, license_number, year, total_revenue, total_visits)
+        VALUES (?, ?, ?, ?, 100)
+    """, (f"N{i:04d}", f"NEW{i:04d}", year, revenue))
+
+
+def _state(cubes):
+    return {
+        key: (cell['row_count'], cell['measures'], {name: sk.count for name, sk in cell['sketches'].items()})
+        for key, cell in cubes._cells.items()
+    }
+
+
+def _year_null_rows(cubes, county, category):
+    cell = cubes._cells.get(json.dumps(['merged', county, category, None]))
+    return cell['row_count'] if cell else 0
+
+
+def _assert_matches_rebuild(cubes):
+    incremental = _state(cubes)
+    cubes.rebuild()
+    rebuilt = _state(cubes)
+    assert incremental.keys() == rebuilt.keys()
+    for key, (row_count, measures, sketch_counts) in rebuilt.items():
+        assert incremental[key][0] == row_count
+        assert incremental[key][2] == sketch_counts
+        for name, (total, n) in measures.items():
+            assert incremental[key][1][name] == [pytest.approx(total), n]
+
+
+def test_appended_rows_fold_in_incrementally(cubes, sample_db):
+    before = cubes.rollup(None)[0]['row_count']
+    
+    _add_facility(sample_db, 1)
+    _add_financials(sample_db, 1, 2022, 5e6)
+    _add_financials(sample_db, 7, 2021, 1e5)  # financials for a facility not yet inserted
+    _add_facility(sample_db, 7, county='Fresno')
+    
+    result = cubes.refresh()
+    assert result['mode'] == 'incremental'
+    assert (result['facilities_added'], result['financials_added']) == (2, 2)
+    assert cubes.rollup(None)[0]['row_count'] == before + 2
+    _assert_matches_rebuild(cubes)
+
+
+def test_first_financials_remove_the_year_null_row(cubes, sample_db):
+    _add_facility(sample_db, 2, county='Alameda', category='Hospice')
+    cubes.refresh()
+    assert _year_null_rows(cubes, 'Alameda', 'Hospice') == 1
+    assert cubes.rollup(None, county='Alameda', category_name='Hospice')[0]['row_count'] == 1
+    
+    _add_financials(sample_db, 2, 2022, 2e6)
+    _add_financials(sample_db, 2, 2023, 3e6)
+    assert cubes.refresh()['mode'] == 'incremental'
+    
+    assert _year_null_rows(cubes, 'Alameda', 'Hospice') == 0
+    rows = cubes.rollup('year', county='Alameda', category_name='Hospice')
+    assert [(row['year'], row['row_count']) for row in rows] == [(2022, 1), (2023, 1)]
+    assert cubes.rollup(None, county='Alameda', category_name='Hospice')[0]['row_count'] == 2
+    assert cubes.sketch('capacity', county='Alameda', category_name='Hospice').count == 2
+    _assert_matches_rebuild(cubes)
+
+
+def test_deleted_rows_force_a_rebuild(cubes, sample_db):
+    _execute(sample_db, "DELETE FROM financials WHERE rowid = 1")
+    assert cubes.refresh()['mode'] == 'rebuild'
@@ -0,0 +1,59 @@
+"""QuantileSketch removal and merging."""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from sketches import QuantileSketch
+
+
+def _values(seed, n=2000):
+    rng = np.random.default_rng(seed)
+    return np.concatenate([rng.lognormal(10, 1, n), -rng.lognormal(5, 1, n // 10), np.zeros(n // 20)])
+
+
+def test_merge_matches_sketch_of_union():
+    a, b = _values(1), _values(2)
+    merged = QuantileSketch()
+    merged.add(a)
+    other = QuantileSketch()
+    other.add(b)
+    merged.merge(other)
+    
+    whole = QuantileSketch()
+    whole.add(np.concatenate([a, b]))
+    assert merged.to_dict() == whole.to_dict()
+    for q in (0.01, 0.25, 0.5, 0.9, 0.99):
+        assert merged.quantile(q) == pytest.approx(np.quantile(np.concatenate([a, b]), q), rel=0.02)
+    
+    with pytest.raises(ValueError):
+        merged.merge(QuantileSketch(relative_accuracy=0.05))
+
+
+def test_remove_undoes_add():
+    kept, removed = _values(3), _values(4)
+    sketch = QuantileSketch()
+    sketch.add(kept)
+    sketch.add(removed)
+    sketch.remove(removed)
+    
+    expected = QuantileSketch()
+    expected.add(kept)
+    assert (sketch.positive, sketch.negative) == (expected.positive, expected.negative)
+    assert (sketch.count, sketch.zero_count) == (expected.count, expected.zero_count)
+    assert sketch.sum == pytest.approx(expected.sum)
+    assert sketch.quantile(0.5) == pytest.approx(np.median(kept), rel=0.02)
+    
+    # min/max are kept as bounds after a removal
+    assert sketch.min <= kept.min() and sketch.max >= kept.max()
+
+
+def test_removing_everything_empties_the_sketch():
+    values = _values(5)
+    sketch = QuantileSketch()
+    sketch.add(values)
+    sketch.remove(values)
+    
+    assert len(sketch) == 0
+    assert sketch.quantile(0.5) is None
+    assert sketch.to_dict() == QuantileSketch().to_dict()
@@ -12,6 +12,8 @@ CREATE TABLE IF NOT EXISTS facility_embeddings (
     embedding BLOB NOT NULL,  -- F32_BLOB vector
     embedding_dim INTEGER NOT NULL DEFAULT 384,
     text_content TEXT NOT NULL,  -- Original text that was embedded
+    content_hash TEXT,  -- Hash of text_content + embedding_model, for refresh
+    embedding_format TEXT DEFAULT 'float32',  -- float32, float16 or int8 (scale + bytes)
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (facility_id) REFERENCES facilities(id)
@@ -29,6 +31,8 @@ CREATE TABLE IF NOT EXISTS financial_embeddings (
     embedding BLOB NOT NULL,
     embedding_dim INTEGER NOT NULL DEFAULT 384,
     text_content TEXT NOT NULL,
+    content_hash TEXT,
+    embedding_format TEXT DEFAULT 'float32',
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (financial_id) REFERENCES financials(id)
@@ -45,6 +49,8 @@ CREATE TABLE IF NOT EXISTS budget_embeddings (
     embedding BLOB NOT NULL,
     embedding_dim INTEGER NOT NULL DEFAULT 384,
     text_content TEXT NOT NULL,
+    content_hash TEXT,
+    embedding_format TEXT DEFAULT 'float32',
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (budget_id) REFERENCES government_budgets(id)
@@ -53,6 +59,42 @@ CREATE TABLE IF NOT EXISTS budget_embeddings (
 CREATE INDEX IF NOT EXISTS idx_budget_embeddings_budget 
 ON budget_embeddings(budget_id);
 
+-- Full-text index over facilities for exact-token searches (license, phone,
+-- owner names); used with vector results for hybrid search. Keyed by
+-- facilities.rowid and maintained by the triggers below.
+CREATE VIRTUAL TABLE IF NOT EXISTS facilities_fts USING fts5(
+    name, business_name, address, city, license_number, phone,
+    phone_digits,  -- phone with punctuation stripped
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS facilities_fts_insert AFTER INSERT ON facilities BEGIN
+    INSERT OR REPLACE INTO facilities_fts (rowid, name, business_name, address, city, license_number, phone, phone_digits)
+    VALUES (new.rowid, new.name, new.business_name, new.address, new.city, new.license_number, new.phone,
+            replace(replace(replace(replace(replace(replace(new.phone, '-', ''), ' ', ''), '(', ''), ')', ''), '.', ''), '+', ''));
+END;
+
+CREATE TRIGGER IF NOT EXISTS facilities_fts_update AFTER UPDATE ON facilities BEGIN
+    DELETE FROM facilities_fts WHERE rowid = old.rowid;
+    INSERT OR REPLACE INTO facilities_fts (rowid, name, business_name, address, city, license_number, phone, phone_digits)
+    VALUES (new.rowid, new.name, new.business_name, new.address, new.city, new.license_number, new.phone,
+            replace(replace(replace(replace(replace(replace(new.phone, '-', ''), ' ', ''), '(', ''), ')', ''), '.', ''), '+', ''));
+END;
+
+CREATE TRIGGER IF NOT EXISTS facilities_fts_delete AFTER DELETE ON facilities BEGIN
+    DELETE FROM facilities_fts WHERE rowid = old.rowid;
+END;
+
+-- Index facilities loaded before the triggers existed
+INSERT INTO facilities_fts (rowid, name, business_name, address, city, license_number, phone, phone_digits)
+SELECT rowid, name, business_name, address, city, license_number, phone,
+       replace(replace(replace(replace(replace(replace(phone, '-', ''), ' ', ''), '(', ''), ')', ''), '.', ''), '+', '')
+FROM facilities WHERE rowid NOT IN (SELECT rowid FROM facilities_fts);
+
+-- Case-insensitive license lookups for exact-match search
+CREATE INDEX IF NOT EXISTS idx_facilities_license_nocase
+ON facilities(license_number COLLATE NOCASE);
+
 -- Fraud patterns (embeddings for known fraud indicators)
 CREATE TABLE IF NOT EXISTS fraud_patterns (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -90,6 +132,7 @@ CREATE TABLE IF NOT EXISTS vector_metadata (
     last_embedding_update DATETIME,
     embedding_model TEXT NOT NULL,
     embedding_dim INTEGER NOT NULL,
+    embedding_format TEXT DEFAULT 'float32',
     avg_embedding_time_ms REAL,
     notes TEXT
 );
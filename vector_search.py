@@ -8,22 +8,31 @@ Features:
 - Store vectors in Turso database
 - Semantic search across all data
 - Fraud pattern matching
+- Process-wide model singleton and query-embedding cache
+- Hybrid search: FTS5 (BM25) + vectors fused by reciprocal rank
+- Optional float16 / int8 embedding storage with float32 rescoring
 """
 
 import sys
 import os
+import json
+import time
+import hashlib
 import logging
-import struct
+import threading
+import importlib.util
+import re
 import numpy as np
+from collections import OrderedDict
 from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 
-# Sentence transformers for embeddings
-try:
-    from sentence_transformers import SentenceTransformer
-    TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    TRANSFORMERS_AVAILABLE = False
+from ann_index import ANNIndex, IVFFlatIndex, index_path, load_index
+
+# Sentence transformers for embeddings (imported on first model load; it pulls in torch)
+SentenceTransformer = None
+TRANSFORMERS_AVAILABLE = importlib.util.find_spec("sentence_transformers") is not None
+if not TRANSFORMERS_AVAILABLE:
     print("⚠️  sentence-transformers not available. Install: pip install sentence-transformers")
 
 # Database
@@ -42,6 +51,214 @@ except ImportError:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Embedding tables from turso_vector_setup.sql that can be indexed
+EMBEDDING_TABLES = ('facility_embeddings', 'financial_embeddings', 'budget_embeddings')
+
+# Embedding blob formats, recorded per row in embedding_format:
+#   float32 - 4 bytes per dimension (default)
+#   float16 - 2 bytes per dimension
+#   int8    - float32 scale followed by one signed byte per dimension (x ~= q * scale)
+EMBEDDING_FORMATS = ('float32', 'float16', 'int8')
+
+# Quantized matrices are searched coarsely, then this many candidates per
+# requested result are rescored in float32
+RESCORE_FACTOR = 4
+
+# Rows dequantized per step when scoring a quantized matrix; small enough for
+# the float32 copy to stay in CPU cache (bigger chunks measured slower)
+SCORE_CHUNK_ROWS = 1024
+
+
+def blob_size(embedding_format: str, dim: int) -> int:
+    """Expected blob length in bytes for a format and dimension."""
+    return {'float32': 4 * dim, 'float16': 2 * dim, 'int8': 4 + dim}[embedding_format]
+
+
+def quantize_rows(matrix: np.ndarray, embedding_format: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert float32 rows to a storage format.
+    
+    Returns:
+        (rows in the format's dtype, per-row float32 scales; ones unless int8)
+    """
+    matrix = np.asarray(matrix, dtype=np.float32).reshape(len(matrix), -1)
+    scales = np.ones(len(matrix), dtype=np.float32)
+    if embedding_format == 'float32':
+        return matrix, scales
+    if embedding_format == 'float16':
+        return matrix.astype(np.float16), scales
+    
+    peaks = np.abs(matrix).max(axis=1) if matrix.size else scales
+    scales = np.where(peaks > 0, peaks / 127.0, 1.0).astype(np.float32)
+    quantized = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales
+
+
+def dequantize_rows(matrix: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    """Float32 rows from quantize_rows output."""
+    return matrix.astype(np.float32) * scales[:, None]
+
+
+def encode_embedding(vector: np.ndarray, embedding_format: str = 'float32') -> bytes:
+    """Serialize one vector as a blob in the given format."""
+    quantized, scales = quantize_rows(np.asarray(vector, dtype=np.float32).reshape(1, -1), embedding_format)
+    if embedding_format == 'int8':
+        return scales.tobytes() + quantized.tobytes()
+    return quantized.tobytes()
+
+
+def decode_embeddings(blobs: List[bytes], formats: List[Optional[str]], dim: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Decode blobs of mixed formats into one float32 matrix.
+    
+    Blobs whose length does not match their format and dimension are skipped.
+    
+    Returns:
+        (positions of the decoded blobs, (len(positions), dim) float32 matrix)
+    """
+    formats = [fmt or 'float32' for fmt in formats]
+    positions, parts = [], []
+    
+    for fmt in set(formats):
+        size = blob_size(fmt, dim)
+        group = [i for i, (blob, f) in enumerate(zip(blobs, formats)) if f == fmt and len(blob) == size]
+        if not group:
+            continue
+        raw = np.frombuffer(b''.join(blobs[i] for i in group), dtype=np.uint8).reshape(len(group), size)
+        if fmt == 'int8':
+            scales = raw[:, :4].copy().view(np.float32).ravel()
+            part = dequantize_rows(raw[:, 4:].view(np.int8), scales)
+        else:
+            part = raw.view(np.float16 if fmt == 'float16' else np.float32).astype(np.float32)
+        positions.append(np.array(group, dtype=np.int64))
+        parts.append(part)
+    
+    if not parts:
+        return np.empty(0, dtype=np.int64), np.empty((0, dim), dtype=np.float32)
+    positions = np.concatenate(positions)
+    order = np.argsort(positions)
+    return positions[order], np.vstack(parts)[order]
+
+
+# Full-text index over facilities, kept in sync by triggers. Keyed by the
+# facilities rowid; phone_digits lets "(916) 555-0101" match "9165550101".
+# INSERT OR REPLACE into facilities gives the row a new rowid without firing
+# the delete trigger, so ensure_fts_index() also prunes orphaned entries.
+# The NOCASE license index backs lookup_exact(); idx_facilities_license is
+# BINARY and can't serve a case-insensitive comparison.
+_PHONE_DIGITS = "replace(replace(replace(replace(replace(replace({}, '-', ''), ' ', ''), '(', ''), ')', ''), '.', ''), '+', '')"
+FTS_COLUMNS = ('name', 'business_name', 'address', 'city', 'license_number', 'phone')
+FTS_SCHEMA = [
+    """CREATE INDEX IF NOT EXISTS idx_facilities_license_nocase
+        ON facilities(license_number COLLATE NOCASE)""",
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS facilities_fts USING fts5(
+        {', '.join(FTS_COLUMNS)}, phone_digits, tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS facilities_fts_insert AFTER INSERT ON facilities BEGIN
+        INSERT OR REPLACE INTO facilities_fts (rowid, {', '.join(FTS_COLUMNS)}, phone_digits)
+        VALUES (new.rowid, {', '.join('new.' + c for c in FTS_COLUMNS)}, {_PHONE_DIGITS.format('new.phone')});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS facilities_fts_update AFTER UPDATE ON facilities BEGIN
+        DELETE FROM facilities_fts WHERE rowid = old.rowid;
+        INSERT OR REPLACE INTO facilities_fts (rowid, {', '.join(FTS_COLUMNS)}, phone_digits)
+        VALUES (new.rowid, {', '.join('new.' + c for c in FTS_COLUMNS)}, {_PHONE_DIGITS.format('new.phone')});
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS facilities_fts_delete AFTER DELETE ON facilities BEGIN
+        DELETE FROM facilities_fts WHERE rowid = old.rowid;
+    END""",
+]
+
+# Loaded models, shared by every VectorSearch in the process
+_MODELS: Dict[Tuple[str, str], Any] = {}
+_MODELS_LOCK = threading.Lock()
+
+
+def get_model(model_name: str = "all-MiniLM-L6-v2", device: str = "cpu"):
+    """
+    Get the shared SentenceTransformer for (model_name, device), loading it on first use.
+    
+    Returns:
+        The model, or None if sentence-transformers is not installed
+    """
+    global SentenceTransformer
+    if not TRANSFORMERS_AVAILABLE:
+        return None
+    
+    key = (model_name, device)
+    with _MODELS_LOCK:
+        model = _MODELS.get(key)
+        if model is None:
+            if SentenceTransformer is None:
+                from sentence_transformers import SentenceTransformer
+            logger.info(f"Loading embedding model: {model_name}")
+            start = time.time()
+            model = SentenceTransformer(model_name, device=device)
+            logger.info(f"Loaded {model_name} in {time.time() - start:.1f}s")
+            _MODELS[key] = model
+        return model
+
+
+class QueryEmbeddingCache:
+    """
+    Thread-safe LRU cache of query text -> normalized embedding, with a TTL.
+    
+    Dashboards repeat the same handful of searches; caching their vectors
+    skips the model entirely on a hit.
+    """
+    
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 3600.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def _key(model_name: str, query: str) -> Tuple[str, str]:
+        return (model_name, ' '.join(query.split()))
+    
+    def get(self, model_name: str, query: str) -> Optional[np.ndarray]:
+        key = self._key(model_name, query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def put(self, model_name: str, query: str, vector: np.ndarray):
+        vector = np.asarray(vector, dtype=np.float32)
+        vector.setflags(write=False)  # shared between callers
+        key = self._key(model_name, query)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+# Shared by every VectorSearch in the process
+query_cache = QueryEmbeddingCache()
+
 
 class VectorSearch:
     """Semantic search using vector embeddings."""
@@ -50,7 +267,8 @@ class VectorSearch:
         self,
         db_path: str = "local.db",
         model_name: str = "all-MiniLM-L6-v2",
-        device: str = "cpu"
+        device: str = "cpu",
+        storage_format: str = "float32"
     ):
         """
         Initialize vector search.
@@ -59,26 +277,375 @@ class VectorSearch:
             db_path: Path to SQLite/Turso database
             model_name: SentenceTransformer model name
             device: 'cpu' or 'cuda'
+            storage_format: Format for new embedding blobs and the in-memory
+                search matrix: 'float32', 'float16' or 'int8'
         """
+        if storage_format not in EMBEDDING_FORMATS:
+            raise ValueError(f"Unknown storage format: {storage_format} (expected one of {EMBEDDING_FORMATS})")
+        
         self.db_path = db_path
         self.model_name = model_name
+        self.storage_format = storage_format
         
-        # Load embedding model
-        if TRANSFORMERS_AVAILABLE:
-            logger.info(f"Loading embedding model: {model_name}")
-            self.model = SentenceTransformer(model_name, device=device)
+        # Embedding model (loaded once per process, see get_model)
+        self.model = get_model(model_name, device)
+        if self.model is not None:
             self.embedding_dim = self.model.get_sentence_embedding_dimension()
             logger.info(f"Embedding dimension: {self.embedding_dim}")
         else:
-            self.model = None
             self.embedding_dim = 384  # Default for MiniLM
         
-        # Connect to database
+        # Connect to database. The one connection is shared by the API's
+        # worker threads, so every use of self.db holds _db_lock
         if LIBSQL_AVAILABLE:
             self.db = create_client(f"file:{db_path}")
         else:
             import sqlite3
-            self.db = sqlite3.connect(db_path)
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db_lock = threading.RLock()
+        
+        # In-memory search matrix: one L2-normalized row per embedding in
+        # storage_format (int8 rows scaled by _scales), loaded on first
+        # search and extended as embeddings are added
+        self._matrix: Optional[np.ndarray] = None
+        self._scales = np.empty(0, dtype=np.float32)
+        self._embedding_ids = np.empty(0, dtype=np.int64)
+        self._facility_ids = np.empty(0, dtype=object)  # facility ids may be TEXT
+        self._matrix_count = 0
+        self._matrix_signature = None  # (MAX(id), COUNT(*), MAX(updated_at)) at last load
+        self._matrix_lock = threading.RLock()
+        
+        self._ensure_columns()
+        self.fts_available = self.ensure_fts_index()
+        
+        # Optional ANN index over facility_embeddings (see build_index);
+        # searches use it instead of the brute-force matrix when present
+        self.index_path = index_path(db_path, 'facility_embeddings')
+        self.ann_index: Optional[ANNIndex] = load_index(self.index_path)
+        if self.ann_index is not None:
+            logger.info(f"Loaded ANN index with {len(self.ann_index)} vectors: {self.index_path}")
+    
+    def _ensure_columns(self):
+        """Add columns introduced after turso_vector_setup.sql was first applied."""
+        added = {table: {'content_hash': "TEXT", 'embedding_format': "TEXT DEFAULT 'float32'"}
+                 for table in EMBEDDING_TABLES}
+        added['vector_metadata'] = {'embedding_format': "TEXT DEFAULT 'float32'"}
+        
+        altered = False
+        for table, columns in added.items():
+            existing = [row[1] for row in self._query(f"PRAGMA table_info({table})")]
+            for column, declaration in columns.items():
+                if existing and column not in existing:
+                    self._query(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+                    altered = True
+        if altered and not LIBSQL_AVAILABLE:
+            with self._db_lock:
+                self.db.commit()
+    
+    def _record_metadata(self):
+        """Update the facility_embeddings row in vector_metadata (model, dim, format, count)."""
+        if not self._query("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'vector_metadata'"):
+            return
+        self._execute_many("""
+            UPDATE vector_metadata
+            SET embedding_model = ?, embedding_dim = ?, embedding_format = ?,
+                record_count = (SELECT COUNT(*) FROM facility_embeddings),
+                last_embedding_update = CURRENT_TIMESTAMP
+            WHERE table_name = 'facility_embeddings'
+        """, [(self.model_name, self.embedding_dim, self.storage_format)])
+    
+    def ensure_fts_index(self) -> bool:
+        """
+        Create the facilities FTS5 index and its triggers if missing.
+        
+        The first run indexes all existing facilities; later runs only prune
+        entries orphaned by INSERT OR REPLACE.
+        
+        Returns:
+            True if full-text search is available
+        """
+        if not self._query("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'facilities'"):
+            return False
+        
+        try:
+            exists = bool(self._query(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'facilities_fts'"
+            ))
+            statements = list(FTS_SCHEMA)
+            if not exists:
+                logger.info("Building facilities full-text index")
+                statements.append(f"""
+                    INSERT INTO facilities_fts (rowid, {', '.join(FTS_COLUMNS)}, phone_digits)
+                    SELECT rowid, {', '.join(FTS_COLUMNS)}, {_PHONE_DIGITS.format('phone')} FROM facilities
+                """)
+            else:
+                statements.append("""
+                    DELETE FROM facilities_fts WHERE rowid NOT IN (SELECT rowid FROM facilities)
+                """)
+            
+            with self._db_lock:
+                if LIBSQL_AVAILABLE:
+                    self.db.batch(statements)
+                else:
+                    with self.db:
+                        for statement in statements:
+                            self.db.execute(statement)
+        except Exception as e:
+            logger.warning(f"Full-text search unavailable: {e}")
+            return False
+        return True
+    
+    def _embedding_signature(self) -> tuple:
+        """Cheap change detector for facility_embeddings."""
+        max_id, count, max_updated = self._query(
+            "SELECT MAX(id), COUNT(*), MAX(updated_at) FROM facility_embeddings"
+        )[0]
+        return (max_id or 0, count, max_updated)
+    
+    def _query(self, sql: str, params: tuple = ()) -> list:
+        """Run a query on either backend and return all rows."""
+        with self._db_lock:
+            if LIBSQL_AVAILABLE:
+                return self.db.execute(sql, list(params)).rows
+            
+            cursor = self.db.cursor()
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+    
+    @staticmethod
+    def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+        """L2-normalize rows in place (zero rows stay zero)."""
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+        return matrix
+    
+    def _decode_rows(self, rows: list) -> Tuple[list, np.ndarray]:
+        """Decode rows ending in (blob, embedding_format); returns the decodable rows and their float32 vectors."""
+        positions, vectors = decode_embeddings([r[-2] for r in rows], [r[-1] for r in rows], self.embedding_dim)
+        return [rows[i] for i in positions.tolist()], vectors
+    
+    def _rows_to_matrix(self, rows: list) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Decode (id, facility_id, blob, format) rows into id arrays and a normalized, quantized matrix."""
+        rows, vectors = self._decode_rows(rows)
+        
+        embedding_ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        facility_ids = np.array([r[1] for r in rows], dtype=object)
+        matrix, scales = quantize_rows(self._normalize_rows(vectors), self.storage_format)
+        
+        return embedding_ids, facility_ids, matrix, scales
+    
+    def _append_to_matrix(self, embedding_ids: np.ndarray, facility_ids: np.ndarray,
+                          vectors: np.ndarray, scales: np.ndarray):
+        """Extend the loaded matrix with already-normalized, quantized rows."""
+        self._matrix = np.vstack([self._matrix, vectors]) if len(self._matrix) else vectors
+        self._scales = np.concatenate([self._scales, scales])
+        self._embedding_ids = np.concatenate([self._embedding_ids, embedding_ids])
+        self._facility_ids = np.concatenate([self._facility_ids, facility_ids])
+        self._matrix_count += len(embedding_ids)
+    
+    def load_matrix(self, force: bool = False) -> np.ndarray:
+        """
+        Load (or refresh) the facility embedding matrix.
+        
+        Rows added since the last load are appended; if rows were removed or
+        rewritten (e.g. by refresh_embeddings) the matrix is rebuilt from scratch.
+        """
+        with self._matrix_lock:
+            signature = self._embedding_signature()
+            max_id, count, max_updated = signature
+            loaded_max = int(self._embedding_ids[-1]) if len(self._embedding_ids) else 0
+            
+            if not force and self._matrix is not None:
+                if signature == self._matrix_signature:
+                    return self._matrix
+                
+                # Append-only change: old rows untouched, every new row has a higher id
+                old_rows_updated = self._query(
+                    "SELECT MAX(updated_at) FROM facility_embeddings WHERE id <= ?", (loaded_max,)
+                )[0][0]
+                if (max_id > loaded_max and old_rows_updated == self._matrix_signature[2]
+                        and count - self._matrix_count == len(self._query(
+                            "SELECT id FROM facility_embeddings WHERE id > ?", (loaded_max,)))):
+                    rows = self._query("""
+                        SELECT fe.id, fe.facility_id, fe.embedding, fe.embedding_format
+                        FROM facility_embeddings fe
+                        JOIN facilities f ON fe.facility_id = f.id
+                        WHERE fe.id > ?
+                        ORDER BY fe.id
+                    """, (loaded_max,))
+                    self._append_to_matrix(*self._rows_to_matrix(rows))
+                    self._matrix_count = count
+                    self._matrix_signature = signature
+                    return self._matrix
+            
+            rows = self._query("""
+                SELECT fe.id, fe.facility_id, fe.embedding, fe.embedding_format
+                FROM facility_embeddings fe
+                JOIN facilities f ON fe.facility_id = f.id
+                ORDER BY fe.id
+            """)
+            self._embedding_ids, self._facility_ids, self._matrix, self._scales = self._rows_to_matrix(rows)
+            self._matrix_count = count
+            self._matrix_signature = signature
+            logger.info(f"Loaded {len(self._embedding_ids)} facility embeddings into search matrix "
+                        f"({self.storage_format}, {self._matrix.nbytes / 1e6:.1f} MB)")
+            return self._matrix
+    
+    def _top_k(self, query_vector: np.ndarray, limit: int, exclude: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Row indices and scores of the `limit` best cosine matches, best first."""
+        matrix = self.load_matrix()
+        if not len(matrix) or limit <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        query = query / norm if norm else query
+        
+        if matrix.dtype == np.float32:
+            scores = matrix @ query
+        else:
+            # Coarse pass over the quantized rows, one float32 chunk at a time
+            scores = np.empty(len(matrix), dtype=np.float32)
+            for start in range(0, len(matrix), SCORE_CHUNK_ROWS):
+                chunk = slice(start, start + SCORE_CHUNK_ROWS)
+                scores[chunk] = (matrix[chunk].astype(np.float32) @ query) * self._scales[chunk]
+        
+        if exclude is not None:
+            scores[exclude] = -np.inf
+        
+        k = min(limit if matrix.dtype == np.float32 else limit * RESCORE_FACTOR, len(scores))
+        idx = np.argpartition(-scores, k - 1)[:k]
+        idx = idx[np.isfinite(scores[idx])]
+        
+        if matrix.dtype != np.float32:
+            # Rescore the candidates in float32 against their re-normalized dequantized vectors
+            candidates = self._normalize_rows(dequantize_rows(matrix[idx], self._scales[idx]))
+            rescored = candidates @ query
+            top = np.argsort(-rescored)[:limit]
+            return idx[top], rescored[top]
+        
+        idx = idx[np.argsort(-scores[idx])]
+        return idx, scores[idx]
+    
+    def _facility_rows(self, embedding_ids: List[int]) -> Dict[int, tuple]:
+        """Fetch display columns for a handful of embedding rows."""
+        if not embedding_ids:
+            return {}
+        placeholders = ','.join('?' * len(embedding_ids))
+        rows = self._query(f"""
+            SELECT fe.id, fe.facility_id, fe.text_content, f.name, f.address, f.city
+            FROM facility_embeddings fe
+            JOIN facilities f ON fe.facility_id = f.id
+            WHERE fe.id IN ({placeholders})
+        """, tuple(embedding_ids))
+        return {row[0]: row[1:] for row in rows}
+    
+    def build_index(self, table: str = 'facility_embeddings', nlist: Optional[int] = None,
+                    nprobe: int = 8) -> ANNIndex:
+        """
+        Build an IVF-flat ANN index over an embedding table and save it next to the database.
+        
+        Args:
+            table: One of EMBEDDING_TABLES
+            nlist: Number of inverted lists (default ~4*sqrt(N))
+            nprobe: Default lists scanned per query
+            
+        Returns:
+            The built index
+        """
+        if table not in EMBEDDING_TABLES:
+            raise ValueError(f"Unknown embedding table: {table}")
+        
+        rows, vectors = self._decode_rows(self._query(f"SELECT id, embedding, embedding_format FROM {table} ORDER BY id"))
+        ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        
+        index = IVFFlatIndex(self.embedding_dim, nlist=nlist, nprobe=nprobe)
+        index.build(ids, vectors)
+        index.updated_watermark = self._query(f"SELECT MAX(updated_at) FROM {table}")[0][0] or ''
+        index.save(index_path(self.db_path, table))
+        
+        if table == 'facility_embeddings':
+            with self._matrix_lock:
+                self.ann_index = index
+        return index
+    
+    def save_index(self):
+        """Persist the facility ANN index after incremental changes."""
+        with self._matrix_lock:
+            if self.ann_index is not None:
+                self.ann_index.save(self.index_path)
+    
+    def _sync_index(self):
+        """Bring the ANN index up to date with rows added, rewritten or removed elsewhere."""
+        index = self.ann_index
+        max_id, count, max_updated = self._embedding_signature()
+        
+        # New rows by id, rewritten rows by updated_at (re-adding replaces the old vector)
+        rows = []
+        if max_id > index.watermark:
+            rows += self._query("""
+                SELECT id, embedding, embedding_format FROM facility_embeddings WHERE id > ? ORDER BY id
+            """, (index.watermark,))
+        if max_updated and max_updated > index.updated_watermark:
+            rows += self._query("""
+                SELECT id, embedding, embedding_format FROM facility_embeddings WHERE updated_at >= ? AND id <= ?
+            """, (index.updated_watermark, index.watermark))
+        
+        rows, vectors = self._decode_rows(rows)
+        if rows:
+            index.add(np.array([r[0] for r in rows], dtype=np.int64), vectors)
+        index.updated_watermark = max_updated or index.updated_watermark
+        
+        if count != len(index):
+            live = {row[0] for row in self._query("SELECT id FROM facility_embeddings")}
+            index.remove([i for i in index.ids().tolist() if i not in live])
+    
+    def _nearest(self, query_vector: np.ndarray, limit: int, exclude_facility=None,
+                 nprobe: Optional[int] = None) -> Tuple[List[int], List[float]]:
+        """Embedding ids and cosine scores of the best matches, via the ANN index or the matrix."""
+        with self._matrix_lock:
+            if self.ann_index is not None:
+                self._sync_index()
+                exclude = None
+                if exclude_facility is not None:
+                    exclude = np.array([row[0] for row in self._query(
+                        "SELECT id FROM facility_embeddings WHERE facility_id = ?", (exclude_facility,)
+                    )], dtype=np.int64)
+                ids, scores = self.ann_index.search(query_vector, limit, nprobe=nprobe, exclude=exclude)
+                return ids.tolist(), scores.tolist()
+            
+            exclude = None
+            if exclude_facility is not None:
+                self.load_matrix()
+                exclude = self._facility_ids == exclude_facility
+            idx, scores = self._top_k(query_vector, limit, exclude=exclude)
+            return self._embedding_ids[idx].tolist(), scores.tolist()
+    
+    def delete_facility_embeddings(self, facility_id) -> int:
+        """
+        Delete a facility's embeddings from the database and the ANN index.
+        
+        Returns:
+            Number of embeddings deleted
+        """
+        ids = [row[0] for row in self._query(
+            "SELECT id FROM facility_embeddings WHERE facility_id = ?", (facility_id,)
+        )]
+        if not ids:
+            return 0
+        
+        with self._db_lock:
+            if LIBSQL_AVAILABLE:
+                self.db.execute("DELETE FROM facility_embeddings WHERE facility_id = ?", [facility_id])
+            else:
+                self.db.execute("DELETE FROM facility_embeddings WHERE facility_id = ?", (facility_id,))
+                self.db.commit()
+        
+        with self._matrix_lock:
+            if self.ann_index is not None:
+                self.ann_index.remove(ids)
+        return len(ids)
     
     def encode_text(self, text: str) -> np.ndarray:
         """
@@ -95,32 +662,51 @@ class VectorSearch:
         
         return self.model.encode(text, convert_to_numpy=True)
     
-    def vector_to_blob(self, vector: np.ndarray) -> bytes:
+    def encode_query(self, query: str) -> np.ndarray:
+        """
+        Normalized embedding for a search query, served from query_cache when possible.
+        
+        Args:
+            query: Search query
+            
+        Returns:
+            Read-only L2-normalized float32 vector
+        """
+        vector = query_cache.get(self.model_name, query)
+        if vector is None:
+            vector = self._normalize_rows(
+                np.asarray(self.encode_text(query), dtype=np.float32).reshape(1, -1).copy()
+            )[0]
+            query_cache.put(self.model_name, query, vector)
+        return vector
+    
+    def vector_to_blob(self, vector: np.ndarray, embedding_format: Optional[str] = None) -> bytes:
         """
         Convert numpy vector to binary blob for storage.
         
         Args:
             vector: Numpy array
+            embedding_format: Blob format (defaults to self.storage_format)
             
         Returns:
             Binary blob
         """
-        # Convert to float32 and pack as bytes
-        return struct.pack(f'{len(vector)}f', *vector.astype(np.float32))
+        return encode_embedding(vector, embedding_format or self.storage_format)
     
-    def blob_to_vector(self, blob: bytes) -> np.ndarray:
+    def blob_to_vector(self, blob: bytes, embedding_format: Optional[str] = None) -> np.ndarray:
         """
         Convert binary blob back to numpy vector.
         
         Args:
             blob: Binary blob
+            embedding_format: Format the blob was stored in (defaults to float32)
             
         Returns:
-            Numpy array
+            Float32 numpy array
         """
-        # Unpack float32 bytes
-        size = len(blob) // 4
-        return np.array(struct.unpack(f'{size}f', blob), dtype=np.float32)
+        embedding_format = embedding_format or 'float32'
+        dim = len(blob) - 4 if embedding_format == 'int8' else len(blob) // (2 if embedding_format == 'float16' else 4)
+        return decode_embeddings([blob], [embedding_format], dim)[1][0]
     
     def cosine_similarity(self, v1: np.ndarray, v2: np.ndarray) -> float:
         """
@@ -159,30 +745,46 @@ class VectorSearch:
         # Generate embedding
         embedding = self.encode_text(text_content)
         blob = self.vector_to_blob(embedding)
+        content_hash = self.content_hash(text_content)
         
         # Store in database
-        if LIBSQL_AVAILABLE:
-            result = self.db.execute("""
-                INSERT INTO facility_embeddings (facility_id, embedding, embedding_dim, text_content, embedding_model)
-                VALUES (?, ?, ?, ?, ?)
-            """, [facility_id, blob, self.embedding_dim, text_content, self.model_name])
-            return result.last_insert_rowid()
-        else:
-            cursor = self.db.cursor()
-            cursor.execute("""
-                INSERT INTO facility_embeddings (facility_id, embedding, embedding_dim, text_content, embedding_model)
-                VALUES (?, ?, ?, ?, ?)
-            """, (facility_id, blob, self.embedding_dim, text_content, self.model_name))
-            self.db.commit()
-            return cursor.lastrowid
+        with self._db_lock:
+            if LIBSQL_AVAILABLE:
+                result = self.db.execute("""
+                    INSERT INTO facility_embeddings (facility_id, embedding, embedding_dim, text_content, embedding_model, content_hash, embedding_format)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, [facility_id, blob, self.embedding_dim, text_content, self.model_name, content_hash, self.storage_format])
+                embedding_id = result.last_insert_rowid()
+            else:
+                cursor = self.db.cursor()
+                cursor.execute("""
+                    INSERT INTO facility_embeddings (facility_id, embedding, embedding_dim, text_content, embedding_model, content_hash, embedding_format)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (facility_id, blob, self.embedding_dim, text_content, self.model_name, content_hash, self.storage_format))
+                self.db.commit()
+                embedding_id = cursor.lastrowid
+        
+        # Keep an already-loaded search matrix and the ANN index current without a reload
+        with self._matrix_lock:
+            stored = self.blob_to_vector(blob, self.storage_format)
+            if self._matrix is not None and len(stored) == self.embedding_dim:
+                vector = self._normalize_rows(stored.reshape(1, -1).copy())
+                self._append_to_matrix(np.array([embedding_id]), np.array([facility_id], dtype=object),
+                                       *quantize_rows(vector, self.storage_format))
+                self._matrix_signature = self._embedding_signature()
+            if self.ann_index is not None:
+                self.ann_index.add(np.array([embedding_id]), stored)
+        
+        return embedding_id
     
-    def search_facilities(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+    def search_facilities(self, query: str, limit: int = 10, nprobe: Optional[int] = None) -> List[Dict[str, Any]]:
         """
         Semantic search for facilities.
         
         Args:
             query: Search query (natural language)
             limit: Maximum results
+            nprobe: ANN lists to scan (only used when an index is present)
             
         Returns:
             List of matching facilities with similarity scores
@@ -190,37 +792,18 @@ class VectorSearch:
         if not self.model:
             raise RuntimeError("Embedding model not available")
         
-        # Encode query
-        query_embedding = self.encode_text(query)
+        # Encode query (cached across searches)
+        query_embedding = self.encode_query(query)
         
-        # Get all facility embeddings
-        if LIBSQL_AVAILABLE:
-            result = self.db.execute("""
-                SELECT fe.id, fe.facility_id, fe.embedding, fe.text_content, f.name, f.address, f.city
-                FROM facility_embeddings fe
-                JOIN facilities f ON fe.facility_id = f.id
-            """)
-            rows = result.rows
-        else:
-            cursor = self.db.cursor()
-            cursor.execute("""
-                SELECT fe.id, fe.facility_id, fe.embedding, fe.text_content, f.name, f.address, f.city
-                FROM facility_embeddings fe
-                JOIN facilities f ON fe.facility_id = f.id
-            """)
-            rows = cursor.fetchall()
+        # Top-k from the ANN index, or one matrix-vector product over all embeddings
+        embedding_ids, scores = self._nearest(query_embedding, limit, nprobe=nprobe)
+        details = self._facility_rows(embedding_ids)
         
-        # Calculate similarities
         results = []
-        for row in rows:
-            embedding_id, facility_id, embedding_blob, text_content, name, address, city = row
-            
-            # Convert blob to vector
-            facility_embedding = self.blob_to_vector(embedding_blob)
-            
-            # Calculate similarity
-            similarity = self.cosine_similarity(query_embedding, facility_embedding)
-            
+        for embedding_id, similarity in zip(embedding_ids, scores):
+            if embedding_id not in details:
+                continue
+            facility_id, text_content, name, address, city = details[embedding_id]
             results.append({
                 'facility_id': facility_id,
                 'name': name,
@@ -230,62 +813,283 @@ class VectorSearch:
                 'matched_text': text_content
             })
         
-        # Sort by similarity and limit
-        results.sort(key=lambda x: x['similarity'], reverse=True)
-        return results[:limit]
+        return results
     
-    def embed_all_facilities(self, batch_size: int = 100):
+    @staticmethod
+    def facility_text(name, address, city, category, business) -> str:
+        """Text representation of a facility used for its embedding."""
+        return f"{name} - {category or 'Healthcare Facility'} located at {address}, {city}. Owner: {business or 'Unknown'}"
+    
+    def content_hash(self, text_content: str, model_name: Optional[str] = None) -> str:
+        """Hash of embedded text plus model; a change in either means the vector is stale."""
+        return hashlib.sha256(f"{model_name or self.model_name}\n{text_content}".encode()).hexdigest()[:32]
+    
+    def encode_texts(self, texts: List[str], batch_size: int = 64, pool=None) -> np.ndarray:
+        """
+        Encode a list of texts in one call.
+        
+        Args:
+            texts: Input texts
+            batch_size: SentenceTransformer encode batch size
+            pool: Multi-process pool from model.start_multi_process_pool()
+            
+        Returns:
+            (len(texts), embedding_dim) float32 array
+        """
+        if not self.model:
+            raise RuntimeError("SentenceTransformer not available")
+        
+        if pool is not None:
+            embeddings = self.model.encode_multi_process(texts, pool, batch_size=batch_size)
+        else:
+            embeddings = self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True,
+                                           show_progress_bar=False)
+        return np.asarray(embeddings, dtype=np.float32).reshape(len(texts), -1)
+    
+    def _execute_many(self, sql: str, rows: List[tuple]):
+        """Run one statement for many parameter rows and commit."""
+        with self._db_lock:
+            if LIBSQL_AVAILABLE:
+                self.db.batch([(sql, list(row)) for row in rows])
+            else:
+                self.db.executemany(sql, rows)
+                self.db.commit()
+    
+    def _write_embeddings(self, rows: List[tuple]):
+        """Insert (facility_id, blob, dim, text_content, model, content_hash) rows in one statement batch."""
+        self._execute_many("""
+            INSERT INTO facility_embeddings (facility_id, embedding, embedding_dim, text_content, embedding_model, content_hash, embedding_format)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [row + (self.storage_format,) for row in rows])
+    
+    def _update_embeddings(self, rows: List[tuple]):
+        """Rewrite (blob, dim, text_content, model, content_hash, embedding_id) rows in place."""
+        self._execute_many("""
+            UPDATE facility_embeddings
+            SET embedding = ?, embedding_dim = ?, text_content = ?, embedding_model = ?,
+                content_hash = ?, embedding_format = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, [row[:5] + (self.storage_format, row[5]) for row in rows])
+    
+    @property
+    def checkpoint_path(self) -> str:
+        db = Path(self.db_path)
+        return str(db.with_name(f"{db.stem}.embed_checkpoint.json"))
+    
+    def _load_checkpoint(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.checkpoint_path) as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return checkpoint if checkpoint.get('model') == self.model_name else None
+    
+    def _save_checkpoint(self, checkpoint: Dict[str, Any]):
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+    
+    def embed_all_facilities(self, batch_size: int = 100, encode_batch_size: int = 64,
+                             workers: int = 1, resume: bool = True) -> int:
         """
         Generate embeddings for all facilities that don't have them.
         
+        Each batch is encoded with one model call and written with one
+        executemany. Progress is checkpointed after every batch, so an
+        interrupted run picks up where it stopped.
+        
         Args:
-            batch_size: Process in batches
+            batch_size: Facilities per encode/write batch
+            encode_batch_size: SentenceTransformer internal batch size
+            workers: Encode processes (>1 starts a multi-process pool, useful on CPU-only hosts)
+            resume: Continue from the last checkpoint if one exists
+            
+        Returns:
+            Number of facilities embedded
         """
         if not self.model:
             raise RuntimeError("Embedding model not available")
         
         logger.info("Generating embeddings for facilities...")
         
-        # Get facilities without embeddings
-        if LIBSQL_AVAILABLE:
-            result = self.db.execute("""
-                SELECT f.id, f.name, f.address, f.city, f.category_name, f.business_name
-                FROM facilities f
-                LEFT JOIN facility_embeddings fe ON f.id = fe.facility_id
-                WHERE fe.id IS NULL
-            """)
-            facilities = result.rows
-        else:
-            cursor = self.db.cursor()
-            cursor.execute("""
-                SELECT f.id, f.name, f.address, f.city, f.category_name, f.business_name
-                FROM facilities f
-                LEFT JOIN facility_embeddings fe ON f.id = fe.facility_id
-                WHERE fe.id IS NULL
-            """)
-            facilities = cursor.fetchall()
+        checkpoint = self._load_checkpoint() if resume else None
+        last_id = checkpoint['last_facility_id'] if checkpoint else None
+        if checkpoint:
+            logger.info(f"Resuming after facility {last_id} ({checkpoint['embedded']} already embedded)")
+        
+        # Get facilities without embeddings, in a stable order for checkpointing
+        facilities = self._query(f"""
+            SELECT f.id, f.name, f.address, f.city, f.category_name, f.business_name
+            FROM facilities f
+            LEFT JOIN facility_embeddings fe ON f.id = fe.facility_id
+            WHERE fe.id IS NULL
+            {'AND f.id > ?' if last_id is not None else ''}
+            ORDER BY f.id
+        """, (last_id,) if last_id is not None else ())
         
         logger.info(f"Found {len(facilities)} facilities without embeddings")
         
-        # Process in batches
-        for i in range(0, len(facilities), batch_size):
-            batch = facilities[i:i+batch_size]
-            
-            for facility in batch:
-                facility_id, name, address, city, category, business = facility
-                
-                # Create text representation
-                text_content = f"{name} - {category or 'Healthcare Facility'} located at {address}, {city}. Owner: {business or 'Unknown'}"
+        embedded = checkpoint['embedded'] if checkpoint else 0
+        pool = self.model.start_multi_process_pool(['cpu'] * workers) if workers > 1 else None
+        
+        try:
+            # Process in batches
+            for i in range(0, len(facilities), batch_size):
+                batch = facilities[i:i+batch_size]
+                texts = [self.facility_text(*facility[1:]) for facility in batch]
                 
                 try:
-                    self.embed_facility(facility_id, text_content)
-                    logger.info(f"Embedded facility {facility_id}: {name}")
+                    embeddings = self.encode_texts(texts, batch_size=encode_batch_size, pool=pool)
+                    self._write_embeddings([
+                        (facility[0], self.vector_to_blob(embedding), self.embedding_dim, text,
+                         self.model_name, self.content_hash(text))
+                        for facility, text, embedding in zip(batch, texts, embeddings)
+                    ])
+                    embedded += len(batch)
                 except Exception as e:
-                    logger.error(f"Error embedding facility {facility_id}: {e}")
+                    logger.error(f"Error embedding facilities {batch[0][0]}..{batch[-1][0]}: {e}")
+                
+                self._save_checkpoint({
+                    'model': self.model_name,
+                    'last_facility_id': batch[-1][0],
+                    'embedded': embedded,
+                })
+                logger.info(f"Processed {min(i+batch_size, len(facilities))}/{len(facilities)} facilities")
+        finally:
+            if pool is not None:
+                self.model.stop_multi_process_pool(pool)
+        
+        # Finished: the next run starts from scratch
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        
+        # New rows reach the search matrix on its next load; fold them into the index now
+        with self._matrix_lock:
+            if self.ann_index is not None:
+                self._sync_index()
+        self.save_index()
+        self._record_metadata()
+        
+        logger.info(f"✅ All facilities embedded ({embedded} total)")
+        return embedded
+    
+    def refresh_embeddings(self, batch_size: int = 100, encode_batch_size: int = 64,
+                           workers: int = 1) -> Dict[str, int]:
+        """
+        Re-embed only facilities whose generated text or embedding model changed.
+        
+        Compares each facility's current text hash with the content_hash on
+        its latest embedding row and upserts stale or missing embeddings in
+        place. Rows from before content_hash existed are backfilled without
+        re-encoding when their stored text and model still match. Current
+        rows stored in another format than storage_format are converted
+        without re-encoding.
+        
+        Returns:
+            Counts of checked, unchanged, backfilled, converted, updated and inserted facilities
+        """
+        if not self.model:
+            raise RuntimeError("Embedding model not available")
+        
+        rows = self._query("""
+            SELECT f.id, f.name, f.address, f.city, f.category_name, f.business_name,
+                   fe.id, fe.content_hash, fe.text_content, fe.embedding_model, fe.embedding_format
+            FROM facilities f
+            LEFT JOIN facility_embeddings fe
+                ON fe.id = (SELECT MAX(id) FROM facility_embeddings WHERE facility_id = f.id)
+            ORDER BY f.id
+        """)
+        
+        counts = {'checked': len(rows), 'unchanged': 0, 'backfilled': 0, 'converted': 0,
+                  'updated': 0, 'inserted': 0}
+        backfill = []
+        convert = []  # embedding ids with current content in another format
+        stale = []  # (facility_id, embedding_id or None, text, content_hash)
+        
+        for row in rows:
+            facility_id, embedding_id, stored_hash, stored_text, stored_model, stored_format = row[0], *row[6:]
+            text = self.facility_text(*row[1:6])
+            content_hash = self.content_hash(text)
+            
+            if embedding_id is not None and stored_hash == content_hash:
+                counts['unchanged'] += 1
+            elif (embedding_id is not None and stored_hash is None
+                  and self.content_hash(stored_text, stored_model) == content_hash):
+                backfill.append((content_hash, embedding_id))
+            else:
+                stale.append((facility_id, embedding_id, text, content_hash))
+                continue
             
-            logger.info(f"Processed {min(i+batch_size, len(facilities))}/{len(facilities)} facilities")
+            if (stored_format or 'float32') != self.storage_format:
+                convert.append(embedding_id)
+        
+        if backfill:
+            self._execute_many("UPDATE facility_embeddings SET content_hash = ? WHERE id = ?", backfill)
+            counts['backfilled'] = len(backfill)
+        
+        rewritten_ids, rewritten_vectors = [], []
+        for i in range(0, len(convert), batch_size):
+            batch = convert[i:i+batch_size]
+            stored, vectors = self._decode_rows(self._query(f"""
+                SELECT id, embedding, embedding_format FROM facility_embeddings
+                WHERE id IN ({','.join('?' * len(batch))})
+            """, tuple(batch)))
+            blobs = [self.vector_to_blob(vector) for vector in vectors]
+            self._execute_many("""
+                UPDATE facility_embeddings
+                SET embedding = ?, embedding_format = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, [(blob, self.storage_format, row[0]) for blob, row in zip(blobs, stored)])
+            rewritten_ids += [row[0] for row in stored]
+            rewritten_vectors += [self.blob_to_vector(blob, self.storage_format) for blob in blobs]
+            counts['converted'] += len(stored)
+        
+        logger.info(f"{len(stale)} of {len(rows)} facilities need new embeddings")
+        
+        pool = self.model.start_multi_process_pool(['cpu'] * workers) if workers > 1 else None
+        try:
+            for i in range(0, len(stale), batch_size):
+                batch = stale[i:i+batch_size]
+                embeddings = self.encode_texts([item[2] for item in batch], batch_size=encode_batch_size, pool=pool)
+                
+                updates, inserts = [], []
+                for (facility_id, embedding_id, text, content_hash), embedding in zip(batch, embeddings):
+                    blob = self.vector_to_blob(embedding)
+                    if embedding_id is None:
+                        inserts.append((facility_id, blob, self.embedding_dim, text, self.model_name, content_hash))
+                    else:
+                        updates.append((blob, self.embedding_dim, text, self.model_name, content_hash, embedding_id))
+                        rewritten_ids.append(embedding_id)
+                        rewritten_vectors.append(self.blob_to_vector(blob, self.storage_format))
+                
+                if updates:
+                    self._update_embeddings(updates)
+                if inserts:
+                    self._write_embeddings(inserts)
+                counts['updated'] += len(updates)
+                counts['inserted'] += len(inserts)
+                
+                logger.info(f"Refreshed {min(i+batch_size, len(stale))}/{len(stale)} facilities")
+        finally:
+            if pool is not None:
+                self.model.stop_multi_process_pool(pool)
         
-        logger.info("✅ All facilities embedded")
+        # Rows rewritten in place keep their ids: reload the matrix and replace
+        # their vectors in the index (updated_at may not have moved past its watermark)
+        with self._matrix_lock:
+            if rewritten_ids:
+                self._matrix = None
+            if self.ann_index is not None:
+                if rewritten_ids:
+                    self.ann_index.add(np.array(rewritten_ids, dtype=np.int64),
+                                       np.asarray(rewritten_vectors, dtype=np.float32))
+                self._sync_index()
+        self.save_index()
+        self._record_metadata()
+        
+        logger.info(f"✅ Embedding refresh complete: {counts}")
+        return counts
     
     def find_similar_facilities(self, facility_id: int, limit: int = 10) -> List[Dict[str, Any]]:
         """
@@ -299,48 +1103,24 @@ class VectorSearch:
             List of similar facilities
         """
         # Get embedding for reference facility
-        if LIBSQL_AVAILABLE:
-            result = self.db.execute("""
-                SELECT embedding FROM facility_embeddings WHERE facility_id = ?
-            """, [facility_id])
-            rows = result.rows
-        else:
-            cursor = self.db.cursor()
-            cursor.execute("""
-                SELECT embedding FROM facility_embeddings WHERE facility_id = ?
-            """, (facility_id,))
-            rows = cursor.fetchall()
+        rows = self._query("""
+            SELECT embedding, embedding_format FROM facility_embeddings WHERE facility_id = ?
+        """, (facility_id,))
         
         if not rows:
             return []
         
-        reference_embedding = self.blob_to_vector(rows[0][0])
+        reference_embedding = self.blob_to_vector(rows[0][0], rows[0][1])
         
-        # Find similar embeddings
-        if LIBSQL_AVAILABLE:
-            result = self.db.execute("""
-                SELECT fe.facility_id, fe.embedding, f.name, f.address, f.city
-                FROM facility_embeddings fe
-                JOIN facilities f ON fe.facility_id = f.id
-                WHERE fe.facility_id != ?
-            """, [facility_id])
-            all_rows = result.rows
-        else:
-            cursor.execute("""
-                SELECT fe.facility_id, fe.embedding, f.name, f.address, f.city
-                FROM facility_embeddings fe
-                JOIN facilities f ON fe.facility_id = f.id
-                WHERE fe.facility_id != ?
-            """, (facility_id,))
-            all_rows = cursor.fetchall()
+        # Score against the index or search matrix, excluding the facility itself
+        embedding_ids, scores = self._nearest(reference_embedding, limit, exclude_facility=facility_id)
+        details = self._facility_rows(embedding_ids)
         
-        # Calculate similarities
         results = []
-        for row in all_rows:
-            fid, embedding_blob, name, address, city = row
-            facility_embedding = self.blob_to_vector(embedding_blob)
-            similarity = self.cosine_similarity(reference_embedding, facility_embedding)
-            
+        for embedding_id, similarity in zip(embedding_ids, scores):
+            if embedding_id not in details:
+                continue
+            fid, _, name, address, city = details[embedding_id]
             results.append({
                 'facility_id': fid,
                 'name': name,
@@ -349,14 +1129,152 @@ class VectorSearch:
                 'similarity': float(similarity)
             })
         
-        # Sort and limit
-        results.sort(key=lambda x: x['similarity'], reverse=True)
-        return results[:limit]
+        return results
+    
+    @staticmethod
+    def _fts_query(query: str) -> Optional[str]:
+        """FTS5 MATCH expression: any of the query's words, each quoted so punctuation is literal."""
+        tokens = re.findall(r'\w+', query)
+        if not tokens:
+            return None
+        return ' OR '.join(f'"{token}"' for token in tokens)
+    
+    def _facility_details(self, facility_ids: List[Any]) -> Dict[Any, tuple]:
+        """Fetch (name, address, city, license_number, phone) by facility id."""
+        if not facility_ids:
+            return {}
+        placeholders = ','.join('?' * len(facility_ids))
+        rows = self._query(f"""
+            SELECT id, name, address, city, license_number, phone
+            FROM facilities WHERE id IN ({placeholders})
+        """, tuple(facility_ids))
+        return {row[0]: row[1:] for row in rows}
+    
+    def lookup_exact(self, query: str, limit: int = 10) -> List[Any]:
+        """
+        Facility ids whose id, license number or phone equals the query.
+        
+        Only single tokens (or phone numbers) containing a digit are tried;
+        these are index lookups and never touch the embedding model.
+        """
+        token = query.strip()
+        phone_like = re.fullmatch(r'[\d\s().+-]+', token) is not None
+        if not any(ch.isdigit() for ch in token) or (' ' in token and not phone_like):
+            return []
+        
+        rows = self._query("""
+            SELECT id FROM facilities WHERE id = ?
+            UNION
+            SELECT id FROM facilities WHERE license_number = ? COLLATE NOCASE
+            LIMIT ?
+        """, (token, token, limit))
+        if rows or not self.fts_available:
+            return [row[0] for row in rows]
+        
+        digits = re.sub(r'\D', '', token)
+        if len(digits) < 7:
+            return []
+        rows = self._query("""
+            SELECT f.id FROM facilities_fts
+            JOIN facilities f ON f.rowid = facilities_fts.rowid
+            WHERE facilities_fts MATCH ? LIMIT ?
+        """, (f'phone_digits : "{digits}"', limit))
+        return [row[0] for row in rows]
+    
+    def lexical_search(self, query: str, limit: int = 10) -> List[Tuple[Any, float]]:
+        """
+        Full-text search over facility name, owner, address, city, license and phone.
+        
+        Returns:
+            (facility_id, bm25) pairs, best first (lower bm25 is better)
+        """
+        match = self._fts_query(query)
+        if not match or not self.fts_available:
+            return []
+        rows = self._query("""
+            SELECT f.id, bm25(facilities_fts) AS rank
+            FROM facilities_fts
+            JOIN facilities f ON f.rowid = facilities_fts.rowid
+            WHERE facilities_fts MATCH ?
+            ORDER BY rank
+            LIMIT ?
+        """, (match, limit))
+        return [(row[0], row[1]) for row in rows]
+    
+    def hybrid_search(self, query: str, limit: int = 10, candidates: int = 50,
+                      rrf_k: int = 60, nprobe: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Search facilities by keywords and meaning at once.
+        
+        Exact id/license/phone matches are returned directly. Otherwise the
+        FTS5 (BM25) and vector top-`candidates` lists are merged with
+        reciprocal-rank fusion: score = sum(1 / (rrf_k + rank)).
+        
+        Args:
+            query: Search query (free text, license number, phone, ...)
+            limit: Maximum results
+            candidates: Results taken from each ranker before fusion
+            rrf_k: RRF damping constant (larger flattens rank differences)
+            nprobe: ANN lists to scan (only used when an index is present)
+            
+        Returns:
+            List of facilities with fused score and per-ranker ranks
+        """
+        exact = self.lookup_exact(query, limit)
+        if exact:
+            details = self._facility_details(exact)
+            return [
+                self._search_result(facility_id, details[facility_id], score=1.0, match='exact')
+                for facility_id in exact if facility_id in details
+            ]
+        
+        lexical = self.lexical_search(query, candidates)
+        
+        vector: List[Tuple[Any, float]] = []
+        if self.model is not None:
+            embedding_ids, scores = self._nearest(self.encode_query(query), candidates, nprobe=nprobe)
+            rows = self._facility_rows(embedding_ids)
+            seen = set()
+            for embedding_id, similarity in zip(embedding_ids, scores):
+                facility_id = rows[embedding_id][0] if embedding_id in rows else None
+                if facility_id is not None and facility_id not in seen:
+                    seen.add(facility_id)
+                    vector.append((facility_id, similarity))
+        
+        fused: Dict[Any, Dict[str, Any]] = {}
+        for source, ranked in (('lexical', lexical), ('vector', vector)):
+            for rank, (facility_id, score) in enumerate(ranked, 1):
+                entry = fused.setdefault(facility_id, {'score': 0.0, 'lexical_rank': None, 'vector_rank': None})
+                entry['score'] += 1.0 / (rrf_k + rank)
+                entry[f'{source}_rank'] = rank
+                if source == 'vector':
+                    entry['similarity'] = float(score)
+        
+        top = sorted(fused.items(), key=lambda item: -item[1]['score'])[:limit]
+        details = self._facility_details([facility_id for facility_id, _ in top])
+        return [
+            self._search_result(facility_id, details[facility_id], match='hybrid', **entry)
+            for facility_id, entry in top if facility_id in details
+        ]
+    
+    @staticmethod
+    def _search_result(facility_id, details: tuple, **fields) -> Dict[str, Any]:
+        name, address, city, license_number, phone = details
+        return {
+            'facility_id': facility_id,
+            'name': name,
+            'address': address,
+            'city': city,
+            'license_number': license_number,
+            'phone': phone,
+            **fields
+        }
     
     def close(self):
         """Close database connection."""
         if hasattr(self.db, 'close'):
-            self.db.close()
+            with self._db_lock:
+                self.db.close()
 
 
 def main():
@@ -366,24 +1284,50 @@ def main():
     parser = argparse.ArgumentParser(description="Hippocratic Vector Search")
     parser.add_argument("--embed-all", action="store_true", help="Generate embeddings for all facilities")
     parser.add_argument("--search", type=str, help="Search query")
+    parser.add_argument("--hybrid", action="store_true", help="Combine keyword (FTS5) and vector ranking for --search")
     parser.add_argument("--limit", type=int, default=10, help="Result limit")
     parser.add_argument("--db", type=str, default="local.db", help="Database path")
+    parser.add_argument("--batch-size", type=int, default=100, help="Facilities per embedding batch")
+    parser.add_argument("--workers", type=int, default=1, help="Encode processes for --embed-all")
+    parser.add_argument("--no-resume", action="store_true", help="Ignore any embedding checkpoint")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Re-embed facilities whose text or model changed (and convert to --storage-format)")
+    parser.add_argument("--storage-format", choices=EMBEDDING_FORMATS, default="float32",
+                        help="Embedding blob / search matrix format (int8 and float16 are rescored in float32)")
+    parser.add_argument("--build-index", nargs="?", const="facility_embeddings", choices=EMBEDDING_TABLES,
+                        help="Build the ANN index for an embedding table (default: facility_embeddings)")
+    parser.add_argument("--nlist", type=int, help="ANN index lists (default ~4*sqrt(N))")
+    parser.add_argument("--nprobe", type=int, help="ANN lists scanned per query (higher = better recall)")
     
     args = parser.parse_args()
     
-    vs = VectorSearch(db_path=args.db)
+    vs = VectorSearch(db_path=args.db, storage_format=args.storage_format)
     
     if args.embed_all:
-        vs.embed_all_facilities()
+        vs.embed_all_facilities(batch_size=args.batch_size, workers=args.workers, resume=not args.no_resume)
+    
+    if args.refresh:
+        counts = vs.refresh_embeddings(batch_size=args.batch_size, workers=args.workers)
+        print(f"✅ Refreshed embeddings: {counts}")
+    
+    if args.build_index:
+        index = vs.build_index(args.build_index, nlist=args.nlist, nprobe=args.nprobe or 8)
+        print(f"✅ Indexed {len(index)} vectors into {index.nlist} lists")
     
     if args.search:
         print(f"\n🔍 Searching for: {args.search}\n")
-        results = vs.search_facilities(args.search, limit=args.limit)
+        if args.hybrid:
+            results = vs.hybrid_search(args.search, limit=args.limit, nprobe=args.nprobe)
+        else:
+            results = vs.search_facilities(args.search, limit=args.limit, nprobe=args.nprobe)
         
         for i, result in enumerate(results, 1):
             print(f"{i}. {result['name']}")
             print(f"   {result['address']}, {result['city']}")
-            print(f"   Similarity: {result['similarity']:.3f}")
+            if 'similarity' in result:
+                print(f"   Similarity: {result['similarity']:.3f}")
+            if args.hybrid:
+                print(f"   Score: {result['score']:.4f} ({result['match']})")
             print()
     
     vs.close()